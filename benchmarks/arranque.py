@@ -0,0 +1,120 @@
+# =============================== #
+#  Benchmark de arranque (cold start + rerun)
+# =============================== #
+"""
+Mede, fora do Streamlit normal:
+- o custo de importar cada módulo do pacote cr7bot num processo novo
+  (python -X importtime) e se algum arrasta pandas/bcrypt/xlsxwriter/streamlit;
+- o cold start da app (1ª execução do script via streamlit.testing.AppTest);
+- o tempo médio/mediano de um rerun com sessão já autenticada.
+
+Uso:
+    python benchmarks/arranque.py [--reruns 20] [--json saida.json] [--max-import-ms 150]
+Sai com código 1 se algum módulo do núcleo passar o limite ou importar dependências pesadas.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(RAIZ, "cr7bot_streamlit.py")
+
+MODULOS_NUCLEO = [
+    "cr7bot.util", "cr7bot.forma", "cr7bot.mercados", "cr7bot.apostas", "cr7bot.m3u",
+    "cr7bot.cache", "cr7bot.chat", "cr7bot.armazenamento", "cr7bot.presenca",
+    "cr7bot.auth", "cr7bot.pesos", "cr7bot.exportar", "cr7bot.live", "cr7bot.regras",
+    "cr7bot.simulacao", "cr7bot.painel", "cr7bot.forca", "cr7bot.margem", "cr7bot.ingestao",
+    "cr7bot.canais", "cr7bot.sonda", "cr7bot.instrumentacao",
+]
+PESADOS = ("pandas", "bcrypt", "xlsxwriter", "streamlit")
+
+
+def medir_import(modulo: str) -> dict:
+    """Importa `modulo` num processo novo; devolve ms cumulativos e dependências pesadas carregadas."""
+    codigo = (f"import {modulo}, sys, json; "
+              f"print(json.dumps([m for m in {PESADOS!r} if m in sys.modules]))")
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo],
+                       cwd=RAIZ, capture_output=True, text=True, check=True)
+    us = 0
+    for linha in r.stderr.splitlines():
+        partes = [p.strip() for p in linha.split("|")]
+        if len(partes) == 3 and partes[2] == modulo:
+            us = int(partes[1])
+    return {"modulo": modulo, "ms": us / 1000.0, "pesados": json.loads(r.stdout.strip().splitlines()[-1])}
+
+
+def medir_app(reruns: int) -> dict:
+    """Cold start e reruns da app com AppTest, numa pasta temporária (não toca nos dados reais)."""
+    from streamlit.testing.v1 import AppTest
+    pasta = tempfile.mkdtemp(prefix="cr7bench-")
+    if os.path.exists(os.path.join(RAIZ, "users.json")):
+        shutil.copy(os.path.join(RAIZ, "users.json"), pasta)
+    antes = os.getcwd()
+    os.chdir(pasta)
+    sys.path.insert(0, RAIZ)
+    try:
+        at = AppTest.from_file(SCRIPT, default_timeout=120)
+        at.session_state["login_success"] = True
+        at.session_state["logged_user"] = "benchmark"
+        t0 = time.perf_counter()
+        at.run()
+        cold = time.perf_counter() - t0
+        tempos = []
+        for _ in range(reruns):
+            t0 = time.perf_counter()
+            at.run()
+            tempos.append(time.perf_counter() - t0)
+        erros = [str(e.value) for e in at.exception]
+    finally:
+        os.chdir(antes)
+        shutil.rmtree(pasta, ignore_errors=True)
+    return {
+        "cold_start_ms": cold * 1000,
+        "rerun_mediana_ms": statistics.median(tempos) * 1000 if tempos else None,
+        "rerun_media_ms": statistics.fmean(tempos) * 1000 if tempos else None,
+        "reruns": reruns, "erros": erros,
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--reruns", type=int, default=20)
+    ap.add_argument("--json", help="grava o relatório neste ficheiro")
+    ap.add_argument("--max-import-ms", type=float, default=150.0)
+    ap.add_argument("--sem-app", action="store_true", help="só mede imports do pacote")
+    args = ap.parse_args(argv)
+
+    imports = [medir_import(m) for m in MODULOS_NUCLEO]
+    relatorio = {"python": sys.version.split()[0], "imports": imports}
+    if not args.sem_app:
+        relatorio["app"] = medir_app(args.reruns)
+
+    for r in imports:
+        aviso = f"  <- importa {', '.join(r['pesados'])}" if r["pesados"] else ""
+        print(f"{r['modulo']:<24} {r['ms']:8.1f} ms{aviso}")
+    if "app" in relatorio:
+        a = relatorio["app"]
+        print(f"{'cold start app':<24} {a['cold_start_ms']:8.1f} ms")
+        print(f"{'rerun (mediana)':<24} {a['rerun_mediana_ms']:8.1f} ms  ({a['reruns']} reruns)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+
+    falhas = [r["modulo"] for r in imports if r["pesados"] or r["ms"] > args.max_import_ms]
+    if relatorio.get("app", {}).get("erros"):
+        falhas.append("app")
+    if falhas:
+        print("FALHOU:", ", ".join(falhas))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
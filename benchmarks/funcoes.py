@@ -0,0 +1,233 @@
+# =============================== #
+#  Benchmark de regressão das funções quentes
+# =============================== #
+"""
+Mede, fora do Streamlit, as funções por onde passa cada rerun / exportação:
+- poisson_outcome_probs, prob_over, prob_btts (sem cache e com a cache cheia);
+- remover_margem (4 métodos) numa folha de 10k mercados 1X2;
+- escada_asiatica (25 handicaps + 25 totais) para 1 jogo e para 1000 jogos;
+- parse_m3u com playlists sintéticas de 1k e 100k canais;
+- safe_json_write de um histórico de chat a crescer (100 / 1k / 10k mensagens),
+  e o append do chat atual para comparação;
+- export_detalhado (xlsx e csv) com 10 e 1000 eventos, sem a cache de exportação.
+
+Cada caso é medido em `--rodadas` rodadas intercaladas com os outros casos
+(uma deriva da máquina afeta todos por igual); em cada rodada corre pelo
+menos `--min-reps` vezes e até somar `--min-tempo` segundos, com o GC
+desligado. O tempo do caso é a mediana das medianas das rodadas, e é esse que
+se compara com a baseline: o caso falha só quando fica mais de `--limiar`
+(fração) acima dela E mais de `--piso-ms` acima em valor absoluto (casos de
+microssegundos não falham por ruído).
+
+Uso:
+    python benchmarks/funcoes.py                       # compara com benchmarks/baseline_funcoes.json
+    python benchmarks/funcoes.py --gravar-baseline     # (re)grava a baseline nesta máquina
+    python benchmarks/funcoes.py --filtro parse_m3u --limiar 0.5 --json saida.json
+Sai com código 1 se algum caso regredir além do limiar.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(RAIZ, "benchmarks", "baseline_funcoes.json")
+sys.path.insert(0, RAIZ)
+
+# 200 pares de lambdas distintos (cada chamada "sem cache" faz contas novas)
+LAMBDAS = [(0.4 + 0.013 * i, 0.3 + 0.011 * (199 - i)) for i in range(200)]
+
+
+def playlist(n: int) -> str:
+    """Playlist M3U sintética com `n` canais, ao estilo das listas IPTV reais."""
+    linhas = ["#EXTM3U"]
+    for i in range(n):
+        linhas.append(f'#EXTINF:-1 tvg-id="canal{i}.pt" tvg-logo="http://logos.exemplo/{i}.png" '
+                      f'group-title="Grupo {i % 40}",Canal Desportivo {i} HD')
+        linhas.append(f"http://stream.exemplo:8080/live/user/pass/{i}.m3u8")
+    return "\n".join(linhas) + "\n"
+
+
+def historico_chat(n: int) -> list:
+    return [{"user": f"user{i % 7}", "msg": f"mensagem número {i} sobre o jogo de hoje", "dt": "21:30"}
+            for i in range(n)]
+
+
+def eventos_live(n: int) -> list:
+    tipos = ["Golo", "Expulsão", "Penalty", "Substituição", "Mudança de formação", "Amarelo"]
+    return [{"tipo": tipos[i % len(tipos)], "equipa": "Casa" if i % 2 else "Fora", "detalhes": f"min {i % 90}",
+             "importancia": "Normal", "posicao": "Médio"} for i in range(n)]
+
+
+def odds_1x2(n: int):
+    """Folha de `n` mercados 1X2 com margens de 2% a 12% (determinística)."""
+    import numpy as np
+    rng = np.random.default_rng(7)
+    p = np.clip(rng.dirichlet((3.0, 2.0, 2.5), n), 0.02, None)
+    p /= p.sum(axis=1, keepdims=True)
+    return 1.0 / (p * (1.0 + rng.uniform(0.02, 0.12, (n, 1))))
+
+
+def casos(pasta: str) -> list:
+    """[(nome, fn, preparar)]: `preparar()` corre fora do cronómetro e devolve os argumentos de fn."""
+    from cr7bot.armazenamento import safe_json_write
+    from cr7bot.chat import ChatLog
+    from cr7bot.margem import METODOS, remover_margem
+    from cr7bot.exportar import CACHE_EXPORT, export_detalhado
+    from cr7bot.m3u import parse_m3u
+    from cr7bot.mercados import escada_asiatica, matriz_resultados, poisson_outcome_probs, prob_btts, prob_over
+
+    out = []
+    for nome, fn, args in (
+        ("poisson_outcome_probs", poisson_outcome_probs, LAMBDAS),
+        ("prob_over", prob_over, [(a + b, 2.5) for a, b in LAMBDAS]),
+        ("prob_btts", prob_btts, LAMBDAS),
+    ):
+        def sem_cache(f=fn.sem_cache, args=args):
+            for a in args: f(*a)
+
+        def com_cache(f=fn, args=args):
+            for a in args: f(*a)
+        out.append((f"{nome}[200, sem cache]", sem_cache, None))
+        out.append((f"{nome}[200, cache]", com_cache, None))
+        for a in args: fn(*a)                     # enche a cache para o caso "cache"
+
+    folha = odds_1x2(10_000)
+    for metodo in METODOS:
+        out.append((f"remover_margem[{metodo}, 10k]", lambda m=metodo: remover_margem(folha, m), None))
+
+    casa, fora = zip(*LAMBDAS * 5)
+    for nome, m in (("1 jogo", matriz_resultados(*LAMBDAS[0])), ("1000 jogos", matriz_resultados(casa, fora))):
+        out.append((f"escada_asiatica[{nome}]", lambda m=m: escada_asiatica(m), None))
+
+    for n in (1_000, 100_000):
+        texto = playlist(n)
+        out.append((f"parse_m3u[{n}]", lambda texto=texto: parse_m3u(texto), None))
+
+    for n in (100, 1_000, 10_000):
+        msgs, alvo = historico_chat(n), os.path.join(pasta, f"chat_{n}.json")
+        out.append((f"safe_json_write[chat {n}]", lambda msgs=msgs, alvo=alvo: safe_json_write(alvo, msgs), None))
+    chat = ChatLog(os.path.join(pasta, "chat_log"))
+    msg = historico_chat(1)[0]
+    out.append(("chat.acrescentar[1 mensagem]", lambda: chat.acrescentar(msg), None))
+
+    base = {"Motivação_C": 3, "Motivação_F": 2, "Pressão_C": 1, "Desgaste_F": 2}
+    for n in (10, 1_000):
+        evs = eventos_live(n)
+        for formato in ("xlsx", "csv"):
+            out.append((f"export_detalhado[{formato}, {n} eventos]",
+                        lambda evs=evs, formato=formato: export_detalhado(base, evs, 1.2, 0.1, 1.3, formato=formato),
+                        lambda: CACHE_EXPORT.limpar() or ()))
+    return out
+
+
+def cronometrar(fn, preparar=None, min_reps: int = 5, min_tempo: float = 0.3, max_reps: int = 500) -> list:
+    """Uma rodada: durações (s) de pelo menos min_reps execuções, até somar min_tempo."""
+    tempos = []
+    gc_ligado = gc.isenabled()
+    gc.disable()
+    try:
+        while len(tempos) < max_reps and (len(tempos) < min_reps or sum(tempos) < min_tempo):
+            args = preparar() if preparar else ()
+            t0 = time.perf_counter()
+            fn(*args)
+            tempos.append(time.perf_counter() - t0)
+    finally:
+        if gc_ligado:
+            gc.enable()
+    return tempos
+
+
+def medir_casos(casos_sel: list, rodadas: int = 5, **kw) -> dict:
+    """Rodadas intercaladas; por caso: melhor, mediana das medianas das rodadas e nº de execuções."""
+    for _, fn, preparar in casos_sel:             # aquecimento (imports tardios, caches de módulo)
+        fn(*(preparar() if preparar else ()))
+    medianas = {nome: [] for nome, _, _ in casos_sel}
+    melhor, reps = {}, {}
+    for _ in range(rodadas):
+        for nome, fn, preparar in casos_sel:
+            t = cronometrar(fn, preparar, **kw)
+            medianas[nome].append(statistics.median(t))
+            melhor[nome] = min(melhor.get(nome, float("inf")), min(t))
+            reps[nome] = reps.get(nome, 0) + len(t)
+    return {nome: {"melhor_ms": melhor[nome] * 1e3, "mediana_ms": statistics.median(m) * 1e3,
+                   "dispersao": (max(m) - min(m)) / statistics.median(m) if len(m) > 1 else 0.0,
+                   "reps": reps[nome]}
+            for nome, m in medianas.items()}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--gravar-baseline", action="store_true", help="grava os tempos medidos como nova baseline")
+    ap.add_argument("--limiar", type=float, default=0.25, help="regressão máxima aceite (0.25 = +25%%)")
+    ap.add_argument("--piso-ms", type=float, default=0.25,
+                    help="diferença absoluta (ms) abaixo da qual nunca é regressão")
+    ap.add_argument("--filtro", default="", help="só casos cujo nome contém este texto")
+    ap.add_argument("--rodadas", type=int, default=5, help="rodadas intercaladas por caso")
+    ap.add_argument("--min-reps", type=int, default=5, help="execuções mínimas por rodada")
+    ap.add_argument("--min-tempo", type=float, default=0.2, help="segundos mínimos por caso em cada rodada")
+    ap.add_argument("--json", help="grava o relatório neste ficheiro")
+    args = ap.parse_args(argv)
+
+    pasta = tempfile.mkdtemp(prefix="cr7bench-")
+    try:
+        selecionados = [c for c in casos(pasta) if args.filtro in c[0]]
+        resultados = medir_casos(selecionados, args.rodadas, min_reps=args.min_reps, min_tempo=args.min_tempo)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    maquina = {"python": sys.version.split()[0], "plataforma": platform.platform(), "cpus": os.cpu_count()}
+    baseline = {}
+    if not args.gravar_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            dados = json.load(f)
+        baseline = dados.get("resultados", {})
+        if dados.get("maquina", {}).get("plataforma") != maquina["plataforma"]:
+            print("aviso: baseline gravada noutra máquina; regrave-a com --gravar-baseline para comparar a sério")
+
+    falhas = []
+    for nome, r in resultados.items():
+        ref = baseline.get(nome, {}).get("mediana_ms")
+        razao = r["mediana_ms"] / ref if ref else None
+        r["baseline_ms"], r["razao"] = ref, razao
+        marca = ""
+        if razao is not None and razao > 1 + args.limiar and r["mediana_ms"] - ref > args.piso_ms:
+            falhas.append(nome)
+            marca = "  <- REGRESSÃO"
+        comp = f"{razao:6.2f}x" if razao is not None else "   novo"
+        print(f"{nome:<42} {r['mediana_ms']:10.3f} ms  (melhor {r['melhor_ms']:.3f}, ±{r['dispersao']:.0%} entre rodadas, "
+              f"{r['reps']} reps) {comp}{marca}")
+
+    if args.gravar_baseline:
+        if os.path.exists(args.baseline):          # mantém os casos que não foram medidos (--filtro)
+            with open(args.baseline, encoding="utf-8") as f:
+                anteriores = json.load(f).get("resultados", {})
+        else:
+            anteriores = {}
+        anteriores.update({n: {"melhor_ms": round(r["melhor_ms"], 4), "mediana_ms": round(r["mediana_ms"], 4)}
+                           for n, r in resultados.items()})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"maquina": maquina, "gravada": time.strftime("%Y-%m-%d"), "resultados": anteriores},
+                      f, ensure_ascii=False, indent=2)
+        print(f"baseline gravada em {args.baseline}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"maquina": maquina, "limiar": args.limiar, "piso_ms": args.piso_ms, "rodadas": args.rodadas,
+                       "resultados": resultados}, f, ensure_ascii=False, indent=2)
+
+    if falhas:
+        print("FALHOU:", ", ".join(falhas))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
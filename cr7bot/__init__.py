@@ -0,0 +1,5 @@
+"""
+Núcleo de cálculo do PauloDamas-GPT (sem Streamlit).
+Os módulos aqui dentro podem ser importados por scripts, CLI e serviços
+sem arrancar a interface.
+"""
@@ -0,0 +1,31 @@
+# =============================== #
+#  Staking / valor esperado
+# =============================== #
+"""
+Odds justas, EV e critério de Kelly. Todas as funções aceitam escalares
+(interface Streamlit) ou arrays/Series (CLI e serviços em lote).
+"""
+
+import numpy as np
+
+from cr7bot.mercados import _escalar
+
+
+def odds_from_prob(p, eps: float = 1e-9):
+    p = np.maximum(np.asarray(p, dtype=float), eps)
+    return _escalar(1.0 / p)
+
+
+def kelly_criterion(prob, odd, banca, fracao=1, max_frac=0.25):
+    """Critério de Kelly limitado a 25% da banca por segurança."""
+    prob = np.asarray(prob, dtype=float)
+    b = np.asarray(odd, dtype=float) - 1
+    q = 1 - prob
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f = np.where(b > 0, ((b * prob - q) / np.where(b > 0, b, 1)) * fracao, 0.0)
+    f = np.maximum(0, f)
+    return _escalar(np.asarray(banca, dtype=float) * np.minimum(f, max_frac))
+
+
+def calc_ev(p, o):
+    return _escalar(np.round(np.asarray(o, dtype=float) * np.asarray(p, dtype=float) - 1, 2))
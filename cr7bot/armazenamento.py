@@ -0,0 +1,375 @@
+# =============================== #
+#  Armazenamento (JSON ou SQLite/WAL)
+# =============================== #
+"""
+Camada de persistência com dois backends intercambiáveis:
+
+- ArmazemJSON: os ficheiros JSON de sempre (instalações de um só utilizador).
+  Cada alteração é um read-modify-write sob lock do ficheiro-alvo; as
+  leituras passam pela CACHE_JSON e só tocam no disco quando o ficheiro muda.
+- ArmazemSQLite: uma base SQLite em modo WAL com uma ligação partilhada por
+  processo; as alterações são por linha (um utilizador, uma equipa, um peso,
+  uma mensagem), nunca reescritas do estado inteiro.
+
+O backend é escolhido por CR7_ARMAZEM=json|sqlite (por omissão json).
+migrar_json_para_sqlite() importa uma única vez os ficheiros JSON existentes.
+"""
+
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from cr7bot.cache import CacheJSON
+from cr7bot.chat import obter_chat
+from cr7bot.instrumentacao import contar_ficheiro, medir
+
+# Leituras JSON partilhadas pelo processo, revalidadas por stat() (ver CacheJSON).
+CACHE_JSON = CacheJSON()
+
+
+# ======== JSON: escrita segura ========
+@contextmanager
+def _lock_ficheiro(filepath: str):
+    """flock exclusivo num ficheiro irmão `<alvo>.lock` (o alvo é substituído por os.replace)."""
+    with open(filepath + ".lock", "a") as lf:
+        fcntl.flock(lf, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lf, fcntl.LOCK_UN)
+
+
+@medir("json.escrever")
+def _escrever_json(filepath, data) -> None:
+    tmp = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    contar_ficheiro("json", tmp)
+    os.replace(tmp, filepath)
+
+
+def safe_json_write(filepath, data, retries=5):
+    """Escreve JSON com lock de ficheiro para evitar corrupção."""
+    for _ in range(retries):
+        try:
+            with _lock_ficheiro(filepath):
+                _escrever_json(filepath, data)
+            return True
+        except Exception:
+            time.sleep(0.1)
+    return False
+
+
+def ler_json(filepath, default=None):
+    if os.path.exists(filepath):
+        with open(filepath, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return default
+
+
+def atualizar_json(filepath, fn, default=None):
+    """Read-modify-write atómico: lê, aplica fn(data) -> data e grava, tudo sob o mesmo lock."""
+    with _lock_ficheiro(filepath):
+        data = fn(ler_json(filepath, default))
+        _escrever_json(filepath, data)
+    return data
+
+
+# ======== Backend JSON ========
+class ArmazemJSON:
+    tipo = "json"
+
+    def __init__(self, users_file="users.json", custom_file="ligas_e_equipas_custom.json",
+                 pesos_file="pesos_personalizados.json", chat_dir="chat_log", chat_legado="chat.json",
+                 online_file="online_users.json", favs_file="favoritos_m3u.json"):
+        self.users_file, self.custom_file, self.pesos_file = users_file, custom_file, pesos_file
+        self.chat_dir, self.chat_legado = chat_dir, chat_legado
+        self.online_file, self.favs_file = online_file, favs_file
+
+    # --- utilizadores
+    def utilizadores(self) -> dict:
+        return CACHE_JSON.ler(self.users_file, {})
+
+    def definir_utilizador(self, user: str, hashed: str) -> None:
+        atualizar_json(self.users_file, lambda d: {**d, user: hashed}, {})
+
+    # --- ligas / equipas personalizadas
+    def carregar_custom(self) -> dict:
+        return CACHE_JSON.ler(self.custom_file, {}, mutavel=True)
+
+    def guardar_custom(self, data: dict) -> None:
+        safe_json_write(self.custom_file, data)
+
+    def adicionar_liga(self, liga: str) -> None:
+        def f(d):
+            d.setdefault("ligas", {}).setdefault(liga, [])
+            return d
+        atualizar_json(self.custom_file, f, {})
+
+    def adicionar_equipa(self, liga: str, equipa: str) -> None:
+        def f(d):
+            eq = d.setdefault("ligas", {}).setdefault(liga, [])
+            if equipa not in eq: eq.append(equipa)
+            return d
+        atualizar_json(self.custom_file, f, {})
+
+    # --- pesos
+    def carregar_pesos(self):
+        return CACHE_JSON.ler(self.pesos_file, None, mutavel=True)
+
+    def guardar_pesos(self, pesos: dict) -> None:
+        safe_json_write(self.pesos_file, pesos)
+
+    # --- chat
+    def _chat(self):
+        return obter_chat(self.chat_dir, legado=self.chat_legado)
+
+    def acrescentar_mensagem(self, msg: dict) -> None:
+        self._chat().acrescentar(msg)
+
+    def mensagens_desde(self, cursor=None):
+        return self._chat().ler_desde(cursor)
+
+    def ultimas_mensagens(self, n: int = 50):
+        return self._chat().ultimas(n)
+
+    def todas_mensagens(self) -> list:
+        """Histórico completo só para leitura (não importa nem renomeia o chat.json legado)."""
+        return self._chat().todas_sem_migrar()
+
+    # --- presença
+    def gravar_presenca(self, data: dict) -> None:
+        safe_json_write(self.online_file, data)
+
+    def presenca(self) -> dict:
+        return CACHE_JSON.ler(self.online_file, {})
+
+    # --- favoritos
+    def carregar_favs(self) -> dict:
+        try: return CACHE_JSON.ler(self.favs_file, {}, mutavel=True)
+        except Exception: return {}
+
+    def guardar_favs(self, data: dict) -> None:
+        safe_json_write(self.favs_file, data)
+
+    def definir_favorito(self, chave: str, valor) -> None:
+        atualizar_json(self.favs_file, lambda d: {**d, chave: valor}, {})
+
+    def remover_favorito(self, chave: str) -> None:
+        atualizar_json(self.favs_file, lambda d: {k: v for k, v in d.items() if k != chave}, {})
+
+
+# ======== Backend SQLite (WAL) ========
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS utilizadores (user TEXT PRIMARY KEY, hash TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS ligas (liga TEXT PRIMARY KEY, ordem INTEGER);
+CREATE TABLE IF NOT EXISTS equipas (liga TEXT NOT NULL, equipa TEXT NOT NULL, ordem INTEGER,
+                                    PRIMARY KEY (liga, equipa));
+CREATE TABLE IF NOT EXISTS pesos (chave TEXT PRIMARY KEY, valor REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS chat (id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT, msg TEXT, dt TEXT);
+CREATE TABLE IF NOT EXISTS online (user TEXT PRIMARY KEY, online INTEGER NOT NULL, dt TEXT);
+CREATE TABLE IF NOT EXISTS favoritos (chave TEXT PRIMARY KEY, valor TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT);
+"""
+
+
+class ArmazemSQLite:
+    tipo = "sqlite"
+
+    def __init__(self, db_path: str = "cr7bot.db"):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._con = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA synchronous=NORMAL")
+        self._con.executescript(_ESQUEMA)
+
+    @contextmanager
+    def _tx(self):
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._con
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+            self._con.execute("COMMIT")
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._con.execute(sql, args).fetchall()
+
+    # --- utilizadores
+    def utilizadores(self) -> dict:
+        return dict(self._query("SELECT user, hash FROM utilizadores"))
+
+    def definir_utilizador(self, user: str, hashed: str) -> None:
+        with self._tx() as c:
+            c.execute("INSERT OR REPLACE INTO utilizadores(user, hash) VALUES (?, ?)", (user, hashed))
+
+    # Os _gravar_* escrevem dentro de uma transação já aberta (c = ligação em BEGIN).
+    @staticmethod
+    def _gravar_custom(c, data: dict) -> None:
+        c.execute("DELETE FROM equipas"); c.execute("DELETE FROM ligas")
+        for liga, equipas in (data.get("ligas") or {}).items():
+            ArmazemSQLite._inserir_liga(c, liga)
+            for eq in equipas: ArmazemSQLite._inserir_equipa(c, liga, eq)
+
+    @staticmethod
+    def _gravar_pesos(c, pesos: dict) -> None:
+        c.executemany("INSERT OR REPLACE INTO pesos(chave, valor) VALUES (?, ?)",
+                      [(k, float(v)) for k, v in pesos.items()])
+
+    @staticmethod
+    def _gravar_presenca(c, data: dict) -> None:
+        c.execute("DELETE FROM online")
+        c.executemany("INSERT INTO online(user, online, dt) VALUES (?, ?, ?)",
+                      [(u, int(bool(v.get("online"))), v.get("dt")) for u, v in data.items()])
+
+    @staticmethod
+    def _gravar_favs(c, data: dict) -> None:
+        c.execute("DELETE FROM favoritos")
+        c.executemany("INSERT INTO favoritos(chave, valor) VALUES (?, ?)",
+                      [(k, json.dumps(v, ensure_ascii=False)) for k, v in data.items()])
+
+    # --- ligas / equipas personalizadas
+    def carregar_custom(self) -> dict:
+        ligas = {l: [] for (l,) in self._query("SELECT liga FROM ligas ORDER BY ordem")}
+        for liga, equipa in self._query("SELECT liga, equipa FROM equipas ORDER BY ordem"):
+            ligas.setdefault(liga, []).append(equipa)
+        return {"ligas": ligas} if ligas else {}
+
+    def guardar_custom(self, data: dict) -> None:
+        with self._tx() as c:
+            self._gravar_custom(c, data)
+
+    @staticmethod
+    def _inserir_liga(c, liga):
+        c.execute("INSERT OR IGNORE INTO ligas(liga, ordem) "
+                  "VALUES (?, (SELECT COALESCE(MAX(ordem), 0) + 1 FROM ligas))", (liga,))
+
+    @staticmethod
+    def _inserir_equipa(c, liga, equipa):
+        c.execute("INSERT OR IGNORE INTO equipas(liga, equipa, ordem) "
+                  "VALUES (?, ?, (SELECT COALESCE(MAX(ordem), 0) + 1 FROM equipas))", (liga, equipa))
+
+    def adicionar_liga(self, liga: str) -> None:
+        with self._tx() as c:
+            self._inserir_liga(c, liga)
+
+    def adicionar_equipa(self, liga: str, equipa: str) -> None:
+        with self._tx() as c:
+            self._inserir_liga(c, liga)
+            self._inserir_equipa(c, liga, equipa)
+
+    # --- pesos
+    def carregar_pesos(self):
+        rows = self._query("SELECT chave, valor FROM pesos")
+        return dict(rows) if rows else None
+
+    def guardar_pesos(self, pesos: dict) -> None:
+        with self._tx() as c:
+            self._gravar_pesos(c, pesos)
+
+    # --- chat (cursor = último id lido)
+    def acrescentar_mensagem(self, msg: dict) -> None:
+        with self._tx() as c:
+            c.execute("INSERT INTO chat(user, msg, dt) VALUES (?, ?, ?)",
+                      (msg.get("user"), msg.get("msg"), msg.get("dt")))
+
+    def mensagens_desde(self, cursor=None):
+        rows = self._query("SELECT id, user, msg, dt FROM chat WHERE id > ? ORDER BY id", (cursor or 0,))
+        msgs = [{"user": u, "msg": m, "dt": dt} for _, u, m, dt in rows]
+        return msgs, (rows[-1][0] if rows else (cursor or 0))
+
+    def ultimas_mensagens(self, n: int = 50):
+        rows = self._query("SELECT id, user, msg, dt FROM chat ORDER BY id DESC LIMIT ?", (n,))[::-1]
+        ultimo = self._query("SELECT COALESCE(MAX(id), 0) FROM chat")[0][0]
+        return [{"user": u, "msg": m, "dt": dt} for _, u, m, dt in rows], ultimo
+
+    def todas_mensagens(self) -> list:
+        return self.mensagens_desde()[0]
+
+    # --- presença
+    def gravar_presenca(self, data: dict) -> None:
+        with self._tx() as c:
+            self._gravar_presenca(c, data)
+
+    def presenca(self) -> dict:
+        return {u: {"online": bool(o), "dt": dt} for u, o, dt in self._query("SELECT user, online, dt FROM online")}
+
+    # --- favoritos
+    def carregar_favs(self) -> dict:
+        return {k: json.loads(v) for k, v in self._query("SELECT chave, valor FROM favoritos")}
+
+    def guardar_favs(self, data: dict) -> None:
+        with self._tx() as c:
+            self._gravar_favs(c, data)
+
+    def definir_favorito(self, chave: str, valor) -> None:
+        with self._tx() as c:
+            c.execute("INSERT OR REPLACE INTO favoritos(chave, valor) VALUES (?, ?)",
+                      (chave, json.dumps(valor, ensure_ascii=False)))
+
+    def remover_favorito(self, chave: str) -> None:
+        with self._tx() as c:
+            c.execute("DELETE FROM favoritos WHERE chave = ?", (chave,))
+
+    # --- migração
+    def _migrado(self) -> bool:
+        return bool(self._query("SELECT 1 FROM meta WHERE chave = 'migrado_json'"))
+
+    def migrar_de(self, origem: ArmazemJSON) -> bool:
+        """
+        Copia uma única vez o conteúdo de um ArmazemJSON. Devolve False se já foi feito.
+        Tudo (verificação, cópia e marca 'migrado_json') numa só transação BEGIN IMMEDIATE:
+        dois processos a arrancar ao mesmo tempo não duplicam nada, e um crash a meio
+        não deixa metade migrada.
+        """
+        # caso normal (já migrado): um SELECT e nada lido dos JSON; a transação volta a verificar
+        if self._migrado():
+            return False
+        # lê tudo antes de abrir a transação (a origem não é alterada: o chat.json fica onde está)
+        users, custom, pesos = origem.utilizadores(), origem.carregar_custom() or {}, origem.carregar_pesos()
+        chat, online, favs = origem.todas_mensagens(), origem.presenca() or {}, origem.carregar_favs() or {}
+        with self._tx() as c:
+            if self._migrado():
+                return False
+            c.executemany("INSERT OR REPLACE INTO utilizadores(user, hash) VALUES (?, ?)", list(users.items()))
+            self._gravar_custom(c, custom)
+            if pesos: self._gravar_pesos(c, pesos)
+            c.executemany("INSERT INTO chat(user, msg, dt) VALUES (?, ?, ?)",
+                          [(m.get("user"), m.get("msg"), m.get("dt")) for m in chat])
+            self._gravar_presenca(c, online)
+            self._gravar_favs(c, favs)
+            c.execute("INSERT INTO meta(chave, valor) VALUES ('migrado_json', ?)", (time.strftime("%Y-%m-%d %H:%M"),))
+        return True
+
+
+def migrar_json_para_sqlite(db_path: str = "cr7bot.db", **ficheiros_json) -> bool:
+    return ArmazemSQLite(db_path).migrar_de(ArmazemJSON(**ficheiros_json))
+
+
+_INSTANCIAS: dict = {}
+_LOCK_INSTANCIAS = threading.Lock()
+
+
+def obter_armazem(tipo: str = None, db_path: str = None, **ficheiros_json):
+    """Backend partilhado pelo processo. tipo/db_path por omissão vêm de CR7_ARMAZEM / CR7_DB."""
+    tipo = (tipo or os.environ.get("CR7_ARMAZEM", "json")).lower()
+    db_path = db_path or os.environ.get("CR7_DB", "cr7bot.db")
+    chave = (tipo, db_path if tipo == "sqlite" else tuple(sorted(ficheiros_json.items())))
+    with _LOCK_INSTANCIAS:
+        if chave in _INSTANCIAS:
+            return _INSTANCIAS[chave]
+        if tipo == "sqlite":
+            arm = ArmazemSQLite(db_path)
+            arm.migrar_de(ArmazemJSON(**ficheiros_json))
+        else:
+            arm = ArmazemJSON(**ficheiros_json)
+        _INSTANCIAS[chave] = arm
+        return arm
@@ -0,0 +1,15 @@
+# ======== LOGIN (bcrypt importado só quando é preciso) =========
+from cr7bot.instrumentacao import medir
+
+@medir("auth.hash_pwd")
+def hash_pwd(pwd: str) -> str:
+    import bcrypt
+    return bcrypt.hashpw(pwd.encode(), bcrypt.gensalt()).decode()
+
+@medir("auth.verify_pwd")
+def verify_pwd(pwd: str, hashed: str) -> bool:
+    try:
+        import bcrypt
+        return bcrypt.checkpw(pwd.encode(), hashed.encode())
+    except Exception:
+        return False
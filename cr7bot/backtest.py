@@ -0,0 +1,253 @@
+# =============================== #
+#  Backtest e calibração dos pesos
+# =============================== #
+"""
+Repete um histórico de jogos (odds + resultado) pelo modelo de preços e pela
+stake de Kelly da app, e mede ROI, drawdown máximo, log-loss do 1X2 e CLV.
+A grelha de pesos do "Painel de Pesos" é avaliada num ProcessPoolExecutor
+(todos os núcleos; processos vindos de um forkserver, porque a app chama isto
+de dentro do servidor Streamlit, já cheio de threads); o vencedor pode ser
+escrito diretamente em PESOS_FILE.
+
+Como os pesos entram no modelo: cada fator tem uma coluna por equipa no
+histórico (`Motivação_C`, `Motivação_F`, ...; em falta = 0) e
+
+    λ_casa = lambda_casa · (1 + Σ peso[f_C] · f_C)
+    λ_fora = lambda_fora · (1 + Σ peso[f_F] · f_F)
+
+Colunas do histórico (como em cr7bot.lote):
+    golos_casa, golos_fora, odd_casa, odd_empate, odd_fora     (obrigatórias)
+    lambda_casa, lambda_fora      (opcionais; senão vêm de cr7bot.forca em walk-forward)
+    odd_casa_fecho, odd_empate_fecho, odd_fora_fecho           (opcionais, para o CLV)
+    casa, fora, data              (necessárias só sem lambdas)
+
+Sem lambdas, o modelo de força é ajustado em walk-forward: os λ de cada jogo
+vêm de um ajuste feito só com os jogos de datas anteriores (reajuste a cada
+data nova, a partir do ajuste anterior). Os jogos sem modelo ainda (primeiros
+`min_treino` jogos, equipas sem histórico) ficam fora da avaliação. Assim as
+métricas e os pesos calibrados são fora da amostra.
+
+Uso:
+    python -m cr7bot.backtest historico.csv --valores 0,0.01,0.02 --objetivo logloss \\
+        --escrever pesos_personalizados.json
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cr7bot.apostas import kelly_criterion
+from cr7bot.mercados import MAX_GOLOS, pmf_golos
+from cr7bot.pesos import FATORES, PESOS_PADRAO
+
+RESULTADOS = ("casa", "empate", "fora")
+OBJETIVOS = {"logloss": False, "roi": True, "banca": True}   # True = maior é melhor
+MIN_TREINO = 50
+
+
+def lambdas_walk_forward(casa, fora, golos_casa, golos_fora, datas, meia_vida_dias=365,
+                         min_treino: int = MIN_TREINO) -> tuple:
+    """
+    (λ_casa, λ_fora) de cada jogo (ordenados por data) com o modelo ajustado só
+    aos jogos de datas estritamente anteriores. NaN onde ainda não há previsão.
+    """
+    from cr7bot.forca import ajustar
+
+    casa, fora = np.asarray(casa, dtype=str), np.asarray(fora, dtype=str)
+    gc, gf = np.asarray(golos_casa, dtype=float), np.asarray(golos_fora, dtype=float)
+    n = len(casa)
+    lc, lf = np.full(n, np.nan), np.full(n, np.nan)
+    _, inicios = np.unique(datas, return_index=True)
+    fins = np.append(inicios[1:], n)
+    modelo = None
+    for i0, i1 in zip(inicios, fins):
+        if i0 >= min_treino:
+            modelo = ajustar(casa[:i0], fora[:i0], gc[:i0], gf[:i0], datas=datas[:i0],
+                             meia_vida_dias=meia_vida_dias, inicio=modelo)
+        if modelo is None:
+            continue
+        for j in range(i0, i1):
+            if casa[j] in modelo and fora[j] in modelo:
+                lc[j], lf[j] = modelo.lambdas(casa[j], fora[j])
+    return lc, lf
+
+
+def preparar(df, min_treino: int = MIN_TREINO) -> dict:
+    """DataFrame do histórico -> arrays NumPy usados por avaliar() (sem pandas nos workers)."""
+    if "lambda_casa" in df and "lambda_fora" in df:
+        lc, lf = df["lambda_casa"].to_numpy(float), df["lambda_fora"].to_numpy(float)
+    else:
+        import pandas as pd
+        if not all(c in df for c in ("casa", "fora", "data")):
+            raise ValueError("sem lambda_casa/lambda_fora são precisas as colunas casa, fora e data "
+                             "(o modelo é ajustado só com jogos anteriores a cada data)")
+        datas = pd.to_datetime(df["data"], dayfirst=True, errors="coerce")
+        df = df[datas.notna()].iloc[np.argsort(datas[datas.notna()].to_numpy(), kind="stable")]
+        lc, lf = lambdas_walk_forward(df["casa"], df["fora"], df["golos_casa"], df["golos_fora"],
+                                      pd.to_datetime(df["data"], dayfirst=True).to_numpy(), min_treino=min_treino)
+        com_previsao = ~np.isnan(lc)
+        if not com_previsao.any():
+            raise ValueError(f"histórico curto: são precisos mais de {min_treino} jogos com data")
+        df, lc, lf = df[com_previsao], lc[com_previsao], lf[com_previsao]
+    n = len(df)
+    gc, gf = df["golos_casa"].to_numpy(int), df["golos_fora"].to_numpy(int)
+    dados = {
+        "lambda_casa": lc, "lambda_fora": lf,
+        "resultado": np.where(gc > gf, 0, np.where(gc == gf, 1, 2)),
+        "odds": np.column_stack([df[f"odd_{r}"].to_numpy(float) for r in RESULTADOS]),
+        "fatores_C": np.column_stack([df[f"{f}_C"].fillna(0).to_numpy(float) if f"{f}_C" in df else np.zeros(n) for f in FATORES]),
+        "fatores_F": np.column_stack([df[f"{f}_F"].fillna(0).to_numpy(float) if f"{f}_F" in df else np.zeros(n) for f in FATORES]),
+    }
+    if all(f"odd_{r}_fecho" in df for r in RESULTADOS):
+        dados["odds_fecho"] = np.column_stack([df[f"odd_{r}_fecho"].to_numpy(float) for r in RESULTADOS])
+    return dados
+
+
+def probs_1x2(l_casa, l_fora, max_goals: int = MAX_GOLOS) -> np.ndarray:
+    """
+    (N, 3) com P(1), P(X), P(2) — os mesmos valores que precos_mercados (matriz
+    normalizada), mas sem construir a matriz: P(1) = Σ_i p_casa(i)·F_fora(i-1).
+    """
+    pc, pf = pmf_golos(l_casa, max_goals), pmf_golos(l_fora, max_goals)
+    cdf_f = np.cumsum(pf, axis=-1)
+    p1 = np.sum(pc[..., 1:] * cdf_f[..., :-1], axis=-1)
+    px = np.sum(pc * pf, axis=-1)
+    total = pc.sum(axis=-1) * cdf_f[..., -1]
+    return np.stack([p1, px, total - p1 - px], axis=-1) / total[..., None]
+
+
+def avaliar(dados: dict, pesos: dict, banca: float = 100.0, fracao: float = 0.5, max_frac: float = 0.05,
+            ev_min: float = 0.0) -> dict:
+    """
+    Métricas de um conjunto de pesos. Em cada jogo aposta-se no resultado
+    1X2 de maior EV (se EV > ev_min) com a stake de Kelly sobre a banca do
+    momento; a banca evolui por produto acumulado (sem ciclo em Python).
+    """
+    wc = np.array([pesos.get(f"{f}_C", 0.0) for f in FATORES])
+    wf = np.array([pesos.get(f"{f}_F", 0.0) for f in FATORES])
+    lc = np.maximum(dados["lambda_casa"] * (1 + dados["fatores_C"] @ wc), 0.01)
+    lf = np.maximum(dados["lambda_fora"] * (1 + dados["fatores_F"] @ wf), 0.01)
+    probs = probs_1x2(lc, lf)
+    n = len(probs)
+    linhas = np.arange(n)
+    res = dados["resultado"]
+    logloss = float(-np.mean(np.log(np.clip(probs[linhas, res], 1e-12, 1.0))))
+
+    odds = dados["odds"]
+    ev = probs * odds - 1
+    escolha = np.argmax(ev, axis=1)
+    aposta = ev[linhas, escolha] > ev_min
+    p_esc, o_esc = probs[linhas, escolha], odds[linhas, escolha]
+    frac = np.where(aposta, np.atleast_1d(kelly_criterion(p_esc, o_esc, 1.0, fracao, max_frac)), 0.0)
+    retorno = np.where(escolha == res, o_esc - 1, -1.0)
+    curva = banca * np.cumprod(1 + frac * retorno)
+    antes = np.concatenate([[banca], curva[:-1]])
+    stakes = frac * antes
+    total_apostado = float(stakes.sum())
+    lucro = float(curva[-1] - banca) if n else 0.0
+    pico = np.maximum.accumulate(np.concatenate([[banca], curva]))
+    drawdown = float(np.max(1 - np.concatenate([[banca], curva]) / pico)) if n else 0.0
+
+    out = {
+        "apostas": int(aposta.sum()), "jogos": n, "total_apostado": total_apostado, "lucro": lucro,
+        "roi": lucro / total_apostado if total_apostado else 0.0, "banca": float(curva[-1]) if n else banca,
+        "drawdown_max": drawdown, "logloss": logloss, "clv": None,
+    }
+    if "odds_fecho" in dados and aposta.any():
+        fecho = dados["odds_fecho"][linhas, escolha][aposta]
+        out["clv"] = float(np.mean(o_esc[aposta] / fecho - 1))
+    return out
+
+
+def grelha_pesos(valores=(0.0, 0.01, 0.02), fatores=FATORES, simetrica: bool = True, base: dict = None):
+    """
+    Conjuntos de pesos a testar: produto cartesiano de `valores` por fator.
+    simetrica=True usa o mesmo peso para _C e _F (8 dimensões em vez de 16).
+    Fatores fora de `fatores` ficam com o valor de `base` (por omissão PESOS_PADRAO).
+    """
+    base = dict(PESOS_PADRAO if base is None else base)
+    chaves = [(f"{f}_C", f"{f}_F") for f in fatores] if simetrica else [(f"{f}_{l}",) for f in fatores for l in "CF"]
+    for combo in itertools.product(valores, repeat=len(chaves)):
+        p = dict(base)
+        for ks, v in zip(chaves, combo):
+            for k in ks: p[k] = v
+        yield p
+
+
+# ---- pool de processos: os dados vão para cada worker uma única vez (initializer) ----
+_DADOS_WORKER = None
+
+
+def _iniciar_worker(dados, opcoes):
+    global _DADOS_WORKER
+    _DADOS_WORKER = (dados, opcoes)
+
+
+def _avaliar_worker(pesos):
+    dados, opcoes = _DADOS_WORKER
+    return pesos, avaliar(dados, pesos, **opcoes)
+
+
+def calibrar(dados: dict, candidatos, objetivo: str = "logloss", processos: int = None,
+             top: int = 10, **opcoes) -> list:
+    """Avalia todos os candidatos em paralelo. Devolve os `top` melhores [(pesos, métricas)]."""
+    if objetivo not in OBJETIVOS:
+        raise ValueError(f"objetivo inválido: {objetivo} (use {', '.join(OBJETIVOS)})")
+    maior_melhor = OBJETIVOS[objetivo]
+    candidatos = list(candidatos)
+    processos = processos or os.cpu_count() or 1
+    if processos == 1 or len(candidatos) < 2:
+        resultados = [(p, avaliar(dados, p, **opcoes)) for p in candidatos]
+    else:
+        metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
+        with ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context(metodo),
+                                 initializer=_iniciar_worker, initargs=(dados, opcoes)) as ex:
+            resultados = list(ex.map(_avaliar_worker, candidatos,
+                                     chunksize=max(1, len(candidatos) // (processos * 8))))
+    resultados.sort(key=lambda pm: pm[1][objetivo], reverse=maior_melhor)
+    return resultados[:top]
+
+
+def main(argv=None) -> int:
+    import pandas as pd
+    from cr7bot.armazenamento import safe_json_write
+
+    ap = argparse.ArgumentParser(prog="python -m cr7bot.backtest",
+                                 description="Backtest do modelo e calibração dos pesos (grelha em paralelo).")
+    ap.add_argument("historico", help="CSV/Parquet com resultados e odds (ver docstring do módulo)")
+    ap.add_argument("--valores", default="0,0.01,0.02", help="valores de peso a testar por fator")
+    ap.add_argument("--objetivo", choices=list(OBJETIVOS), default="logloss")
+    ap.add_argument("--assimetrica", action="store_true", help="pesos _C e _F independentes (grelha muito maior)")
+    ap.add_argument("--banca", type=float, default=100.0)
+    ap.add_argument("--fracao", type=float, default=0.5, help="fração de Kelly")
+    ap.add_argument("--max-frac", type=float, default=0.05, help="limite da stake em fração da banca")
+    ap.add_argument("--processos", type=int, default=None)
+    ap.add_argument("--escrever", metavar="PESOS_FILE", help="grava os pesos vencedores neste JSON")
+    args = ap.parse_args(argv)
+
+    df = pd.read_parquet(args.historico) if args.historico.endswith((".parquet", ".pq")) else pd.read_csv(args.historico)
+    dados = preparar(df)
+    valores = tuple(float(v) for v in args.valores.split(","))
+    opcoes = dict(banca=args.banca, fracao=args.fracao, max_frac=args.max_frac)
+    atual = avaliar(dados, PESOS_PADRAO, **opcoes)
+    top = calibrar(dados, grelha_pesos(valores, simetrica=not args.assimetrica), args.objetivo,
+                   args.processos, top=5, **opcoes)
+    print(f"pesos padrão: {args.objetivo}={atual[args.objetivo]:.4f} roi={atual['roi']:.2%} "
+          f"drawdown={atual['drawdown_max']:.1%}")
+    for i, (p, m) in enumerate(top, 1):
+        clv = "-" if m["clv"] is None else f"{m['clv']:.2%}"
+        print(f"#{i} {args.objetivo}={m[args.objetivo]:.4f} roi={m['roi']:.2%} drawdown={m['drawdown_max']:.1%} "
+              f"apostas={m['apostas']} clv={clv}")
+    if args.escrever and top:
+        safe_json_write(args.escrever, top[0][0])
+        print(f"pesos vencedores gravados em {args.escrever}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
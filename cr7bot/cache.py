@@ -0,0 +1,216 @@
+# =============================== #
+#  Caches partilhadas no processo
+# =============================== #
+"""
+Caches ao nível do módulo: ficam partilhadas por todas as sessões Streamlit
+do mesmo processo (ao contrário de st.session_state).
+- CacheLRU / CacheQuantizada: resultados de cálculos (probabilidades).
+- CacheBytes: respostas já serializadas, limitada também pelo total de bytes.
+- CacheJSON: ficheiros JSON lidos do disco, revalidados por stat().
+"""
+
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from numbers import Real
+from types import MappingProxyType
+
+from cr7bot.instrumentacao import medir
+
+_FALTA = object()
+
+
+class CacheLRU:
+    """Dicionário limitado com despejo LRU e contadores de hits/misses (thread-safe)."""
+
+    def __init__(self, max_itens: int = 4096):
+        self.max_itens = max(1, int(max_itens))
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chave, default=None):
+        with self._lock:
+            val = self._dados.get(chave, _FALTA)
+            if val is _FALTA:
+                self.misses += 1
+                return default
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return val
+
+    def put(self, chave, valor) -> None:
+        with self._lock:
+            self._dados[chave] = valor
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_itens:
+                self._dados.popitem(last=False)
+
+    def obter_ou_calcular(self, chave, fn):
+        val = self.get(chave, _FALTA)
+        if val is _FALTA:
+            val = fn()
+            self.put(chave, val)
+        return val
+
+    def redimensionar(self, max_itens: int) -> None:
+        with self._lock:
+            self.max_itens = max(1, int(max_itens))
+            while len(self._dados) > self.max_itens:
+                self._dados.popitem(last=False)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._dados.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self): return len(self._dados)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses,
+            "tamanho": len(self._dados), "max_itens": self.max_itens,
+            "taxa_hits": (self.hits / total) if total else 0.0,
+        }
+
+
+class CacheQuantizada(CacheLRU):
+    """CacheLRU cujas chaves numéricas são arredondadas a `casas` decimais."""
+
+    def __init__(self, max_itens: int = 4096, casas: int = 4):
+        super().__init__(max_itens)
+        self.casas = int(casas)
+
+    def quantizar(self, v):
+        return round(float(v), self.casas)
+
+
+class CacheBytes(CacheLRU):
+    """
+    CacheLRU de valores bytes limitada também por `max_bytes` no total; valores
+    com mais de `max_valor` bytes não entram (não expulsam a cache inteira).
+    """
+
+    def __init__(self, max_itens: int = 4096, max_bytes: int = 64 << 20, max_valor: int = 1 << 20):
+        super().__init__(max_itens)
+        self.max_bytes = int(max_bytes)
+        self.max_valor = min(int(max_valor), self.max_bytes)
+        self.bytes = 0
+
+    def put(self, chave, valor) -> None:
+        if len(valor) > self.max_valor:
+            return
+        with self._lock:
+            antigo = self._dados.pop(chave, None)
+            if antigo is not None:
+                self.bytes -= len(antigo)
+            self._dados[chave] = valor
+            self.bytes += len(valor)
+            self._despejar()
+
+    def _despejar(self) -> None:
+        while len(self._dados) > self.max_itens or self.bytes > self.max_bytes:
+            _, v = self._dados.popitem(last=False)
+            self.bytes -= len(v)
+
+    def redimensionar(self, max_itens: int) -> None:
+        with self._lock:
+            self.max_itens = max(1, int(max_itens))
+            self._despejar()
+
+    def limpar(self) -> None:
+        super().limpar()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        return {**super().stats(), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+def memo_quantizada(cache: CacheQuantizada):
+    """
+    Memoiza chamadas com argumentos escalares. Os números são quantizados
+    (e a função corre já com os valores quantizados, para o resultado ser
+    o mesmo para toda a chave). Chamadas com arrays passam ao lado da cache.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            vals = list(args) + list(kwargs.values())
+            if not all(isinstance(v, Real) for v in vals):
+                return fn(*args, **kwargs)
+            qargs = tuple(cache.quantizar(a) if isinstance(a, float) else a for a in args)
+            qkw = {k: (cache.quantizar(v) if isinstance(v, float) else v) for k, v in kwargs.items()}
+            chave = (fn.__name__, qargs, tuple(sorted(qkw.items())))
+            return cache.obter_ou_calcular(chave, lambda: fn(*qargs, **qkw))
+        wrapper.sem_cache = fn
+        return wrapper
+    return deco
+
+
+# ======== Cache de ficheiros JSON validada por stat() ========
+def congelar(obj):
+    """Vista só de leitura de uma árvore JSON (dict -> MappingProxyType, list -> tuple)."""
+    if isinstance(obj, dict):
+        return MappingProxyType({k: congelar(v) for k, v in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(congelar(v) for v in obj)
+    return obj
+
+
+def descongelar(obj):
+    """Cópia mutável e independente de uma árvore congelada (dict/list novos)."""
+    if isinstance(obj, Mapping):
+        return {k: descongelar(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return [descongelar(v) for v in obj]
+    return obj
+
+
+class CacheJSON:
+    """
+    Devolve o JSON já interpretado enquanto (mtime, tamanho, inode) do ficheiro
+    não mudar; só então volta a ler do disco. O objeto guardado está congelado:
+    `ler()` dá uma vista só de leitura (partilhada) ou, com mutavel=True, uma
+    cópia privada que o chamador pode alterar à vontade.
+    """
+
+    def __init__(self):
+        self._dados = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.recargas = 0
+
+    @medir("json.ler")
+    def ler(self, path: str, default=None, mutavel: bool = False):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._dados.pop(path, None)
+            return descongelar(congelar(default)) if mutavel else congelar(default)
+        assinatura = (st.st_mtime_ns, st.st_size, st.st_ino)
+        with self._lock:
+            entrada = self._dados.get(path)
+        if entrada is not None and entrada[0] == assinatura:
+            self.hits += 1
+            obj = entrada[1]
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                obj = congelar(json.load(f))
+            with self._lock:
+                self._dados[path] = (assinatura, obj)
+                self.recargas += 1
+        return descongelar(obj) if mutavel else obj
+
+    def invalidar(self, path: str = None) -> None:
+        with self._lock:
+            if path is None: self._dados.clear()
+            else: self._dados.pop(path, None)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "recargas": self.recargas, "ficheiros": len(self._dados)}
@@ -0,0 +1,150 @@
+# =============================== #
+#  Índice de canais (pesquisa em playlists)
+# =============================== #
+"""
+Índice construído uma vez por playlist e guardado numa cache do processo
+indexada pelo sha256 do conteúdo (o mesmo ficheiro carregado de novo, por
+qualquer sessão, reutiliza o índice).
+
+- nomes normalizados (sem acentos, minúsculas, só letras/dígitos);
+- trigramas -> arrays NumPy de ids, para pesquisa aproximada: os candidatos
+  são contados com um único bincount sobre as listas dos trigramas da consulta;
+- tokens ordenados, para pesquisa por prefixo (consultas de 1-2 letras);
+- baldes por grupo (group-title);
+- chave estável por canal (tvg-id ou nome), usada pelos favoritos.
+"""
+
+import hashlib
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+
+from cr7bot.cache import CacheLRU
+from cr7bot.m3u import iter_m3u
+
+_NAO_ALNUM = re.compile(r"[^0-9a-z]+")
+
+CACHE_INDICES = CacheLRU(max_itens=4)
+
+
+def normalizar(txt: str) -> str:
+    """"Sport TV 1 — Açores" -> "sport tv 1 acores"."""
+    txt = unicodedata.normalize("NFKD", txt or "").encode("ascii", "ignore").decode("ascii")
+    return _NAO_ALNUM.sub(" ", txt.lower()).strip()
+
+
+def trigramas(norm: str) -> set:
+    s = f" {norm} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def chave_canal(canal) -> str:
+    """Identificador estável de um canal entre versões da mesma playlist."""
+    return f"id:{canal.tvg_id}" if canal.tvg_id else f"nome:{normalizar(canal.nome)}"
+
+
+class IndiceCanais:
+    def __init__(self, canais):
+        self.canais = list(canais)
+        self.nomes = [normalizar(c.nome) for c in self.canais]
+        post, grupos, tokens = {}, {}, []
+        for i, (nome, c) in enumerate(zip(self.nomes, self.canais)):
+            for t in trigramas(nome):
+                lst = post.get(t)
+                if lst is None: post[t] = [i]
+                else: lst.append(i)
+            grupos.setdefault(c.grupo, []).append(i)
+            tokens.extend((tok, i) for tok in set(nome.split()))
+        self._trigramas = {t: np.asarray(v, dtype=np.int32) for t, v in post.items()}
+        self._grupos = {g: np.asarray(v, dtype=np.int32) for g, v in grupos.items()}
+        tokens.sort()
+        self._tokens = [t for t, _ in tokens]
+        self._tokens_ids = np.asarray([i for _, i in tokens], dtype=np.int32)
+        self._por_chave = None
+
+    def __len__(self): return len(self.canais)
+
+    def grupos(self) -> list:
+        """[(grupo, nº de canais)] ordenado por nome do grupo."""
+        return sorted((g, len(v)) for g, v in self._grupos.items())
+
+    def _prefixo(self, pref: str) -> np.ndarray:
+        a = bisect_left(self._tokens, pref)
+        b = bisect_left(self._tokens, pref + "\x7f")
+        marca = np.zeros(len(self.canais), dtype=bool)
+        marca[self._tokens_ids[a:b]] = True
+        return np.flatnonzero(marca)
+
+    def procurar(self, consulta: str = "", grupo: str = None, limite: int = 50,
+                 minimo: float = 0.5) -> list:
+        """
+        Canais que melhor correspondem a `consulta` (sem acentos, tolerante a
+        erros pequenos), opcionalmente só de um `grupo`. Sem consulta devolve
+        os primeiros canais do grupo pela ordem da playlist.
+        """
+        q = normalizar(consulta)
+        filtro = self._grupos.get(grupo, np.empty(0, np.int32)) if grupo is not None else None
+        if not q:
+            ids = filtro if filtro is not None else np.arange(len(self.canais))
+            return [self.canais[i] for i in ids[:limite]]
+
+        if len(q) < 3:
+            ids = self._prefixo(q)
+            if filtro is not None: ids = ids[np.isin(ids, filtro)]
+            return [self.canais[i] for i in ids[:limite]]
+
+        tri = trigramas(q)
+        listas = [self._trigramas[t] for t in tri if t in self._trigramas]
+        if not listas:
+            return []
+        contagem = np.bincount(np.concatenate(listas), minlength=len(self.canais))
+        ids = np.flatnonzero(contagem >= max(1, int(np.ceil(minimo * len(tri)))))
+        if filtro is not None: ids = ids[np.isin(ids, filtro)]
+        if not len(ids):
+            return []
+        # pontuação: fração de trigramas em comum; frase contida / início do nome sobem à frente
+        score = contagem[ids] / len(tri)
+        ordem = np.lexsort((ids, -score))[:max(limite * 4, limite)]
+        cand = ids[ordem]
+        bonus = [(2 if self.nomes[i].startswith(q) else 1 if q in self.nomes[i] else 0) for i in cand]
+        final = sorted(range(len(cand)), key=lambda k: (-bonus[k], -score[ordem[k]], len(self.nomes[cand[k]])))
+        return [self.canais[cand[k]] for k in final[:limite]]
+
+    def resolver(self, chave: str):
+        """Canal com esta chave (ver chave_canal) ou None."""
+        if self._por_chave is None:
+            por_chave = {}
+            for i, c in enumerate(self.canais):
+                por_chave.setdefault(chave_canal(c), i)
+            self._por_chave = por_chave
+        i = self._por_chave.get(chave)
+        return None if i is None else self.canais[i]
+
+    def resolver_favoritos(self, favs: dict) -> dict:
+        """{chave: Canal atual} para os favoritos presentes nesta playlist."""
+        out = {}
+        for k in favs:
+            c = self.resolver(k)
+            if c is not None: out[k] = c
+        return out
+
+
+def hash_fonte(fonte, tamanho: int = 1 << 20) -> str:
+    """sha256 do conteúdo de uma playlist (texto, bytes ou ficheiro), lido por blocos."""
+    h = hashlib.sha256()
+    if isinstance(fonte, str):
+        h.update(fonte.encode("utf-8"))
+    elif isinstance(fonte, (bytes, bytearray, memoryview)):
+        h.update(fonte)
+    else:
+        if hasattr(fonte, "seek"): fonte.seek(0)
+        for bloco in iter(lambda: fonte.read(tamanho), fonte.read(0)):
+            h.update(bloco.encode("utf-8") if isinstance(bloco, str) else bloco)
+    return h.hexdigest()
+
+
+def obter_indice(fonte) -> IndiceCanais:
+    """Índice da playlist, construído só na primeira vez que este conteúdo aparece."""
+    return CACHE_INDICES.obter_ou_calcular(hash_fonte(fonte), lambda: IndiceCanais(iter_m3u(fonte)))
@@ -0,0 +1,203 @@
+# =============================== #
+#  Chat — log JSONL só de acrescento
+# =============================== #
+"""
+Mensagens guardadas uma por linha em segmentos `chat-000001.jsonl`, ...
+Cada envio é um único append (O(1)), nunca uma reescrita do histórico.
+Os leitores guardam um cursor (segmento, offset em bytes) e só leem o que
+chegou depois dele. Quando o segmento ativo passa `max_bytes` roda para
+um novo; segmentos além de `max_segmentos` são apagados.
+
+O índice (`index.json`) é pequeno e só é reescrito na rotação: lista os
+segmentos e o nº de mensagens / bytes dos que já estão fechados.
+"""
+
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from cr7bot.instrumentacao import contar_bytes
+
+Cursor = tuple  # (segmento, offset)
+
+
+class ChatLog:
+    def __init__(self, pasta: str = "chat_log", max_bytes: int = 1_000_000,
+                 max_segmentos: int = 20, legado: str = None):
+        self.pasta = pasta
+        self.max_bytes = int(max_bytes)
+        self.max_segmentos = max(1, int(max_segmentos))
+        self.legado = legado
+        self._lock = threading.Lock()
+        self._pronto = False
+
+    # ---------- ficheiros ----------
+    def _path(self, seg: int) -> str:
+        return os.path.join(self.pasta, f"chat-{seg:06d}.jsonl")
+
+    def _index_path(self) -> str:
+        return os.path.join(self.pasta, "index.json")
+
+    def _ler_index(self) -> dict:
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            segs = sorted(int(n[5:11]) for n in os.listdir(self.pasta)
+                          if n.startswith("chat-") and n.endswith(".jsonl"))
+            return {"segmentos": [{"n": s} for s in segs] or [{"n": 1}]}
+
+    def _gravar_index(self, idx: dict) -> None:
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(idx, f, ensure_ascii=False)
+        os.replace(tmp, self._index_path())
+
+    @contextmanager
+    def _exclusivo(self):
+        """Lock entre threads (sessões) e entre processos (flock num ficheiro fixo)."""
+        with self._lock:
+            with open(os.path.join(self.pasta, ".lock"), "a") as lf:
+                fcntl.flock(lf, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _preparar(self) -> None:
+        if self._pronto:
+            return
+        os.makedirs(self.pasta, exist_ok=True)
+        with self._exclusivo():
+            if not os.path.exists(self._index_path()):
+                self._gravar_index(self._ler_index())
+            self._migrar_legado()
+        self._pronto = True
+
+    def _migrar_legado(self) -> None:
+        """Importa uma vez o antigo chat.json (lista de dicts) para o primeiro segmento."""
+        if not self.legado or not os.path.exists(self.legado):
+            return
+        try:
+            with open(self.legado, "r", encoding="utf-8") as f:
+                antigas = json.load(f)
+        except (OSError, ValueError):
+            return
+        with open(self._path(self._ler_index()["segmentos"][-1]["n"]), "ab") as f:
+            f.write(b"".join(_linha(m) for m in antigas if isinstance(m, dict)))
+        os.replace(self.legado, self.legado + ".migrado")
+
+    # ---------- escrita ----------
+    def acrescentar(self, msg: dict) -> None:
+        self._preparar()
+        linha = _linha(msg)
+        with self._exclusivo():
+            idx = self._ler_index()
+            seg = idx["segmentos"][-1]["n"]
+            path = self._path(seg)
+            tam = os.path.getsize(path) if os.path.exists(path) else 0
+            if tam and tam + len(linha) > self.max_bytes:
+                idx = self._rodar(idx, tam)
+                path = self._path(idx["segmentos"][-1]["n"])
+            with open(path, "ab") as f:
+                f.write(linha)
+        contar_bytes("chat", len(linha))
+
+    def _rodar(self, idx: dict, tam: int) -> dict:
+        atual = idx["segmentos"][-1]
+        with open(self._path(atual["n"]), "rb") as f:
+            atual.update(mensagens=sum(1 for _ in f), bytes=tam)
+        idx["segmentos"].append({"n": atual["n"] + 1})
+        while len(idx["segmentos"]) > self.max_segmentos:
+            velho = idx["segmentos"].pop(0)
+            try: os.remove(self._path(velho["n"]))
+            except OSError: pass
+        self._gravar_index(idx)
+        return idx
+
+    # ---------- leitura ----------
+    def ler_desde(self, cursor: Cursor = None) -> tuple:
+        """Mensagens posteriores ao cursor e o novo cursor. cursor=None lê tudo o que existe."""
+        self._preparar()
+        segs = [s["n"] for s in self._ler_index()["segmentos"]]
+        seg0, off0 = cursor if cursor else (segs[0], 0)
+        if seg0 < segs[0]:
+            seg0, off0 = segs[0], 0
+        msgs, cur = [], (seg0, off0)
+        for seg in (s for s in segs if s >= seg0):
+            off = off0 if seg == seg0 else 0
+            try:
+                with open(self._path(seg), "rb") as f:
+                    f.seek(off)
+                    dados = f.read()
+            except OSError:
+                continue
+            fim = dados.rfind(b"\n") + 1  # ignora uma linha ainda a meio de ser escrita
+            msgs.extend(_ler_linhas(dados[:fim]))
+            cur = (seg, off + fim)
+        return msgs, cur
+
+    def todas_sem_migrar(self) -> list:
+        """Todas as mensagens (segmentos + chat.json legado ainda por importar), sem criar nem mover ficheiros."""
+        msgs = []
+        if os.path.isdir(self.pasta):
+            for s in self._ler_index()["segmentos"]:
+                try:
+                    with open(self._path(s["n"]), "rb") as f:
+                        dados = f.read()
+                except OSError:
+                    continue
+                msgs.extend(_ler_linhas(dados[:dados.rfind(b"\n") + 1]))
+        if self.legado and os.path.exists(self.legado):
+            try:
+                with open(self.legado, "r", encoding="utf-8") as f:
+                    msgs.extend(m for m in json.load(f) if isinstance(m, dict))
+            except (OSError, ValueError):
+                pass
+        return msgs
+
+    def ultimas(self, n: int = 50) -> tuple:
+        """As últimas n mensagens (lendo só os segmentos necessários) e o cursor do fim."""
+        self._preparar()
+        idx = self._ler_index()["segmentos"]
+        partes, total, cur = [], 0, None
+        for s in reversed(idx):
+            try:
+                with open(self._path(s["n"]), "rb") as f:
+                    dados = f.read()
+            except OSError:
+                continue
+            fim = dados.rfind(b"\n") + 1
+            if cur is None:
+                cur = (s["n"], fim)
+            msgs = _ler_linhas(dados[:fim])
+            partes.append(msgs)
+            total += len(msgs)
+            if total >= n:
+                break
+        todas = [m for p in reversed(partes) for m in p]
+        return todas[-n:] if n else [], cur or (idx[-1]["n"], 0)
+
+
+def _linha(msg: dict) -> bytes:
+    return (json.dumps(msg, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _ler_linhas(dados: bytes) -> list:
+    out = []
+    for ln in dados.splitlines():
+        try: out.append(json.loads(ln))
+        except ValueError: continue
+    return out
+
+
+_INSTANCIAS: dict = {}
+
+
+def obter_chat(pasta: str = "chat_log", **kw) -> ChatLog:
+    """Uma ChatLog por pasta e por processo (partilhada entre sessões)."""
+    if pasta not in _INSTANCIAS:
+        _INSTANCIAS[pasta] = ChatLog(pasta, **kw)
+    return _INSTANCIAS[pasta]
@@ -0,0 +1,213 @@
+# ======== EXPORTAÇÃO (Excel / CSV / Parquet) ========
+# pandas/XlsxWriter/pyarrow só são importados quando uma exportação é pedida.
+# Os ficheiros gerados ficam numa cache LRU do processo, indexada pelo hash
+# do conteúdo (live_base, eventos, pesos, ...): uma análise que não mudou
+# nunca é reconstruída.
+import csv
+import hashlib
+import io
+import json
+from io import BytesIO
+
+from cr7bot.cache import CacheLRU
+from cr7bot.instrumentacao import medir
+from cr7bot.pesos import PESOS_PADRAO
+from cr7bot.regras import obter_regras
+
+COLUNAS_DETALHE = ["Ordem", "Etapa", "Input", "Peso aplicado", "Ajuste parcial", "Resultado acumulado", "Nota"]
+MIME = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+CACHE_EXPORT = CacheLRU(max_itens=32)
+
+
+def hash_conteudo(*partes) -> str:
+    """sha256 estável de estruturas JSON-serializáveis (chaves ordenadas)."""
+    raw = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _hash_df(df) -> str:
+    import pandas as pd
+    try:
+        h = pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()
+        return hashlib.sha256(repr(list(df.columns)).encode() + h).hexdigest()
+    except TypeError:  # células não hasháveis (listas, dicts)
+        return hash_conteudo(df.to_dict("split"))
+
+
+@medir("exportar.to_excel")
+def to_excel(df, distrib, resumo, pesos_df):
+    import pandas as pd
+    frames = {'Análise Principal': df, 'Distribuição Ajustes': distrib,
+              'Resumo Inputs': resumo, 'Pesos em Uso': pesos_df}
+    chave = ("to_excel",) + tuple((nome, _hash_df(f)) for nome, f in frames.items())
+
+    def gerar():
+        output = BytesIO()
+        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+            for nome, f in frames.items():
+                f.to_excel(writer, index=False, sheet_name=nome)
+        return output.getvalue()
+    return CACHE_EXPORT.obter_ou_calcular(chave, gerar)
+
+
+def linhas_detalhadas(base_inputs, eventos, xg_2p=None, ajuste=None, xg_ponderado=None, pesos=None,
+                      simulacao=None):
+    """Gera as linhas (dicts COLUNAS_DETALHE) da análise detalhada, uma a uma."""
+    pesos = PESOS_PADRAO if pesos is None else pesos
+    acumulado, ordem = (xg_ponderado if xg_ponderado is not None else 1.0), 1
+    yield {
+        "Ordem": ordem, "Etapa": "xG ponderado inicial",
+        "Input": f"{xg_ponderado:.2f}" if xg_ponderado is not None else "-",
+        "Peso aplicado": "-", "Ajuste parcial": "-", "Resultado acumulado": acumulado,
+        "Nota": "Base inicial do cálculo"
+    }; ordem += 1
+
+    for key, val in base_inputs.items():
+        peso = pesos.get(key, 0)
+        ajuste_parcial = peso * (val if isinstance(val, (int, float)) else 1)
+        acumulado += ajuste_parcial
+        yield {
+            "Ordem": ordem, "Etapa": key, "Input": val, "Peso aplicado": peso,
+            "Ajuste parcial": ajuste_parcial, "Resultado acumulado": acumulado, "Nota": "Input pré-jogo"
+        }; ordem += 1
+
+    regras = obter_regras()
+    eventos = list(eventos)
+    idx, impactos, _ = regras.pontuar(eventos)
+    for ev, i, ajuste_parcial in zip(eventos, idx, impactos.tolist()):
+        acumulado += ajuste_parcial
+        yield {
+            "Ordem": ordem, "Etapa": ev.get("tipo", "Evento"), "Input": ev.get("equipa", "-"),
+            "Peso aplicado": "-", "Ajuste parcial": ajuste_parcial, "Resultado acumulado": acumulado,
+            "Nota": regras.nota(ev, i)
+        }; ordem += 1
+
+    yield {
+        "Ordem": ordem, "Etapa": "Resultado Final", "Input": "-", "Peso aplicado": "-",
+        "Ajuste parcial": "-", "Resultado acumulado": acumulado, "Nota": "xG/odds finais"
+    }; ordem += 1
+
+    if simulacao:
+        yield from _linhas_simulacao(simulacao, ordem, acumulado)
+
+
+def _linhas_simulacao(sim: dict, ordem: int, acumulado: float):
+    """Linhas da simulação Monte Carlo: a primeira leva os parâmetros e a seed (para a repetir)."""
+    p = sim["parametros"]
+    yield {
+        "Ordem": ordem, "Etapa": "Simulação Monte Carlo",
+        "Input": json.dumps(p, ensure_ascii=False, separators=(",", ":")), "Peso aplicado": "-",
+        "Ajuste parcial": "-", "Resultado acumulado": acumulado,
+        "Nota": f"seed={sim['seed']} · {sim['n']} caminhos (cr7bot.simulacao.repetir reproduz os valores)"
+    }
+    mercados = [(f"MC próximo golo: {k}", v) for k, v in sim["proximo_golo"].items()]
+    mercados += [(f"MC 2ª parte over {l}", v) for l, v in sim["over"].items()]
+    mercados += [(f"MC resultado final: {k}", v) for k, v in sim["resultado"].items()]
+    mercados.append(("MC ambas marcam (final)", sim["btts"]))
+    for etapa, prob in mercados:
+        ordem += 1
+        yield {
+            "Ordem": ordem, "Etapa": etapa, "Input": round(prob, 4), "Peso aplicado": "-",
+            "Ajuste parcial": "-", "Resultado acumulado": acumulado,
+            "Nota": f"odd justa {1.0 / prob:.2f}" if prob > 0 else "sem ocorrências"
+        }
+
+
+# ---- escritores (um por formato), todos a partir de um iterável de linhas ----
+def _escrever_xlsx(linhas) -> bytes:
+    import pandas as pd
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+        pd.DataFrame(list(linhas)).to_excel(writer, sheet_name="Detalhe_Analise", index=False)
+    return output.getvalue()
+
+
+def escrever_csv(linhas, destino=None, colunas=None):
+    """Escreve linha a linha (sem DataFrame). destino=None devolve bytes; senão um path/ficheiro."""
+    linhas = iter(linhas)
+    primeira = next(linhas, None)
+    colunas = colunas or (list(primeira) if primeira else COLUNAS_DETALHE)
+    buf = io.StringIO() if destino is None else None
+    f = buf if buf is not None else (open(destino, "w", encoding="utf-8", newline="") if isinstance(destino, str) else destino)
+    try:
+        w = csv.DictWriter(f, fieldnames=colunas, extrasaction="ignore")
+        w.writeheader()
+        if primeira is not None:
+            w.writerow(primeira)
+        for ln in linhas:
+            w.writerow(ln)
+    finally:
+        if isinstance(destino, str):
+            f.close()
+    return buf.getvalue().encode("utf-8") if buf is not None else None
+
+
+def escrever_parquet(linhas, destino=None, bloco: int = 10_000):
+    """Escreve em blocos de `bloco` linhas com pyarrow (memória limitada). Colunas mistas vão como texto."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    sink = BytesIO() if destino is None else destino
+    writer, buf = None, []
+
+    def despejar():
+        nonlocal writer
+        colunas = list(buf[0])
+        dados = {}
+        for c in colunas:
+            vals = [ln.get(c) for ln in buf]
+            if c in ("Ordem",):
+                dados[c] = pa.array(vals, pa.int64())
+            elif c in ("Resultado acumulado",):
+                dados[c] = pa.array(vals, pa.float64())
+            else:
+                dados[c] = pa.array([None if v is None else str(v) for v in vals], pa.string())
+        tabela = pa.table(dados)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, tabela.schema)
+        writer.write_table(tabela.cast(writer.schema))
+        buf.clear()
+
+    for ln in linhas:
+        buf.append(ln)
+        if len(buf) >= bloco:
+            despejar()
+    if buf:
+        despejar()
+    if writer is not None:
+        writer.close()
+    return sink.getvalue() if destino is None else None
+
+
+_ESCRITORES = {"xlsx": _escrever_xlsx, "csv": escrever_csv, "parquet": escrever_parquet}
+
+
+@medir("exportar.export_detalhado")
+def export_detalhado(base_inputs, eventos, xg_2p=None, ajuste=None, xg_ponderado=None, pesos=None,
+                     formato: str = "xlsx", simulacao=None):
+    """Ficheiro da análise detalhada (xlsx/csv/parquet), reaproveitado da cache se o conteúdo não mudou."""
+    pesos = PESOS_PADRAO if pesos is None else pesos
+    partes = (base_inputs, eventos, xg_2p, ajuste, xg_ponderado, pesos) + ((simulacao,) if simulacao else ())
+    chave = ("detalhe", formato, hash_conteudo(*partes))
+    return CACHE_EXPORT.obter_ou_calcular(chave, lambda: _ESCRITORES[formato](
+        linhas_detalhadas(base_inputs, eventos, xg_2p, ajuste, xg_ponderado, pesos, simulacao)))
+
+
+def exportar_jogos(jogos, destino, formato: str = "csv", pesos=None):
+    """
+    Exportação de vários jogos para CSV/Parquet em streaming. `jogos` é um
+    iterável de dicts {"jogo", "base", "eventos", "xg_2p", "ajuste", "xg_ponderado"[, "simulacao"]};
+    cada linha leva a coluna extra "Jogo". Nada é materializado além de um bloco.
+    """
+    def todas():
+        for j in jogos:
+            for ln in linhas_detalhadas(j.get("base", {}), j.get("eventos", []), j.get("xg_2p"),
+                                        j.get("ajuste"), j.get("xg_ponderado"), pesos, j.get("simulacao")):
+                yield {"Jogo": j.get("jogo", "-"), **ln}
+    if formato == "parquet":
+        return escrever_parquet(todas(), destino)
+    return escrever_csv(todas(), destino, colunas=["Jogo"] + COLUNAS_DETALHE)
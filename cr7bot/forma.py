@@ -0,0 +1,142 @@
+# ========= FORMA / RESULTADOS =========
+"""
+Forma escrita à mão ("VVEDV") e forma calculada para uma liga inteira a
+partir do histórico de resultados (o mesmo dict de arrays de
+cr7bot.forca.ler_resultados). A forma da liga é calculada de uma vez, com
+groupby vetorizado sobre todos os jogos de todas as equipas, e fica em cache
+pela assinatura do histórico: só é recalculada quando chegam resultados novos.
+"""
+
+import threading
+
+import numpy as np
+
+from cr7bot.cache import CacheLRU
+
+_TOKENS = {"V": "V", "W": "V", "E": "E", "D": "D", "L": "D"}
+LETRAS = np.array(["D", "E", "V"])      # índice = min(pontos, 2): derrota 0, empate 1, vitória 3
+
+CACHE_FORMA = CacheLRU(max_itens=16)
+
+
+def _norm_result_token(t: str) -> str:
+    return _TOKENS.get(t.strip().upper(), "")
+
+def parse_results_string(s: str, max_n: int = 10) -> list[str]:
+    """
+    Aceita formatos: 'V V E D V', 'V,E,D,V', 'vveDV'…
+    Devolve lista (mais recente primeiro). Limita a max_n.
+    """
+    if not s:
+        return []
+    s = s.replace(",", " ").replace(";", " ").replace("-", " ").upper()
+    toks = [r for r in map(_TOKENS.get, s.split()) if r]
+    if not toks:  # tentar string corrida tipo "VVEDV"
+        toks = [r for r in map(_TOKENS.get, s) if r]
+    return toks[:max_n]
+
+def analisar_forma(seq: list[str], n: int = 5) -> dict:
+    """Conta V/E/D e sequência (mais recente primeiro)."""
+    use = seq[:n]
+    return {
+        "V": use.count("V"),
+        "E": use.count("E"),
+        "D": use.count("D"),
+        "sequencia": "".join(use) if use else "—"
+    }
+
+
+def _longo(dados: dict):
+    """Histórico -> uma linha por (jogo, equipa), ordenada por equipa e data."""
+    import pandas as pd
+    gc, gf = np.asarray(dados["golos_casa"]), np.asarray(dados["golos_fora"])
+    n = len(gc)
+    marcados, sofridos = np.concatenate([gc, gf]), np.concatenate([gf, gc])
+    pontos = np.where(marcados > sofridos, 3, np.where(marcados == sofridos, 1, 0))
+    df = pd.DataFrame({
+        "equipa": np.concatenate([np.asarray(dados["casa"], dtype=str), np.asarray(dados["fora"], dtype=str)]),
+        "local": np.repeat(np.array(["casa", "fora"]), n),
+        "jogo": np.tile(np.arange(n), 2),
+        "pontos": pontos,
+        "V": pontos == 3, "E": pontos == 1, "D": pontos == 0,
+    })
+    return df.sort_values(["equipa", "jogo"], kind="stable", ignore_index=True)
+
+
+def _janela(df, chaves, colunas, n):
+    """Somas dos últimos n jogos por grupo: cumsum menos o cumsum de n jogos antes (sem rolling por grupo)."""
+    acum = df.groupby(chaves, sort=False)[colunas].cumsum()
+    antes = acum.groupby([df[c] for c in chaves], sort=False).shift(n).fillna(0)
+    return acum - antes
+
+
+def forma_rolante(dados: dict, n: int = 5):
+    """
+    Forma de cada equipa depois de cada jogo (uma linha por jogo e equipa):
+    V/E/D e pontos por jogo nos últimos n jogos, os mesmos números só nos
+    jogos em casa / fora, série atual ("V3" = 3 vitórias seguidas) e a
+    sequência dos últimos n resultados (mais recente primeiro).
+    """
+    df = _longo(dados)
+    g = df.groupby("equipa", sort=False)
+    num = df[["equipa", "local", "V", "E", "D", "pontos"]].astype({"V": int, "E": int, "D": int})
+    janela = _janela(num, ["equipa"], ["V", "E", "D", "pontos"], n)
+    jogados = np.minimum(g.cumcount().to_numpy() + 1, n)
+    out = df[["equipa", "local", "jogo"]].copy()
+    out[["V", "E", "D"]] = janela[["V", "E", "D"]].astype(int)
+    out["ppj"] = janela["pontos"] / jogados
+
+    por_local = _janela(num, ["equipa", "local"], ["V", "E", "D", "pontos"], n)
+    jogados_local = np.minimum(df.groupby(["equipa", "local"], sort=False).cumcount().to_numpy() + 1, n)
+    out["ppj_local"] = por_local["pontos"] / jogados_local
+    out["V_local"] = por_local["V"].astype(int)
+
+    letra = LETRAS[np.minimum(df["pontos"].to_numpy(), 2)]
+    nova_serie = (letra != np.roll(letra, 1)) | (df["equipa"].to_numpy() != np.roll(df["equipa"].to_numpy(), 1))
+    serie = df.groupby(np.cumsum(nova_serie)).cumcount().to_numpy() + 1
+    out["serie"] = np.char.add(letra, serie.astype(str))
+
+    # sequência: n deslocamentos vetorizados dentro de cada equipa (k = 0 é o jogo mais recente)
+    s_letra = df.assign(letra=letra).groupby("equipa", sort=False)["letra"]
+    out["sequencia"] = sum((s_letra.shift(k).fillna("") for k in range(1, n)), s_letra.shift(0))
+    return out
+
+
+def _resumo(rolante, n: int) -> dict:
+    """Última linha de cada equipa -> {equipa: forma atual}, com o split casa/fora."""
+    ult = rolante.groupby("equipa", sort=False).tail(1).set_index("equipa")
+    ult_local = rolante.groupby(["equipa", "local"], sort=False).tail(1).set_index(["equipa", "local"])
+    out = {}
+    for equipa, r in ult.iterrows():
+        out[equipa] = {"V": int(r["V"]), "E": int(r["E"]), "D": int(r["D"]), "ppj": round(float(r["ppj"]), 2),
+                       "serie": r["serie"], "sequencia": r["sequencia"] or "—", "n": n}
+        for local in ("casa", "fora"):
+            if (equipa, local) in ult_local.index:
+                rl = ult_local.loc[(equipa, local)]
+                out[equipa][f"ppj_{local}"] = round(float(rl["ppj_local"]), 2)
+                out[equipa][f"V_{local}"] = int(rl["V_local"])
+    return out
+
+
+def forma_liga(liga: str, dados: dict, n: int = 5) -> dict:
+    """
+    Forma atual de todas as equipas da liga ({equipa: {...}}), em cache pela
+    assinatura do histórico: o mesmo histórico devolve logo o resultado
+    guardado; resultados novos mudam a assinatura e forçam o recálculo.
+    """
+    from cr7bot.forca import _assinatura
+    chave = (liga, _assinatura(dados), n)
+    forma = CACHE_FORMA.obter_ou_calcular(chave, lambda: _resumo(forma_rolante(dados, n), n))
+    with _LOCK:
+        _FORMA_LIGA[liga] = forma
+    return forma
+
+
+_FORMA_LIGA: dict = {}
+_LOCK = threading.Lock()
+
+
+def forma_atual(liga: str):
+    """Última forma calculada para a liga neste processo (ou None)."""
+    with _LOCK:
+        return _FORMA_LIGA.get(liga)
@@ -0,0 +1,323 @@
+# =============================== #
+#  Ingestão de odds em tempo real
+# =============================== #
+"""
+Lê um feed local de odds (ficheiro a crescer, seguido como `tail -f`, ou
+linhas enviadas para um socket TCP local) e, a cada tick, recalcula o EV
+contra as probabilidades justas do modelo. Um EV acima do limiar gera um
+alerta logo no tick que o provoca (callbacks + fila das últimas alertas).
+
+Formato do feed: uma linha JSON por tick, com um mercado ou vários:
+    {"jogo": "benfica-porto", "mercado": "1", "odd": 2.10[, "ts": 1718000000.0]}
+    {"jogo": "benfica-porto", "odds": {"1": 2.10, "X": 3.40, "over2.5": 1.95}}
+Mercados: 1, X, 2, 1X, 12, X2, btts, overN.5, underN.5 ("Over 2.5" também serve).
+
+O limiar de EV das alertas do processo vem de CR7_FEED_LIMIAR (por omissão
+0: qualquer EV positivo); cada sessão da UI filtra as alertas com o seu
+próprio limiar. Cada ficheiro seguido tem a sua thread, que pára quando
+nenhuma sessão o segue (deixar_ficheiro) ou com parar().
+
+Memória constante: o histórico de cada (jogo, mercado) é um buffer circular
+de `capacidade` posições em arrays NumPy; há no máximo `max_series` séries
+(as menos recentes saem) e a fila de alertas tem tamanho fixo.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+import numpy as np
+
+Alerta = namedtuple("Alerta", "ts jogo mercado odd prob ev latencia_ms")
+
+MAX_LINHA = 64 * 1024
+LIMIAR_EV = float(os.environ.get("CR7_FEED_LIMIAR", 0.0))
+
+
+def normalizar_mercado(nome) -> str:
+    """"Over 2.5" / "over2.5" -> "over2.5"; "x" -> "X"; "BTTS" -> "btts"."""
+    m = str(nome).strip().replace(" ", "").lower()
+    return m.upper() if m in ("1", "x", "2", "1x", "12", "x2") else m
+
+
+def probs_de_precos(precos: dict) -> dict:
+    """Resultado de precos_mercados/precos_matriz (escalar) -> {mercado: probabilidade}."""
+    out = {m: float(precos[m]) for m in ("1", "X", "2", "1X", "12", "X2", "btts") if m in precos}
+    for lado in ("over", "under"):
+        for linha, p in (precos.get(lado) or {}).items():
+            out[f"{lado}{float(linha):g}"] = float(p)
+    return out
+
+
+class Buffer:
+    """Buffer circular (ts, odd, ev) de tamanho fixo."""
+
+    __slots__ = ("ts", "odd", "ev", "pos", "n", "ultima_odd", "ultimo_ev")
+
+    def __init__(self, capacidade: int):
+        self.ts = np.zeros(capacidade)
+        self.odd = np.zeros(capacidade)
+        self.ev = np.full(capacidade, np.nan)
+        self.pos = 0
+        self.n = 0
+        self.ultima_odd, self.ultimo_ev = 0.0, float("nan")   # cópia Python do último tick (caminho quente)
+
+    def acrescentar(self, ts: float, odd: float, ev: float) -> None:
+        i = self.pos
+        self.ts[i], self.odd[i], self.ev[i] = ts, odd, ev
+        self.pos = (i + 1) % len(self.ts)
+        self.n = min(self.n + 1, len(self.ts))
+        self.ultima_odd, self.ultimo_ev = odd, ev
+
+    def recalcular_ev(self, prob: float) -> None:
+        """Probabilidade do modelo mudou: o EV de todo o histórico é refeito num só passo vetorizado."""
+        self.ev[:self.n] = np.round(self.odd[:self.n] * prob - 1, 2)
+        if self.n:
+            self.ultimo_ev = float(self.ev[(self.pos - 1) % len(self.ts)])
+
+    def ultimo(self) -> tuple:
+        i = (self.pos - 1) % len(self.ts)
+        return float(self.ts[i]), float(self.odd[i]), float(self.ev[i])
+
+    def historico(self) -> tuple:
+        """(ts, odd, ev) por ordem cronológica (cópias)."""
+        if self.n < len(self.ts):
+            s = slice(0, self.n)
+            return self.ts[s].copy(), self.odd[s].copy(), self.ev[s].copy()
+        ordem = np.roll(np.arange(len(self.ts)), -self.pos)
+        return self.ts[ordem], self.odd[ordem], self.ev[ordem]
+
+
+class Ingestor:
+    def __init__(self, capacidade: int = 512, max_series: int = 2000, limiar_ev: float = LIMIAR_EV,
+                 max_alertas: int = 200, intervalo: float = 0.05):
+        self.capacidade = int(capacidade)
+        self.max_series = int(max_series)
+        self.limiar_ev = float(limiar_ev)
+        self.intervalo = float(intervalo)
+        self._series = OrderedDict()      # (jogo, mercado) -> Buffer
+        self._probs = {}                  # jogo -> {mercado: prob do modelo}
+        self.alertas = deque(maxlen=max_alertas)
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._threads = {}                # fonte -> (thread, Event de paragem)
+        self._seguidores = {}             # fonte de ficheiro -> sessões que a seguem
+        self.ticks = 0
+        self.erros = 0
+
+    # ---------- modelo ----------
+    def definir_probs(self, jogo: str, probs: dict) -> None:
+        """Probabilidades justas do modelo para um jogo ({mercado: p}); o EV já guardado é refeito."""
+        probs = {normalizar_mercado(m): float(p) for m, p in probs.items()}
+        with self._lock:
+            if self._probs.get(jogo) == probs:
+                return
+            self._probs[jogo] = probs
+            for (j, m), buf in self._series.items():
+                if j == jogo and m in probs:
+                    buf.recalcular_ev(probs[m])
+
+    def ao_alertar(self, fn) -> None:
+        """fn(Alerta) é chamada (na thread de ingestão) a cada alerta novo."""
+        self._callbacks.append(fn)
+
+    # ---------- ticks ----------
+    def tick(self, jogo: str, mercado: str, odd: float, ts: float = None, t_rececao: float = None):
+        """Regista uma odd; devolve o Alerta gerado (ou None)."""
+        mercado = normalizar_mercado(mercado)
+        odd = float(odd)
+        ts = time.time() if ts is None else float(ts)
+        chave = (jogo, mercado)
+        alerta = None
+        with self._lock:
+            buf = self._series.get(chave)
+            if buf is None:
+                buf = self._series[chave] = Buffer(self.capacidade)
+                if len(self._series) > self.max_series:
+                    self._series.popitem(last=False)
+            else:
+                self._series.move_to_end(chave)
+            prob = self._probs.get(jogo, {}).get(mercado)
+            ev_antes, odd_antes = buf.ultimo_ev, buf.ultima_odd
+            # o mesmo que calc_ev(prob, odd), em aritmética Python (um tick não precisa de NumPy)
+            ev = round(odd * prob - 1, 2) if prob is not None else float("nan")
+            buf.acrescentar(ts, odd, ev)
+            self.ticks += 1
+            # alerta ao cruzar o limiar, ou quando a odd melhora estando já acima dele
+            if ev > self.limiar_ev and not (ev_antes > self.limiar_ev and odd <= odd_antes):
+                latencia = (time.perf_counter() - t_rececao) * 1e3 if t_rececao is not None else 0.0
+                alerta = Alerta(ts, jogo, mercado, odd, prob, ev, latencia)
+                self.alertas.append(alerta)
+        if alerta is not None:
+            for fn in list(self._callbacks):
+                try: fn(alerta)
+                except Exception: pass
+        return alerta
+
+    def processar_linha(self, linha) -> int:
+        """Uma linha do feed (JSON). Devolve o nº de ticks aplicados; linhas inválidas contam como erro."""
+        t_rececao = time.perf_counter()
+        try:
+            d = json.loads(linha)
+            jogo = str(d["jogo"])
+            odds = d["odds"] if "odds" in d else {d["mercado"]: d["odd"]}
+            ts = d.get("ts")
+            for mercado, odd in odds.items():
+                self.tick(jogo, mercado, odd, ts, t_rececao)
+            return len(odds)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.erros += 1
+            return 0
+
+    # ---------- leitura ----------
+    def ultimas(self, jogo: str) -> dict:
+        """{mercado: {"odd", "ev", "prob", "ts", "ticks"}} com o último tick de cada mercado do jogo."""
+        with self._lock:
+            probs = self._probs.get(jogo, {})
+            out = {}
+            for (j, m), buf in self._series.items():
+                if j == jogo and buf.n:
+                    ts, odd, ev = buf.ultimo()
+                    out[m] = {"odd": odd, "ev": None if np.isnan(ev) else ev, "prob": probs.get(m),
+                              "ts": ts, "ticks": buf.n}
+            return out
+
+    def historico(self, jogo: str, mercado: str):
+        with self._lock:
+            buf = self._series.get((jogo, normalizar_mercado(mercado)))
+            return buf.historico() if buf is not None else (np.empty(0), np.empty(0), np.empty(0))
+
+    def jogos(self) -> list:
+        with self._lock:
+            return sorted({j for j, _ in self._series})
+
+    # ---------- fontes ----------
+    def seguir_ficheiro(self, path: str, desde_inicio: bool = False, sessao: str = "") -> None:
+        """Segue `path` numa thread (como tail -f; aguenta truncagem e rotação do ficheiro)."""
+        chave = ("ficheiro", os.path.abspath(path))
+        with self._lock:
+            self._seguidores.setdefault(chave, set()).add(sessao)
+        self._arrancar(chave, lambda parar: self._ciclo_ficheiro(path, desde_inicio, parar))
+
+    def deixar_ficheiro(self, path: str, sessao: str = "") -> None:
+        """A sessão deixa de seguir `path`; a thread pára quando já nenhuma sessão o segue."""
+        chave = ("ficheiro", os.path.abspath(path))
+        with self._lock:
+            sessoes = self._seguidores.get(chave, set())
+            sessoes.discard(sessao)
+            if sessoes:
+                return
+            self._seguidores.pop(chave, None)
+        self._parar_fonte(chave)
+
+    def ficheiros(self) -> list:
+        """Ficheiros a ser seguidos neste momento."""
+        with self._lock:
+            return sorted(c[1] for c, (t, _) in self._threads.items() if c[0] == "ficheiro" and t.is_alive())
+
+    def servir_socket(self, host: str = "127.0.0.1", porta: int = 0) -> int:
+        """Aceita ligações TCP locais com linhas do feed. Devolve a porta (porta=0 escolhe uma livre)."""
+        srv = socket.create_server((host, porta))
+        srv.settimeout(0.5)
+        porta = srv.getsockname()[1]
+        self._arrancar(("socket", porta), lambda parar: self._ciclo_socket(srv, parar))
+        return porta
+
+    def parar(self) -> None:
+        """Pára todas as fontes."""
+        with self._lock:
+            chaves = list(self._threads)
+            self._seguidores.clear()
+        for chave in chaves:
+            self._parar_fonte(chave)
+
+    def _parar_fonte(self, chave) -> None:
+        with self._lock:
+            t_ev = self._threads.pop(chave, None)
+        if t_ev is not None:
+            t_ev[1].set()
+            t_ev[0].join(timeout=2)
+
+    def _arrancar(self, chave, alvo) -> None:
+        """alvo(parar) corre numa thread até o Event `parar` ser ativado."""
+        with self._lock:
+            if chave in self._threads and self._threads[chave][0].is_alive():
+                return
+            parar = threading.Event()
+            t = threading.Thread(target=alvo, args=(parar,), name=f"ingestao-{chave[0]}", daemon=True)
+            self._threads[chave] = (t, parar)
+        t.start()
+
+    def _linhas(self, pendente: bytes, bloco: bytes):
+        """Junta o bloco ao resto da leitura anterior; devolve (linhas completas, novo resto)."""
+        dados = pendente + bloco
+        partes = dados.split(b"\n")
+        resto = partes.pop()
+        if len(resto) > MAX_LINHA:        # linha absurda sem fim: descartada (memória limitada)
+            resto, self.erros = b"", self.erros + 1
+        return partes, resto
+
+    def _ciclo_ficheiro(self, path: str, desde_inicio: bool, parar: threading.Event) -> None:
+        f, inode, resto = None, None, b""
+        saltar = not desde_inicio and os.path.exists(path)   # só o que chegar a partir de agora
+        while not parar.is_set():
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                st = None
+            if st is not None and (f is None or st.st_ino != inode or st.st_size < f.tell()):
+                if f is not None: f.close()
+                f, inode, resto = open(path, "rb"), st.st_ino, b""
+                if saltar:
+                    f.seek(0, os.SEEK_END)
+                    saltar = False
+            bloco = f.read(1 << 16) if f is not None else b""
+            if not bloco:
+                parar.wait(self.intervalo)
+                continue
+            linhas, resto = self._linhas(resto, bloco)
+            for linha in linhas:
+                if linha.strip():
+                    self.processar_linha(linha)
+        if f is not None:
+            f.close()
+
+    def _ciclo_socket(self, srv: socket.socket, parar: threading.Event) -> None:
+        with srv:
+            while not parar.is_set():
+                try:
+                    con, _ = srv.accept()
+                except socket.timeout:
+                    continue
+                threading.Thread(target=self._ligacao, args=(con, parar), daemon=True).start()
+
+    def _ligacao(self, con: socket.socket, parar: threading.Event) -> None:
+        con.settimeout(0.5)
+        resto = b""
+        with con:
+            while not parar.is_set():
+                try:
+                    bloco = con.recv(1 << 16)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    break
+                if not bloco:
+                    break
+                linhas, resto = self._linhas(resto, bloco)
+                for linha in linhas:
+                    if linha.strip():
+                        self.processar_linha(linha)
+
+
+_INSTANCIAS: dict = {}
+
+
+def obter_ingestor(**kw) -> Ingestor:
+    """Um ingestor por processo (os buffers e as alertas são partilhados entre sessões)."""
+    if "ingestor" not in _INSTANCIAS:
+        _INSTANCIAS["ingestor"] = Ingestor(**kw)
+    return _INSTANCIAS["ingestor"]
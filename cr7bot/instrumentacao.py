@@ -0,0 +1,173 @@
+# =============================== #
+#  Instrumentação (tempos, contagens, bytes escritos)
+# =============================== #
+"""
+Camada leve de medição para os caminhos quentes da app: leituras/escritas
+JSON, bcrypt, motor de preços, exportações e cada secção da UI.
+
+- @medir("nome") em funções e `with secao("nome"):` em blocos registam a
+  duração de cada chamada; contar_bytes() soma bytes escritos em disco.
+- Por nome: nº de chamadas, tempo total, p50/p95/máx sobre as últimas
+  `amostras` durações e a última duração (ex.: "rerun").
+- relatorio() / para_json() / para_prometheus() para o painel de admin ou
+  para um scraper.
+
+Desligada por omissão (CR7_INSTRUMENTAR=1 liga no arranque; ativar() em
+runtime, para todo o processo). Desligada, @medir custa um teste de uma
+variável global e secao() devolve sempre o mesmo contexto nulo.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+ATIVA = os.environ.get("CR7_INSTRUMENTAR", "").lower() not in ("", "0", "false", "nao", "não")
+
+_NULO = contextlib.nullcontext()
+
+
+def _quantil(ordenados: list, q: float) -> float:
+    return ordenados[min(len(ordenados) - 1, int(round(q * (len(ordenados) - 1))))]
+
+
+class Metricas:
+    """Séries de durações por nome e contadores de bytes (thread-safe, partilhadas pelo processo)."""
+
+    def __init__(self, amostras: int = 2048):
+        self.amostras = int(amostras)
+        self._series = {}                 # nome -> [chamadas, total_s, última_s, deque(durações)]
+        self._bytes = {}                  # destino -> [escritas, bytes]
+        self._lock = threading.Lock()
+        self.desde = time.time()
+
+    def registar(self, nome: str, segundos: float) -> None:
+        with self._lock:
+            s = self._series.get(nome)
+            if s is None:
+                s = self._series[nome] = [0, 0.0, 0.0, deque(maxlen=self.amostras)]
+            s[0] += 1
+            s[1] += segundos
+            s[2] = segundos
+            s[3].append(segundos)
+
+    def contar_bytes(self, destino: str, n: int) -> None:
+        with self._lock:
+            b = self._bytes.setdefault(destino, [0, 0])
+            b[0] += 1
+            b[1] += int(n)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self._bytes.clear()
+            self.desde = time.time()
+
+    def relatorio(self) -> dict:
+        """{"desde", "tempos": {nome: {chamadas, total_ms, ultimo_ms, p50_ms, p95_ms, max_ms}}, "bytes": {...}}."""
+        with self._lock:
+            series = {n: (s[0], s[1], s[2], sorted(s[3])) for n, s in self._series.items()}
+            escritas = {d: tuple(b) for d, b in self._bytes.items()}
+        tempos = {}
+        for nome, (chamadas, total, ultimo, dur) in sorted(series.items()):
+            tempos[nome] = {
+                "chamadas": chamadas, "total_ms": total * 1e3, "ultimo_ms": ultimo * 1e3,
+                "p50_ms": _quantil(dur, 0.50) * 1e3, "p95_ms": _quantil(dur, 0.95) * 1e3, "max_ms": dur[-1] * 1e3,
+            }
+        return {
+            "desde": self.desde, "tempos": tempos,
+            "bytes": {d: {"escritas": e, "bytes": n} for d, (e, n) in sorted(escritas.items())},
+        }
+
+    def para_json(self) -> str:
+        return json.dumps(self.relatorio(), ensure_ascii=False, indent=2)
+
+    def para_prometheus(self, prefixo: str = "cr7bot") -> str:
+        """Formato de texto do Prometheus (durações como summary, bytes como counter)."""
+        rel = self.relatorio()
+        esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        out = [f"# HELP {prefixo}_duracao_segundos Duração das chamadas e secções instrumentadas.",
+               f"# TYPE {prefixo}_duracao_segundos summary"]
+        for nome, t in rel["tempos"].items():
+            lbl = f'nome="{esc(nome)}"'
+            out.append(f'{prefixo}_duracao_segundos{{{lbl},quantile="0.5"}} {t["p50_ms"] / 1e3:.6g}')
+            out.append(f'{prefixo}_duracao_segundos{{{lbl},quantile="0.95"}} {t["p95_ms"] / 1e3:.6g}')
+            out.append(f'{prefixo}_duracao_segundos_sum{{{lbl}}} {t["total_ms"] / 1e3:.6g}')
+            out.append(f'{prefixo}_duracao_segundos_count{{{lbl}}} {t["chamadas"]}')
+        out += [f"# HELP {prefixo}_bytes_escritos_total Bytes escritos em disco.",
+                f"# TYPE {prefixo}_bytes_escritos_total counter"]
+        for destino, b in rel["bytes"].items():
+            out.append(f'{prefixo}_bytes_escritos_total{{destino="{esc(destino)}"}} {b["bytes"]}')
+        return "\n".join(out) + "\n"
+
+
+METRICAS = Metricas()
+
+
+def ativar(ligar: bool = True) -> None:
+    global ATIVA
+    ATIVA = bool(ligar)
+
+
+def ativa() -> bool:
+    return ATIVA
+
+
+def registar(nome: str, segundos: float) -> None:
+    if ATIVA:
+        METRICAS.registar(nome, segundos)
+
+
+def contar_bytes(destino: str, n: int) -> None:
+    if ATIVA:
+        METRICAS.contar_bytes(destino, n)
+
+
+def contar_ficheiro(destino: str, path: str) -> None:
+    """contar_bytes com o tamanho de um ficheiro acabado de escrever (o stat só acontece se ativa)."""
+    if ATIVA:
+        try:
+            METRICAS.contar_bytes(destino, os.path.getsize(path))
+        except OSError:
+            pass
+
+
+class _Secao:
+    __slots__ = ("nome", "t0")
+
+    def __init__(self, nome: str):
+        self.nome = nome
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        METRICAS.registar(self.nome, time.perf_counter() - self.t0)
+        return False
+
+
+def secao(nome: str):
+    """Context manager que mede o bloco (mesmo que saia por exceção, ex. st.stop)."""
+    return _Secao(nome) if ATIVA else _NULO
+
+
+def medir(nome: str = None):
+    """Decorador: regista a duração de cada chamada com `nome` (por omissão módulo.função)."""
+    def deco(fn):
+        rotulo = nome or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ATIVA:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                METRICAS.registar(rotulo, time.perf_counter() - t0)
+        return wrapper
+    return deco
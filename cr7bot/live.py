@@ -0,0 +1,251 @@
+# ===== Live / 2ª parte: heurísticas simples + estado incremental =====
+import json
+import os
+import re
+import threading
+from collections import Counter
+
+from cr7bot.instrumentacao import contar_bytes, contar_ficheiro
+from cr7bot.regras import obter_regras
+
+
+def interpretar_tatica(eventos, live_base, _resultado):
+    n_evt = len(eventos)
+    base = live_base.get("xg_casa", 0) + live_base.get("xg_fora", 0)
+    if n_evt >= 4 or base >= 1.4: return "Jogo aberto: tendência para ocasiões na 2ª parte."
+    if n_evt == 0 and base <= 0.6: return "Jogo fechado: poucas ocasiões claras até agora."
+    return "Equilíbrio moderado com potencial de crescer."
+
+def calc_xg_live(live_base, eventos):
+    """xG da 2ª parte = média do xG da 1ª parte + soma dos `golos` de cada evento (regras_eventos.yaml)."""
+    base_xg = (live_base.get("xg_casa", 0.0) + live_base.get("xg_fora", 0.0)) / 2.0
+    _, _, golos = obter_regras().pontuar(eventos)
+    ajuste_total = float(golos.sum())
+    return base_xg + ajuste_total, ajuste_total, base_xg
+
+
+def dividir_xg(live_base, xg_2p):
+    """Divide o xG da 2ª parte pelas equipas na proporção do xG da 1ª parte."""
+    xc, xf = float(live_base.get("xg_casa", 0.0)), float(live_base.get("xg_fora", 0.0))
+    quota = xc / (xc + xf) if xc + xf > 0 else 0.5
+    return xg_2p * quota, xg_2p * (1.0 - quota)
+
+
+# ===== Estado live incremental (event sourcing) =====
+def nome_ficheiro(jogo_id: str) -> str:
+    """Nome (sem extensão) do log/snapshot de um jogo; IDs diferentes podem dar o mesmo nome."""
+    return re.sub(r"[^\w.-]+", "_", jogo_id).strip("_") or "jogo"
+
+
+def descrever_evento(i: int, ev: dict) -> str:
+    """Linha de texto de um evento, tal como aparece em "Eventos registados"."""
+    info_ev = f"{i}. {ev['tipo']} | {ev['equipa']}"
+    if "posicao" in ev:       info_ev += f" | {ev['posicao']}"
+    if "tipo_troca" in ev:    info_ev += f" | {ev['tipo_troca']}"
+    if "nova_formacao" in ev: info_ev += f" | Nova: {ev['nova_formacao']} ({ev.get('tipo_formacao','')})"
+    if "importancia" in ev:   info_ev += f" | {ev['importancia']}"
+    if ev.get('detalhes'):    info_ev += f" | {ev['detalhes']}"
+    return info_ev
+
+
+class EstadoLive:
+    """
+    Estado de um jogo live com agregados mantidos em O(1) por evento:
+    contagens por (tipo, equipa), vermelhos por equipa, ajuste direcional
+    acumulado e contributo de golos (o que calc_xg_live somaria).
+
+    Cada operação (base / evento / desfazer / limpar) é acrescentada a
+    `<pasta>/<jogo>.jsonl` (a 1ª linha guarda o `jogo_id` original, já que o
+    nome do ficheiro é sanitizado); a cada `snapshot_cada` operações grava-se
+    `<jogo>.snap.json` com o estado completo e o offset do log. Ao reabrir,
+    carrega-se o snapshot e só se reaplica o que veio depois.
+    """
+
+    def __init__(self, jogo_id: str, pasta: str = None, snapshot_cada: int = 25):
+        self.jogo_id = jogo_id
+        self.pasta = pasta
+        self.snapshot_cada = max(1, int(snapshot_cada))
+        self.base = {}
+        self.eventos = []
+        self.linhas = []              # texto já formatado de cada evento
+        self.versao = 0               # sobe a cada operação (o painel só recalcula o que mudou)
+        self._lock = threading.RLock()
+        self._ops_desde_snap = 0
+        self._zerar_agregados()
+
+    # ---------- agregados ----------
+    def _zerar_agregados(self):
+        self.contagens = Counter()
+        self.vermelhos = {"Casa": 0, "Fora": 0}
+        self.ajuste = 0.0
+        self.golos = 0.0
+        self._idx = []
+        self._regras = obter_regras()
+
+    def _aplicar(self, ev: dict, sinal: int, i: int) -> None:
+        eq = ev.get("equipa", "-")
+        self.contagens[(ev.get("tipo"), eq)] += sinal
+        if ev.get("tipo") == "Expulsão":
+            self.vermelhos[eq if eq in self.vermelhos else "Fora"] += sinal
+        self.ajuste += sinal * float(self._regras.impactos[i])
+        self.golos += sinal * float(self._regras.golos[i])
+
+    def _recalcular(self) -> None:
+        """Refaz os agregados de uma vez (ao abrir ou quando o YAML de regras mudou)."""
+        self._zerar_agregados()
+        idx, _, _ = self._regras.pontuar(self.eventos)
+        self._idx = idx.tolist()
+        for ev, i in zip(self.eventos, self._idx):
+            self._aplicar(ev, +1, i)
+
+    def _sincronizar_regras(self) -> None:
+        if obter_regras() is not self._regras:
+            self._recalcular()
+
+    # ---------- operações ----------
+    def definir_base(self, base: dict) -> None:
+        with self._lock:
+            self.base = dict(base)
+            self._registar({"op": "base", "base": self.base})
+
+    def acrescentar(self, ev: dict) -> None:
+        with self._lock:
+            self._sincronizar_regras()
+            self._acrescentar(dict(ev))
+            self._registar({"op": "ev", "ev": ev})
+
+    def _acrescentar(self, ev: dict) -> None:
+        i = self._regras.indice(ev)
+        self.eventos.append(ev)
+        self._idx.append(i)
+        self.linhas.append(descrever_evento(len(self.eventos), ev))
+        self._aplicar(ev, +1, i)
+
+    def desfazer(self):
+        """Remove o último evento. Devolve-o (ou None se não havia eventos)."""
+        with self._lock:
+            ev = self._desfazer()
+            if ev is not None:
+                self._registar({"op": "undo"})
+            return ev
+
+    def _desfazer(self):
+        if not self.eventos:
+            return None
+        self._sincronizar_regras()
+        ev, i = self.eventos.pop(), self._idx.pop()
+        self.linhas.pop()
+        self._aplicar(ev, -1, i)
+        return ev
+
+    def limpar(self) -> None:
+        with self._lock:
+            self.eventos, self.linhas = [], []
+            self._zerar_agregados()
+            self._registar({"op": "limpar"})
+
+    # ---------- leituras O(1) ----------
+    def xg_live(self):
+        """Mesmo resultado que calc_xg_live(base, eventos), sem percorrer a lista."""
+        self._sincronizar_regras()
+        base_xg = (self.base.get("xg_casa", 0.0) + self.base.get("xg_fora", 0.0)) / 2.0
+        return base_xg + self.golos, self.golos, base_xg
+
+    def interpretar(self) -> str:
+        return interpretar_tatica(self.eventos, self.base, 0)
+
+    # ---------- persistência ----------
+    def _paths(self):
+        nome = nome_ficheiro(self.jogo_id)
+        return os.path.join(self.pasta, nome + ".jsonl"), os.path.join(self.pasta, nome + ".snap.json")
+
+    def _registar(self, op: dict) -> None:
+        self.versao += 1
+        if not self.pasta:
+            return
+        log, _ = self._paths()
+        linha = (json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        if not os.path.exists(log):
+            linha = (json.dumps({"op": "jogo", "jogo_id": self.jogo_id}, ensure_ascii=False,
+                                separators=(",", ":")) + "\n").encode("utf-8") + linha
+        with open(log, "ab") as f:
+            f.write(linha)
+        contar_bytes("live", len(linha))
+        self._ops_desde_snap += 1
+        if self._ops_desde_snap >= self.snapshot_cada:
+            self.snapshot()
+
+    def snapshot(self) -> None:
+        log, snap = self._paths()
+        with self._lock:
+            offset = os.path.getsize(log) if os.path.exists(log) else 0
+            dados = {"jogo_id": self.jogo_id, "offset": offset, "base": self.base, "eventos": self.eventos}
+            tmp = snap + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(dados, f, ensure_ascii=False)
+            contar_ficheiro("live", tmp)
+            os.replace(tmp, snap)
+            self._ops_desde_snap = 0
+
+    @classmethod
+    def abrir(cls, jogo_id: str, pasta: str, **kw) -> "EstadoLive":
+        """Retoma um jogo a partir do último snapshot + cauda do log (ou começa vazio)."""
+        os.makedirs(pasta, exist_ok=True)
+        est = cls(jogo_id, pasta, **kw)
+        log, snap = est._paths()
+        offset = 0
+        try:
+            with open(snap, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            est.base, est.eventos, offset = dados.get("base") or {}, dados.get("eventos") or [], dados.get("offset", 0)
+        except (OSError, ValueError):
+            pass
+        est._recalcular()
+        est.linhas = [descrever_evento(i, ev) for i, ev in enumerate(est.eventos, 1)]
+        if os.path.exists(log):
+            with open(log, "rb") as f:
+                f.seek(offset)
+                for linha in f:
+                    try: op = json.loads(linha)
+                    except ValueError: continue
+                    est._reaplicar(op)
+                    est._ops_desde_snap += 1
+        return est
+
+    def _reaplicar(self, op: dict) -> None:
+        tipo = op.get("op")
+        if tipo == "ev": self._acrescentar(dict(op.get("ev") or {}))
+        elif tipo == "undo": self._desfazer()
+        elif tipo == "base": self.base = dict(op.get("base") or {})
+        elif tipo == "limpar":
+            self.eventos, self.linhas = [], []
+            self._zerar_agregados()
+
+
+def jogo_id_do_log(log: str) -> str:
+    """`jogo_id` gravado na 1ª linha do log; logs antigos (sem essa linha) dão o nome do ficheiro."""
+    try:
+        with open(log, "rb") as f:
+            op = json.loads(f.readline())
+        if op.get("op") == "jogo" and op.get("jogo_id"):
+            return op["jogo_id"]
+    except (OSError, ValueError, AttributeError):
+        pass
+    return os.path.basename(log)[:-len(".jsonl")]
+
+
+_INSTANCIAS: dict = {}
+_LOCK_INSTANCIAS = threading.Lock()
+
+
+def obter_estado(jogo_id: str, pasta: str = "live_jogos", **kw) -> EstadoLive:
+    """
+    Um EstadoLive por ficheiro de jogo e por processo; na primeira vez é retomado
+    do disco. A chave é o nome sanitizado ("Benfica/Porto" e "Benfica Porto" dão
+    Benfica_Porto.jsonl): duas instâncias a escrever no mesmo log baralhavam-no.
+    """
+    with _LOCK_INSTANCIAS:
+        chave = (pasta, nome_ficheiro(jogo_id))
+        if chave not in _INSTANCIAS:
+            _INSTANCIAS[chave] = EstadoLive.abrir(jogo_id, pasta, **kw)
+        return _INSTANCIAS[chave]
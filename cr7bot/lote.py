@@ -0,0 +1,151 @@
+# =============================== #
+#  Avaliação de jogos em lote (sem UI)
+# =============================== #
+"""
+Lê um ficheiro de jogos (CSV ou Parquet) em blocos, calcula odds justas,
+EV e stakes de Kelly com as mesmas funções da app e escreve o resultado
+em CSV ou Parquet. A memória fica limitada ao tamanho de um bloco.
+
+Colunas de entrada:
+    lambda_casa, lambda_fora                      (obrigatórias)
+    odd_casa, odd_empate, odd_fora,
+    odd_over15, odd_over25, odd_btts              (opcionais, por mercado)
+    banca                                         (opcional; senão --banca)
+
+Com --devig e as três odds 1X2 presentes, acrescenta também a probabilidade
+implícita do mercado sem margem (p_mercado_casa/empate/fora, cr7bot.margem)
+e a margem da casa (margem_1x2).
+
+Uso:
+    python -m cr7bot.lote jogos.csv resultado.parquet --banca 100 --fracao 0.5 [--devig shin]
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from cr7bot.apostas import calc_ev, kelly_criterion, odds_from_prob
+from cr7bot.margem import METODOS, margem, remover_margem
+from cr7bot.mercados import precos_mercados
+
+BLOCO_LINHAS = 50_000
+MERCADOS = ("casa", "empate", "fora", "over15", "over25", "btts")
+COLUNAS_1X2 = ("odd_casa", "odd_empate", "odd_fora")
+
+
+def _formato(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".parquet", ".pq"): return "parquet"
+    if ext in (".csv", ".txt", ""): return "csv"
+    raise ValueError(f"Formato não suportado: {path}")
+
+
+def ler_blocos(path: str, bloco: int = BLOCO_LINHAS):
+    """
+    Gera DataFrames de no máximo `bloco` linhas, sem carregar o ficheiro inteiro.
+    No CSV os tipos são inferidos bloco a bloco (`100` dá int64 num bloco e `50.5`
+    float64 no seguinte), por isso as colunas numéricas saem sempre em float64:
+    o esquema do 1º bloco é o que o ParquetWriter aceita até ao fim.
+    """
+    if _formato(path) == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=bloco):
+            yield batch.to_pandas()
+    else:
+        for df in pd.read_csv(path, chunksize=bloco):
+            numericas = df.select_dtypes("number").columns
+            yield df.astype(dict.fromkeys(numericas, "float64"))
+
+
+class EscritorLote:
+    """Escreve blocos sucessivos no mesmo ficheiro CSV/Parquet."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.formato = _formato(path)
+        self._writer = None
+        self._primeiro = True
+
+    def escrever(self, df: pd.DataFrame) -> None:
+        if self.formato == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, tabela.schema)
+            self._writer.write_table(tabela.cast(self._writer.schema))
+        else:
+            df.to_csv(self.path, mode="w" if self._primeiro else "a", header=self._primeiro, index=False)
+        self._primeiro = False
+
+    def fechar(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.fechar()
+
+
+def avaliar_bloco(df: pd.DataFrame, banca: float = 100.0, fracao: float = 1.0,
+                  max_frac: float = 0.25, devig: str = None) -> pd.DataFrame:
+    """Acrescenta p_*, odd_justa_*, ev_* e stake_* para cada mercado com odd presente
+    (e p_mercado_* / margem_1x2 com `devig`)."""
+    r = precos_mercados(df["lambda_casa"].to_numpy(float), df["lambda_fora"].to_numpy(float),
+                        linhas=(1.5, 2.5), resultado_exato=False)
+    probs = {
+        "casa": r["1"], "empate": r["X"], "fora": r["2"],
+        "over15": r["over"][1.5], "over25": r["over"][2.5], "btts": r["btts"],
+    }
+    bancas = df["banca"].to_numpy(float) if "banca" in df else np.full(len(df), float(banca))
+    out = df.copy()
+    for mercado in MERCADOS:
+        p = np.atleast_1d(probs[mercado])
+        out[f"p_{mercado}"] = p
+        out[f"odd_justa_{mercado}"] = np.atleast_1d(odds_from_prob(p))
+        col = f"odd_{mercado}"
+        if col in df:
+            odd = df[col].to_numpy(float)
+            out[f"ev_{mercado}"] = np.atleast_1d(calc_ev(p, odd))
+            out[f"stake_{mercado}"] = np.atleast_1d(kelly_criterion(p, odd, bancas, fracao, max_frac))
+    if devig and all(c in df for c in COLUNAS_1X2):
+        odds = df[list(COLUNAS_1X2)].to_numpy(float)
+        p_mercado = remover_margem(odds, devig)
+        for i, mercado in enumerate(MERCADOS[:3]):
+            out[f"p_mercado_{mercado}"] = p_mercado[:, i]
+        out["margem_1x2"] = margem(odds)
+    return out
+
+
+def avaliar_ficheiro(entrada: str, saida: str, banca: float = 100.0, fracao: float = 1.0,
+                     max_frac: float = 0.25, bloco: int = BLOCO_LINHAS, devig: str = None) -> int:
+    """Processa `entrada` bloco a bloco para `saida`. Devolve o nº de linhas escritas."""
+    n = 0
+    with EscritorLote(saida) as w:
+        for df in ler_blocos(entrada, bloco):
+            w.escrever(avaliar_bloco(df, banca, fracao, max_frac, devig))
+            n += len(df)
+    return n
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m cr7bot.lote",
+                                 description="Odds justas, EV e Kelly para um ficheiro de jogos.")
+    ap.add_argument("entrada", help="CSV ou Parquet com lambda_casa, lambda_fora e odds")
+    ap.add_argument("saida", help="ficheiro de saída (.csv ou .parquet)")
+    ap.add_argument("--banca", type=float, default=100.0, help="banca quando não há coluna 'banca'")
+    ap.add_argument("--fracao", type=float, default=1.0, help="fração de Kelly (ex.: 0.5)")
+    ap.add_argument("--max-frac", type=float, default=0.25, help="limite da stake em fração da banca")
+    ap.add_argument("--bloco", type=int, default=BLOCO_LINHAS, help="linhas por bloco")
+    ap.add_argument("--devig", choices=METODOS, help="método para tirar a margem às odds 1X2")
+    args = ap.parse_args(argv)
+    n = avaliar_ficheiro(args.entrada, args.saida, args.banca, args.fracao, args.max_frac, args.bloco, args.devig)
+    print(f"{n} jogos avaliados -> {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
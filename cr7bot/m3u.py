@@ -0,0 +1,131 @@
+# --------- PARSER DE STREAMS (M3U / M3U8) ---------
+"""
+`iter_m3u` lê a playlist por blocos (texto, bytes, ficheiro carregado ou
+iterável de blocos) e vai devolvendo um `Canal` de cada vez: a playlist
+nunca é materializada nem copiada por inteiro, e uma página da UI é só um
+`islice` sobre o gerador. `parse_m3u` continua a devolver a lista de dicts.
+"""
+import codecs
+import re
+from collections import namedtuple
+from itertools import islice
+from typing import Optional
+
+M3U_ENTRY_RE = re.compile(r'#EXTINF:-?\d+.*?,(?P<name>.+)\n(?P<url>https?://[^\s]+)', re.IGNORECASE)
+
+# Tuplo compacto por canal (sem __dict__): 5 campos, "" quando o atributo falta.
+Canal = namedtuple("Canal", "nome url tvg_id grupo logo")
+
+def parse_m3u_or_url(raw: str) -> Optional[str]:
+    if not raw: return None
+    s = raw.strip()
+    if s.lower().startswith(("http://","https://")) and (".m3u8" in s.lower() or ".mpd" in s.lower()):
+        return s
+    if "#EXTM3U" in s:
+        for line in s.splitlines():
+            line = line.strip()
+            if line.lower().startswith(("http://","https://")) and ".m3u8" in line.lower():
+                return line
+    return None
+
+def _blocos(fonte, tamanho: int):
+    """Normaliza a fonte para um iterável de blocos de texto."""
+    if isinstance(fonte, str):
+        yield fonte
+        return
+    if isinstance(fonte, (bytes, bytearray, memoryview)):
+        fonte = (bytes(fonte),)
+    elif hasattr(fonte, "read"):
+        f = fonte
+        if hasattr(f, "seek"): f.seek(0)
+        fonte = iter(lambda: f.read(tamanho), f.read(0))
+    dec = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    for bloco in fonte:
+        yield dec.decode(bloco) if isinstance(bloco, (bytes, bytearray)) else bloco
+    yield dec.decode(b"", final=True)
+
+# Uma linha relevante por match, classificada pelo grupo: 1 = #EXTINF, 2 = #EXTGRP, 3 = URL, 4 = outra
+# linha de conteúdo (anula o #EXTINF pendente). Comentários e linhas vazias são saltados pelo próprio regex.
+M3U_LINHA_RE = re.compile(r'^[ \t]*(?:(#EXTINF[^\r\n]*)|#EXTGRP:([^\r\n]*)|(https?://[^\s]+)[^\r\n]*|([^#\s][^\r\n]*))',
+                          re.IGNORECASE | re.MULTILINE)
+
+def _texto_completo(fonte, tamanho: int):
+    """Blocos de texto terminados em fim de linha (o resto passa para o bloco seguinte)."""
+    resto = ""
+    for bloco in _blocos(fonte, tamanho):
+        if not bloco: continue
+        bloco = resto + bloco
+        corte = bloco.rfind("\n") + 1
+        resto = bloco[corte:]
+        if corte: yield bloco[:corte]
+    if resto: yield resto
+
+def _attr(linha: str, chave: str, fim: int) -> str:
+    i = linha.find(chave, 0, fim)
+    if i < 0: return ""
+    i += len(chave)
+    j = linha.find('"', i, fim)
+    return linha[i:j if j >= 0 else fim]
+
+# Atributos de um #EXTINF até à vírgula que separa o nome: as aspas abrem e fecham valores, e só
+# uma vírgula fora de aspas termina o match (o nome pode ter aspas e vírgulas à vontade).
+EXTINF_ATTRS_RE = re.compile(r'[^",]*(?:"[^"]*"[^",]*)*')
+
+def _virgula_nome(linha: str) -> int:
+    """Índice da 1ª vírgula fora de aspas (a que separa os atributos do nome); -1 se não houver."""
+    fim = EXTINF_ATTRS_RE.match(linha).end()
+    return fim if linha.startswith(",", fim) else -1
+
+def _extinf(linha: str) -> tuple:
+    """(nome, tvg-id, group-title, logo) de uma linha #EXTINF; o nome pode ter aspas e vírgulas."""
+    aspas = linha.find('"')
+    if aspas < 0:
+        virg = linha.find(",")
+        return (linha[virg + 1:].strip() if virg >= 0 else ""), "", "", ""
+    virg = linha.find(",", 0, aspas)            # vírgula antes de qualquer aspa: não há atributos
+    if virg < 0:
+        # caso normal: a 1ª aspa de fecho seguida de vírgula (nº par de aspas até ela inclusive)
+        virg = linha.find('",', aspas) + 1
+        if not virg or linha.count('"', 0, virg) % 2:
+            virg = _virgula_nome(linha)
+    nome = linha[virg + 1:].strip() if virg >= 0 else ""
+    fim = virg if virg >= 0 else len(linha)
+    return (nome, _attr(linha, 'tvg-id="', fim), _attr(linha, 'group-title="', fim),
+            _attr(linha, 'tvg-logo="', fim))
+
+def iter_m3u(fonte, tamanho_bloco: int = 1 << 16):
+    """
+    Gera `Canal` a partir de uma playlist M3U/M3U8, bloco a bloco.
+    Cada #EXTINF é associado ao URL http(s) seguinte (linhas #EXTGRP/#EXTVLCOPT
+    pelo meio são aceites). Sem nenhum #EXTINF até aí, URLs .m3u8 soltos contam
+    como canal com o nome do último segmento do caminho (como o parser antigo).
+    """
+    pendente, viu_extinf = None, False
+    for bloco in _texto_completo(fonte, tamanho_bloco):
+        for m in M3U_LINHA_RE.finditer(bloco):
+            g = m.lastindex
+            if g == 3:
+                url = m.group(3)
+                if pendente is not None:
+                    nome, tvg_id, grupo, logo = pendente
+                    yield Canal(nome or url.rsplit("/", 1)[-1], url, tvg_id, grupo, logo)
+                    pendente = None
+                elif not viu_extinf and ".m3u8" in m.group(0).lower():
+                    linha = m.group(0).strip()
+                    yield Canal(linha.rsplit("/", 1)[-1], linha, "", "", "")
+            elif g == 1:
+                pendente, viu_extinf = _extinf(m.group(1)), True
+            elif g == 2:
+                if pendente and not pendente[2]:
+                    pendente = pendente[:2] + (m.group(2).strip(),) + pendente[3:]
+            else:
+                pendente = None
+
+def pagina_m3u(fonte, pagina: int = 0, por_pagina: int = 100) -> tuple:
+    """(canais da página, há mais páginas) lendo só até ao fim da página pedida."""
+    inicio = max(0, int(pagina)) * por_pagina
+    canais = list(islice(iter_m3u(fonte), inicio, inicio + por_pagina + 1))
+    return canais[:por_pagina], len(canais) > por_pagina
+
+def parse_m3u(text: str):
+    return [{"name": c.nome, "url": c.url} for c in iter_m3u(text)]
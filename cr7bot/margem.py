@@ -0,0 +1,130 @@
+# =============================== #
+#  Remoção da margem (de-vig)
+# =============================== #
+"""
+Converte odds de uma casa em probabilidades justas implícitas, retirando a
+margem (overround). Cada linha de `odds` é um mercado com resultados
+mutuamente exclusivos (1X2, over/under, sim/não); o último eixo são os
+resultados. NaN = resultado ausente, por isso mercados de 2 e 3 resultados
+podem ir na mesma matriz (uma folha de odds do dia inteiro de uma vez).
+
+Métodos (π = 1/odd, S = Σπ):
+- multiplicativo: p = π / S;
+- aditivo:        p = π - (S - 1) / n   (cortado em 0 e renormalizado);
+- potencia:       p = π^k com Σ π^k = 1;
+- shin:           p = (√(z² + 4(1-z)·π²/S) - z) / (2(1-z)) com Σ p = 1
+                  (z = fração de apostadores informados, modelo de Shin).
+
+potencia e shin resolvem o parâmetro por Newton, vetorizado sobre todos os
+mercados ao mesmo tempo (cada iteração é uma passagem NumPy pela matriz).
+"""
+
+import numpy as np
+
+METODOS = ("multiplicativo", "aditivo", "potencia", "shin")
+
+
+def _implicitas(odds) -> tuple:
+    odds = np.asarray(odds, dtype=float)
+    presente = np.isfinite(odds) & (odds > 1.0)
+    pi = np.where(presente, 1.0 / np.where(presente, odds, 1.0), 0.0)
+    return pi, presente
+
+
+def margem(odds):
+    """Overround de cada mercado: Σ 1/odd - 1."""
+    pi, _ = _implicitas(odds)
+    return pi.sum(axis=-1) - 1.0
+
+
+def _newton(passo, x0, tol, max_iter):
+    """
+    Newton vetorizado: `passo(idx, x)` devolve (f, f/f') para as linhas idx.
+    Só as linhas ainda não convergidas entram em cada iteração.
+    """
+    x = x0.copy()
+    ativos = np.arange(len(x))
+    for _ in range(max_iter):
+        if not len(ativos):
+            break
+        f, delta = passo(ativos, x[ativos])
+        x[ativos] -= delta
+        ativos = ativos[np.abs(f) >= tol]
+    return x
+
+
+def _potencia(pi, presente, tol, max_iter):
+    """k tal que Σ π^k = 1. f(k) é decrescente e convexa: a partir de k=1 o Newton não salta a raiz."""
+    log_pi = np.where(presente, np.log(np.where(presente, pi, 1.0)), 0.0)
+
+    def passo(idx, k):
+        lp, pres = log_pi[idx], presente[idx]
+        pk = np.where(pres, np.exp(k[:, None] * lp), 0.0)
+        f = pk.sum(axis=1) - 1.0
+        df = (pk * lp).sum(axis=1)
+        return f, np.where(df < 0, f / np.where(df < 0, df, -1.0), 0.0)
+
+    k = _newton(passo, np.ones(len(pi)), tol, max_iter)
+    return np.where(presente, np.exp(k[:, None] * log_pi), 0.0), k
+
+
+def _shin_p(a, presente, z):
+    r = np.sqrt(z[:, None] ** 2 + 4.0 * (1.0 - z[:, None]) * a)
+    return np.where(presente, (r - z[:, None]) / (2.0 * (1.0 - z[:, None])), 0.0), r
+
+
+def _shin(pi, presente, tol, max_iter):
+    """z tal que Σ p_i(z) = 1 (derivada analítica). Mercados sem margem (S ≤ 1) ficam com z = 0 e p = π/S."""
+    s = pi.sum(axis=1)
+    a = pi * pi / np.where(s > 0, s, 1.0)[:, None]
+
+    def passo(idx, z):
+        ai, pres = a[idx], presente[idx]
+        p, r = _shin_p(ai, pres, z)
+        f = p.sum(axis=1) - 1.0
+        um, zc = (1.0 - z)[:, None], z[:, None]
+        dr = np.where(r > 0, (zc - 2.0 * ai) / np.where(r > 0, r, 1.0), 0.0)
+        df = np.where(pres, ((dr - 1.0) * um + (r - zc)) / (2.0 * um * um), 0.0).sum(axis=1)
+        novo = np.clip(z - np.where(df != 0, f / np.where(df != 0, df, 1.0), 0.0), 0.0, 0.999)
+        return f, z - novo
+
+    com_margem = s > 1.0
+    linhas = np.flatnonzero(com_margem)
+    z = np.zeros(len(pi))
+    z[linhas] = _newton(lambda idx, zz: passo(linhas[idx], zz), z[linhas], tol, max_iter)
+    p, _ = _shin_p(a, presente, z)
+    p = np.where(com_margem[:, None], p, pi / np.where(s > 0, s, 1.0)[:, None])
+    return p, z
+
+
+def remover_margem(odds, metodo: str = "multiplicativo", tol: float = 1e-12, max_iter: int = 50,
+                   parametro: bool = False):
+    """
+    Probabilidades justas com a forma de `odds` (NaN onde a odd falta, e na
+    linha toda se o mercado tiver menos de 2 resultados).
+    parametro=True devolve também o parâmetro ajustado por mercado
+    (k na potência, z no Shin; NaN nos métodos fechados).
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"método inválido: {metodo} (use {', '.join(METODOS)})")
+    pi, presente = _implicitas(odds)
+    forma = pi.shape
+    pi, presente = pi.reshape(-1, forma[-1]), presente.reshape(-1, forma[-1])
+    presente &= (presente.sum(axis=1) >= 2)[:, None]     # um só resultado não é mercado
+    pi = np.where(presente, pi, 0.0)
+    par = np.full(len(pi), np.nan)
+    if metodo == "multiplicativo":
+        s = pi.sum(axis=-1, keepdims=True)
+        p = pi / np.where(s > 0, s, 1.0)
+    elif metodo == "aditivo":
+        n = presente.sum(axis=-1, keepdims=True)
+        p = np.where(presente, np.maximum(pi - (pi.sum(axis=-1, keepdims=True) - 1.0) / np.maximum(n, 1), 0.0), 0.0)
+        s = p.sum(axis=-1, keepdims=True)
+        p = p / np.where(s > 0, s, 1.0)
+    elif metodo == "potencia":
+        p, par = _potencia(pi, presente, tol, max_iter)
+    else:
+        p, par = _shin(pi, presente, tol, max_iter)
+    p = np.where(presente, p, np.nan).reshape(forma)
+    par = np.where(presente.any(axis=1), par, np.nan).reshape(forma[:-1])
+    return (p, par) if parametro else p
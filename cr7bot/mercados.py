@@ -0,0 +1,219 @@
+# =============================== #
+#  Motor de preços — matriz de resultados Poisson
+# =============================== #
+"""
+Constrói a matriz de resultados casa×fora uma única vez por par de lambdas e
+deriva dela todos os mercados: 1X2, dupla hipótese, over/under, BTTS,
+resultado exato e a escada asiática (handicaps e totais, com linhas de
+quarto). Aceita escalares ou arrays de lambdas, por isso uma jornada
+inteira é avaliada numa só chamada vetorizada.
+"""
+
+import math
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from cr7bot.cache import CacheQuantizada, memo_quantizada
+from cr7bot.instrumentacao import medir
+
+MAX_GOLOS = 15
+LINHAS_GOLOS = (0.5, 1.5, 2.5, 3.5, 4.5, 5.5)
+HANDICAPS_ASIATICOS = tuple(np.arange(-12, 13) / 4)          # -3.0 .. +3.0 de 0.25 em 0.25
+TOTAIS_ASIATICOS = tuple(np.arange(2, 27) / 4)               # 0.5 .. 6.5 de 0.25 em 0.25
+LIQUIDACOES = (1.0, 0.5, 0.0, -0.5, -1.0)                    # ganha, meio ganha, reembolso, meio perde, perde
+LAMBDA_MIN = 1e-9
+
+# Cache das chamadas escalares (partilhada por todas as sessões do processo).
+# Lambdas quantizados a CR7_CACHE_CASAS casas decimais; no máximo CR7_CACHE_MAX entradas.
+CACHE_PROBS = CacheQuantizada(
+    max_itens=int(os.environ.get("CR7_CACHE_MAX", 4096)),
+    casas=int(os.environ.get("CR7_CACHE_CASAS", 4)),
+)
+
+
+def _escalar(x):
+    """Devolve float quando o resultado é 0-d (chamadas escalares)."""
+    return float(x) if np.ndim(x) == 0 else x
+
+
+@lru_cache(maxsize=8)
+def _log_fatorial(max_goals: int):
+    k = np.arange(max_goals + 1, dtype=float)
+    lf = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, max_goals + 1)))))
+    return k, lf
+
+
+@lru_cache(maxsize=8)
+def _onehot_totais(max_goals: int) -> np.ndarray:
+    """Matriz ((G+1)², 2G+1) que soma a matriz de resultados por total de golos."""
+    n = max_goals + 1
+    gh, ga = np.indices((n, n))
+    oh = np.zeros((n * n, 2 * n - 1))
+    oh[np.arange(n * n), (gh + ga).ravel()] = 1.0
+    return oh
+
+
+@lru_cache(maxsize=8)
+def _onehot_margens(max_goals: int) -> np.ndarray:
+    """Matriz ((G+1)², 2G+1) que soma por margem casa-fora (índice = margem + G)."""
+    n = max_goals + 1
+    gh, ga = np.indices((n, n))
+    oh = np.zeros((n * n, 2 * n - 1))
+    oh[np.arange(n * n), (gh - ga + max_goals).ravel()] = 1.0
+    return oh
+
+
+def pois_pmf(k: int, lam: float) -> float:
+    if k < 0: return 0.0
+    lam = max(float(lam), LAMBDA_MIN)
+    return math.exp(k * math.log(lam) - lam - math.lgamma(k + 1))
+
+
+def pmf_golos(lam, max_goals: int = MAX_GOLOS) -> np.ndarray:
+    """PMF 0..max_goals para cada lambda; forma lam.shape + (max_goals+1,)."""
+    lam = np.maximum(np.asarray(lam, dtype=float), LAMBDA_MIN)[..., None]
+    k, lf = _log_fatorial(max_goals)
+    return np.exp(k * np.log(lam) - lam - lf)
+
+
+def matriz_resultados(l_home, l_away, max_goals: int = MAX_GOLOS) -> np.ndarray:
+    """Matriz P(casa=i, fora=j) normalizada; forma broadcast(l_home, l_away) + (G+1, G+1)."""
+    l_home, l_away = np.broadcast_arrays(np.asarray(l_home, dtype=float), np.asarray(l_away, dtype=float))
+    m = pmf_golos(l_home, max_goals)[..., :, None] * pmf_golos(l_away, max_goals)[..., None, :]
+    s = m.sum(axis=(-2, -1), keepdims=True)
+    return m / np.where(s > 0, s, 1.0)
+
+
+def distribuicao_totais(m: np.ndarray) -> np.ndarray:
+    """P(total = t), t = 0..2G, a partir da matriz de resultados."""
+    g = m.shape[-1] - 1
+    return m.reshape(m.shape[:-2] + (-1,)) @ _onehot_totais(g)
+
+
+def distribuicao_margens(m: np.ndarray) -> np.ndarray:
+    """P(casa - fora = d), índice d + G, a partir da matriz de resultados."""
+    g = m.shape[-1] - 1
+    return m.reshape(m.shape[:-2] + (-1,)) @ _onehot_margens(g)
+
+
+@medir("mercados.precos_matriz")
+def precos_matriz(m: np.ndarray, linhas=LINHAS_GOLOS, resultado_exato: bool = True) -> dict:
+    """Todos os mercados de uma (ou várias) matriz(es) de resultados numa só passagem."""
+    g = m.shape[-1] - 1
+    margens = distribuicao_margens(m)
+    totais = distribuicao_totais(m)
+    p1 = margens[..., g + 1:].sum(axis=-1)
+    px = margens[..., g]
+    p2 = margens[..., :g].sum(axis=-1)
+    t = np.arange(totais.shape[-1])
+    over, under = {}, {}
+    for linha in linhas:
+        over[linha] = _escalar((totais * (t > linha)).sum(axis=-1))
+        under[linha] = _escalar((totais * (t < linha)).sum(axis=-1))
+    out = {
+        "1": _escalar(p1), "X": _escalar(px), "2": _escalar(p2),
+        "1X": _escalar(p1 + px), "12": _escalar(p1 + p2), "X2": _escalar(px + p2),
+        "btts": _escalar(m[..., 1:, 1:].sum(axis=(-2, -1))),
+        "over": over, "under": under,
+        "totais": totais,
+    }
+    if resultado_exato:
+        out["cs"] = m
+    return out
+
+
+def precos_mercados(l_home, l_away, linhas=LINHAS_GOLOS, max_goals: int = MAX_GOLOS,
+                    resultado_exato: bool = True) -> dict:
+    """
+    Preços justos (probabilidades) para um par ou um lote de pares de lambdas.
+    Chaves: 1, X, 2, 1X, 12, X2, btts, over{linha}, under{linha}, totais, cs.
+    """
+    return precos_matriz(matriz_resultados(l_home, l_away, max_goals), linhas, resultado_exato)
+
+
+# ===== Helpers escalares (memoizados na CACHE_PROBS) =====
+@medir("mercados.poisson_outcome_probs")
+@memo_quantizada(CACHE_PROBS)
+def poisson_outcome_probs(l_home, l_away, max_goals: int = MAX_GOLOS):
+    r = precos_mercados(l_home, l_away, linhas=(), max_goals=max_goals, resultado_exato=False)
+    return r["1"], r["X"], r["2"]
+
+
+@memo_quantizada(CACHE_PROBS)
+def prob_over(total_lambda, line: float):
+    """P(total > line). Ex.: 1.5 => 1 - P(0)-P(1)."""
+    kmax = int(math.floor(line))
+    s = pmf_golos(total_lambda, kmax).sum(axis=-1)
+    return _escalar(np.clip(1.0 - s, 0.0, 1.0))
+
+
+@memo_quantizada(CACHE_PROBS)
+def prob_btts(l_home, l_away):
+    """1 - P(casa=0) - P(fora=0) + P(0-0)."""
+    lh = np.maximum(np.asarray(l_home, dtype=float), LAMBDA_MIN)
+    la = np.maximum(np.asarray(l_away, dtype=float), LAMBDA_MIN)
+    p = 1.0 - np.exp(-lh) - np.exp(-la) + np.exp(-(lh + la))
+    return _escalar(np.clip(p, 0.0, 1.0))
+
+
+@memo_quantizada(CACHE_PROBS)
+def matriz_jogo(l_home, l_away, max_goals: int = MAX_GOLOS) -> np.ndarray:
+    """matriz_resultados memoizada por par de lambdas (só leitura: é partilhada por todas as chamadas)."""
+    m = matriz_resultados(l_home, l_away, max_goals)
+    m.flags.writeable = False
+    return m
+
+
+# ===== Linhas asiáticas =====
+@lru_cache(maxsize=32)
+def _onehot_liquidacao(linhas: tuple, max_goals: int, totais: bool) -> np.ndarray:
+    """
+    Matriz (2G+1, 5·L): para cada margem (ou total) e cada linha, a liquidação
+    da aposta na casa (ou no over) numa das LIQUIDACOES. Uma linha de quarto
+    (ex.: -0.75) é meia stake em cada uma das linhas vizinhas (-0.5 e -1.0).
+    """
+    n = 2 * max_goals + 1
+    x = np.arange(n) if totais else np.arange(n) - max_goals
+    l = np.asarray(linhas, dtype=float)
+    quarto = (np.round(l * 4) % 2 == 1) * 0.25                   # só as linhas .25/.75 se dividem
+    partes = [l - quarto, l + quarto]
+    if totais:                                                   # over ganha com total > linha
+        liq = sum(np.sign(x[:, None] - c[None, :]) for c in partes) / 2
+    else:                                                        # casa ganha com margem + handicap > 0
+        liq = sum(np.sign(x[:, None] + c[None, :]) for c in partes) / 2
+    oh = np.stack([liq == v for v in LIQUIDACOES], axis=1)       # (2G+1, 5, L)
+    return oh.reshape(n, -1).astype(float)
+
+
+def _escada(dist: np.ndarray, linhas, max_goals: int, totais: bool) -> dict:
+    linhas = tuple(float(x) for x in linhas)
+    r = (dist @ _onehot_liquidacao(linhas, max_goals, totais)).reshape(dist.shape[:-1] + (len(LIQUIDACOES), -1))
+    ganha, meio_ganha, reembolso, meio_perde, perde = (r[..., i, :] for i in range(len(LIQUIDACOES)))
+    # retorno esperado nulo: pg·(o-1) = pp, com os meios a contar metade
+    pg, pp = ganha + meio_ganha / 2, perde + meio_perde / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        odd_a, odd_b = np.where(pg > 0, 1 + pp / pg, np.inf), np.where(pp > 0, 1 + pg / pp, np.inf)
+    return {"linhas": np.array(linhas), "ganha": ganha, "meio_ganha": meio_ganha, "reembolso": reembolso,
+            "meio_perde": meio_perde, "perde": perde, "odd_a": odd_a, "odd_b": odd_b}
+
+
+@medir("mercados.escada_asiatica")
+def escada_asiatica(m: np.ndarray, handicaps=HANDICAPS_ASIATICOS, totais=TOTAIS_ASIATICOS) -> dict:
+    """
+    Handicaps e totais asiáticos de uma (ou várias) matriz(es) de resultados,
+    todas as linhas de uma vez (uma multiplicação de matrizes por mercado).
+
+    "handicap": linha = handicap da casa (o da fora é o simétrico); "totais": over/under.
+    Cada um tem arrays (..., L) com a probabilidade de cada liquidação do lado
+    casa/over — ganha, meio_ganha, reembolso, meio_perde, perde — e as odds
+    justas dos dois lados (odd_casa/odd_fora, odd_over/odd_under), i.e. as que
+    dão retorno esperado nulo contando reembolsos e meias apostas.
+    """
+    g = m.shape[-1] - 1
+    h = _escada(distribuicao_margens(m), handicaps, g, totais=False)
+    t = _escada(distribuicao_totais(m), totais, g, totais=True)
+    h["odd_casa"], h["odd_fora"] = h.pop("odd_a"), h.pop("odd_b")
+    t["odd_over"], t["odd_under"] = t.pop("odd_a"), t.pop("odd_b")
+    return {"handicap": h, "totais": t}
@@ -0,0 +1,187 @@
+# =============================== #
+#  Painel multi-jogo (live)
+# =============================== #
+"""
+Acompanha vários jogos live em simultâneo. Uma thread em segundo plano
+percorre os jogos seguidos e, para os que mudaram desde o último cálculo
+(`EstadoLive.versao`), recalcula o xG da 2ª parte e os preços dos mercados
+— todos os jogos alterados de uma vez, num único lote NumPy. O script
+Streamlit só lê `resultados()`: o autorefresh nunca recalcula nada.
+
+O painel é partilhado pelo processo, mas cada sessão subscreve os seus
+jogos: um jogo é seguido enquanto houver pelo menos uma sessão com ele
+(contagem de referências). Sessões sem sincronizar há mais de `ttl`
+segundos (separador fechado) deixam de contar.
+"""
+
+import os
+import threading
+import time
+
+from cr7bot.live import dividir_xg, jogo_id_do_log, obter_estado
+
+LINHAS_2P = (0.5, 1.5, 2.5)
+
+
+def jogos_disponiveis(pasta: str) -> list:
+    """IDs dos jogos com log em `pasta` (os que já foram abertos no separador Live)."""
+    try:
+        nomes = [n for n in os.listdir(pasta) if n.endswith(".jsonl")]
+    except OSError:
+        return []
+    return sorted(jogo_id_do_log(os.path.join(pasta, n)) for n in nomes)
+
+
+class Painel:
+    def __init__(self, pasta: str = "live_jogos", intervalo: float = 2.0, linhas=LINHAS_2P,
+                 ttl: float = 900.0):
+        self.pasta = pasta
+        self.intervalo = float(intervalo)
+        self.linhas = tuple(linhas)
+        self.ttl = float(ttl)
+        self._jogos = []                  # IDs seguidos por alguma sessão, por ordem de entrada
+        self._refs = {}                   # jogo -> nº de sessões que o seguem
+        self._subs = {}                   # sessão -> set de jogos subscritos
+        self._vistos = {}                 # sessão -> última sincronização
+        self._versoes = {}                # jogo -> versão do estado já calculada
+        self._resultados = {}             # jogo -> dict pronto a mostrar
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+        self.recalculos = 0
+
+    def subscrever(self, sessao: str, jogo_id: str) -> None:
+        with self._lock:
+            self._vistos[sessao] = time.time()
+            self._subscrever(sessao, jogo_id)
+        self._acordar.set()
+        self._arrancar()
+
+    def cancelar(self, sessao: str, jogo_id: str) -> None:
+        with self._lock:
+            self._cancelar(sessao, jogo_id)
+
+    def sincronizar(self, sessao: str, jogos) -> None:
+        """Deixa a sessão a seguir exatamente `jogos` (subscreve os novos, cancela os que saíram)."""
+        jogos = [j for j in jogos if j]
+        with self._lock:
+            self._vistos[sessao] = time.time()
+            for j in self._subs.get(sessao, set()) - set(jogos):
+                self._cancelar(sessao, j)
+            for j in jogos:
+                self._subscrever(sessao, j)
+            self._expirar()
+        self._acordar.set()
+        self._arrancar()
+
+    def terminar_sessao(self, sessao: str) -> None:
+        with self._lock:
+            for j in list(self._subs.get(sessao, ())):
+                self._cancelar(sessao, j)
+            self._subs.pop(sessao, None)
+            self._vistos.pop(sessao, None)
+
+    def subscritos(self, sessao: str) -> list:
+        with self._lock:
+            return [j for j in self._jogos if j in self._subs.get(sessao, ())]
+
+    # chamadas com o lock já adquirido
+    def _subscrever(self, sessao: str, jogo_id: str) -> None:
+        subs = self._subs.setdefault(sessao, set())
+        if not jogo_id or jogo_id in subs:
+            return
+        subs.add(jogo_id)
+        self._refs[jogo_id] = self._refs.get(jogo_id, 0) + 1
+        if jogo_id not in self._jogos:
+            self._jogos.append(jogo_id)
+
+    def _cancelar(self, sessao: str, jogo_id: str) -> None:
+        subs = self._subs.get(sessao)
+        if not subs or jogo_id not in subs:
+            return
+        subs.discard(jogo_id)
+        self._refs[jogo_id] -= 1
+        if self._refs[jogo_id] <= 0:      # ninguém o segue: deixa de ser calculado
+            del self._refs[jogo_id]
+            self._jogos.remove(jogo_id)
+            self._versoes.pop(jogo_id, None)
+            self._resultados.pop(jogo_id, None)
+
+    def _expirar(self) -> None:
+        limite = time.time() - self.ttl
+        for sessao in [s for s, t in self._vistos.items() if t < limite]:
+            for j in list(self._subs.get(sessao, ())):
+                self._cancelar(sessao, j)
+            self._subs.pop(sessao, None)
+            self._vistos.pop(sessao, None)
+
+    def jogos(self) -> list:
+        with self._lock:
+            return list(self._jogos)
+
+    def resultados(self) -> dict:
+        """Último cálculo de cada jogo seguido (sem recalcular)."""
+        with self._lock:
+            return {j: self._resultados[j] for j in self._jogos if j in self._resultados}
+
+    def recalcular_pendentes(self) -> int:
+        """Recalcula só os jogos cuja versão mudou. Devolve quantos foram recalculados."""
+        from cr7bot.mercados import precos_mercados
+
+        pendentes = []
+        for jogo in self.jogos():
+            est = obter_estado(jogo, self.pasta)
+            with est._lock:
+                if self._versoes.get(jogo) == est.versao:
+                    continue
+                versao, base, n = est.versao, dict(est.base), len(est.eventos)
+                xg_2p, ajuste, xg_pond = est.xg_live()
+                tatica = est.interpretar()
+            pendentes.append((jogo, versao, base, n, xg_2p, ajuste, xg_pond, tatica))
+        if not pendentes:
+            return 0
+
+        lh, la = zip(*(dividir_xg(p[2], p[4]) for p in pendentes))
+        precos = precos_mercados(list(lh), list(la), linhas=self.linhas, resultado_exato=False)
+        agora = time.time()
+        with self._lock:
+            for k, (jogo, versao, base, n, xg_2p, ajuste, xg_pond, tatica) in enumerate(pendentes):
+                if jogo not in self._jogos or self._versoes.get(jogo, -1) > versao:
+                    continue                  # largado, ou outra chamada já gravou um cálculo mais recente
+                self._resultados[jogo] = {
+                    "xg_2p": xg_2p, "ajuste": ajuste, "xg_ponderado": xg_pond, "eventos": n,
+                    "tatica": tatica, "base": bool(base), "atualizado": agora,
+                    "precos": {m: float(precos[m][k]) for m in ("1", "X", "2", "btts")},
+                    "over": {l: float(precos["over"][l][k]) for l in self.linhas},
+                }
+                self._versoes[jogo] = versao
+            self.recalculos += len(pendentes)
+        return len(pendentes)
+
+    def _arrancar(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._ciclo, name="painel-live", daemon=True)
+                    self._thread.start()
+
+    def _ciclo(self) -> None:
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                with self._lock:
+                    self._expirar()
+                self.recalcular_pendentes()
+            except Exception:
+                pass
+
+
+_INSTANCIAS: dict = {}
+
+
+def obter_painel(pasta: str = "live_jogos", **kw) -> Painel:
+    """Um painel por pasta e por processo (partilhado entre sessões)."""
+    if pasta not in _INSTANCIAS:
+        _INSTANCIAS[pasta] = Painel(pasta, **kw)
+    return _INSTANCIAS[pasta]
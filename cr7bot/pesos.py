@@ -0,0 +1,13 @@
+# ======== PESOS (Painel de Pesos) ========
+FATORES = ["Motivação","Árbitro","Pressão","Importância","Desgaste","Viagem","Formação","Titulares"]
+
+PESOS_PADRAO = {
+    "Motivação_C": 0.01, "Motivação_F": 0.01,
+    "Árbitro_C": 0.00, "Árbitro_F": 0.00,
+    "Pressão_C": 0.02, "Pressão_F": 0.02,
+    "Importância_C": 0.01, "Importância_F": 0.01,
+    "Desgaste_C": 0.01, "Desgaste_F": 0.01,
+    "Viagem_C": 0.01, "Viagem_F": 0.01,
+    "Formação_C": 0.01, "Formação_F": 0.01,
+    "Titulares_C": 0.01, "Titulares_F": 0.01
+}
@@ -0,0 +1,105 @@
+# =============================== #
+#  Presença (quem está online)
+# =============================== #
+"""
+Registo de presença em memória, partilhado pelo processo. Cada rerun só
+atualiza um timestamp (heartbeat); utilizadores sem heartbeat há mais de
+`ttl` segundos passam a offline. O ficheiro ONLINE_FILE é escrito por uma
+thread em segundo plano, de `intervalo` em `intervalo` segundos e apenas
+quando alguém entrou ou saiu — nunca a cada rerun.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from cr7bot.instrumentacao import medir
+
+
+class Presenca:
+    def __init__(self, ficheiro: str = None, escritor=None, ttl: float = 300.0,
+                 intervalo: float = 10.0):
+        self.ficheiro = ficheiro
+        self.escritor = escritor          # ex.: safe_json_write(path, data)
+        self.ttl = float(ttl)
+        self.intervalo = float(intervalo)
+        self._vistos = {}                 # user -> último heartbeat (epoch)
+        self._offline = {}                # user -> hora (HH:MM) em que saiu
+        self._lock = threading.Lock()
+        self._sujo = False
+        self._thread = None
+
+    def heartbeat(self, user: str) -> None:
+        if not user:
+            return
+        agora = time.time()
+        with self._lock:
+            if user not in self._vistos:
+                self._offline.pop(user, None)
+                self._sujo = True
+            self._vistos[user] = agora
+        self._arrancar()
+
+    def sair(self, user: str) -> None:
+        with self._lock:
+            if self._vistos.pop(user, None) is not None:
+                self._offline[user] = datetime.now().strftime('%H:%M')
+                self._sujo = True
+        self._arrancar()
+
+    def online(self) -> list:
+        """Utilizadores com heartbeat dentro do TTL (ordenados)."""
+        limite = time.time() - self.ttl
+        with self._lock:
+            return sorted(u for u, t in self._vistos.items() if t >= limite)
+
+    def _expirar(self) -> None:
+        limite = time.time() - self.ttl
+        with self._lock:
+            for u in [u for u, t in self._vistos.items() if t < limite]:
+                self._offline[u] = datetime.fromtimestamp(self._vistos.pop(u)).strftime('%H:%M')
+                self._sujo = True
+
+    def snapshot(self) -> dict:
+        """Formato do antigo online_users.json: {user: {"online": bool, "dt": "HH:MM"}}."""
+        with self._lock:
+            data = {u: {"online": False, "dt": dt} for u, dt in self._offline.items()}
+            for u, t in self._vistos.items():
+                data[u] = {"online": True, "dt": datetime.fromtimestamp(t).strftime('%H:%M')}
+            return data
+
+    @medir("presenca.flush")
+    def flush(self, forcar: bool = False) -> bool:
+        self._expirar()
+        with self._lock:
+            if not (self._sujo or forcar):
+                return False
+            self._sujo = False
+        if self.ficheiro and self.escritor:
+            self.escritor(self.ficheiro, self.snapshot())
+        return True
+
+    def _arrancar(self) -> None:
+        if self._thread is None and self.ficheiro and self.escritor:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._ciclo, name="presenca-flush", daemon=True)
+                    self._thread.start()
+
+    def _ciclo(self) -> None:
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+
+_INSTANCIAS: dict = {}
+
+
+def obter_presenca(ficheiro: str, **kw) -> Presenca:
+    """Um registo de presença por ficheiro e por processo (partilhado entre sessões)."""
+    if ficheiro not in _INSTANCIAS:
+        _INSTANCIAS[ficheiro] = Presenca(ficheiro, **kw)
+    return _INSTANCIAS[ficheiro]
@@ -0,0 +1,100 @@
+# =============================== #
+#  Tabela de regras dos eventos LIVE
+# =============================== #
+"""
+Lê `regras_eventos.yaml` e compila-o numa tabela de lookup direto
+(tipo, subtipo, equipa) -> índice, com os impactos em arrays NumPy.
+Uma lista de eventos é pontuada com um lookup por evento e uma única
+operação vetorizada (sem cadeias de if/elif). A mesma tabela serve a
+exportação detalhada (impacto direcional) e calc_xg_live (golos).
+"""
+
+import os
+import threading
+
+import numpy as np
+
+REGRAS_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regras_eventos.yaml")
+
+
+def _equipa(ev) -> str:
+    # Tal como no código original: tudo o que não é "Casa" leva o sinal de FORA.
+    return "Casa" if ev.get("equipa") == "Casa" else "Fora"
+
+
+class TabelaRegras:
+    def __init__(self, regras: dict):
+        padrao = dict(regras.get("padrao") or {})
+        self._padrao = (float(padrao.get("impacto", 0.0)), float(padrao.get("golos", 0.0)), str(padrao.get("nota", "")))
+        self.campo_subtipo = {}
+        self._idx = {}
+        impactos, golos, notas = [], [], []
+
+        def registar(chave, imp, gol, nota):
+            for equipa, sinal in (("Casa", 1.0), ("Fora", -1.0)):
+                self._idx[chave + (equipa,)] = len(impactos)
+                impactos.append(sinal * imp if imp else 0.0); golos.append(gol); notas.append(nota)
+
+        registar(("__padrao__", None), *self._padrao)  # índices 0 (Casa) e 1 (Fora)
+
+        for tipo, r in (regras.get("tipos") or {}).items():
+            r = r or {}
+            imp_t = float(r.get("impacto", self._padrao[0]))
+            gol_t = float(r.get("golos", self._padrao[1]))
+            nota_t = str(r.get("nota", self._padrao[2]))
+            if r.get("subtipo"):
+                self.campo_subtipo[tipo] = r["subtipo"]
+            registar((tipo, None), imp_t, gol_t, nota_t)
+            for sub, v in (r.get("subtipos") or {}).items():
+                v = v if isinstance(v, dict) else {"impacto": v}
+                registar((tipo, sub), float(v.get("impacto", imp_t)), float(v.get("golos", gol_t)),
+                         str(v.get("nota", nota_t)))
+
+        self.impactos = np.asarray(impactos, dtype=float)
+        self.golos = np.asarray(golos, dtype=float)
+        self.notas = notas
+
+    def indice(self, ev: dict) -> int:
+        tipo = ev.get("tipo", "Evento")
+        equipa = _equipa(ev)
+        campo = self.campo_subtipo.get(tipo)
+        if campo is not None:
+            i = self._idx.get((tipo, ev.get(campo, ""), equipa))
+            if i is not None:
+                return i
+        i = self._idx.get((tipo, None, equipa))
+        if i is not None:
+            return i
+        return 0 if equipa == "Casa" else 1
+
+    def nota(self, ev: dict, i: int) -> str:
+        campo = self.campo_subtipo.get(ev.get("tipo", "Evento"))
+        return self.notas[i].replace("{subtipo}", str(ev.get(campo, "")) if campo else "")
+
+    def pontuar(self, eventos) -> tuple:
+        """(índices, impactos, golos) de uma lista de eventos, em arrays."""
+        idx = np.fromiter((self.indice(ev) for ev in eventos), dtype=np.intp)
+        return idx, self.impactos[idx], self.golos[idx]
+
+
+def carregar_regras(path: str = None) -> TabelaRegras:
+    import yaml
+    with open(path or REGRAS_PADRAO, "r", encoding="utf-8") as f:
+        return TabelaRegras(yaml.safe_load(f) or {})
+
+
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def obter_regras(path: str = None) -> TabelaRegras:
+    """Tabela compilada, partilhada pelo processo e recompilada só quando o YAML muda."""
+    path = path or os.environ.get("CR7_REGRAS") or REGRAS_PADRAO
+    st = os.stat(path)
+    assinatura = (st.st_mtime_ns, st.st_size)
+    with _LOCK:
+        atual = _CACHE.get(path)
+        if atual is None or atual[0] != assinatura:
+            atual = (assinatura, carregar_regras(path))
+            _CACHE[path] = atual
+        return atual[1]
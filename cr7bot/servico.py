@@ -0,0 +1,273 @@
+# =============================== #
+#  Serviço HTTP/JSON de preços
+# =============================== #
+"""
+Expõe o motor de preços a outras ferramentas (scrapers de odds, bot de
+alertas) sem passar pela UI: um servidor HTTP/1.1 mínimo sobre asyncio
+(só stdlib), com ligações keep-alive, cache de respostas e um pool de
+processos para os lotes grandes.
+
+Rotas (POST com corpo JSON; cada campo aceita um número ou uma lista):
+    /v1/probs   {l_casa, l_fora}                       -> {"1", "X", "2"}
+    /v1/over    {lambda_total, linhas}                 -> {"over": {linha: [...]}}
+    /v1/btts    {l_casa, l_fora}                       -> {"btts"}
+    /v1/ev      {prob, odd}                            -> {"ev"}
+    /v1/kelly   {prob, odd, banca[, fracao, max_frac]} -> {"stake"}
+    /v1/precos  {l_casa, l_fora[, odds: {1, X, 2}, banca, fracao]}
+                -> probabilidades, odds justas e, com odds, EV e stake de Kelly por resultado
+    GET /saude, GET /metricas (texto Prometheus de cr7bot.instrumentacao)
+
+Lotes com pelo menos `limiar_pool` itens vão para o ProcessPoolExecutor; os
+pequenos são calculados no próprio event loop (a ida ao pool custaria mais
+do que o cálculo). Respostas iguais (mesma rota e mesmo corpo) saem da cache,
+limitada em itens e em bytes (`cache_bytes`); respostas com mais de
+`cache_max_resposta` bytes não são guardadas. Erros de validação dão 400;
+qualquer outro erro (p.ex. um processo do pool morto) dá 500 e o pool é recriado.
+Os processos do pool nascem de um forkserver (onde existe): um fork direto a
+partir do processo do serviço, já com threads, pode herdar locks presos.
+
+Uso:
+    python -m cr7bot.servico --porta 8787 [--processos 4]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from cr7bot.apostas import calc_ev, kelly_criterion, odds_from_prob
+from cr7bot.cache import CacheBytes
+from cr7bot.instrumentacao import METRICAS, secao
+from cr7bot.mercados import poisson_outcome_probs, prob_btts, prob_over
+
+MAX_CORPO = 8 << 20
+MAX_CABECALHOS = 100
+RESULTADOS_1X2 = ("1", "X", "2")
+ESTADOS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+# ======== cálculo (funções puras; correm no loop ou num processo do pool) ========
+def _arr(dados: dict, campo: str, default=None) -> np.ndarray:
+    if campo not in dados:
+        if default is None:
+            raise ValueError(f"campo em falta: {campo}")
+        return np.asarray(default, dtype=float)
+    return np.atleast_1d(np.asarray(dados[campo], dtype=float))
+
+
+def _lista(x) -> list:
+    return np.atleast_1d(np.asarray(x, dtype=float)).tolist()
+
+
+def _probs(d):
+    p1, px, p2 = poisson_outcome_probs(_arr(d, "l_casa"), _arr(d, "l_fora"))
+    return {"1": _lista(p1), "X": _lista(px), "2": _lista(p2)}
+
+
+def _over(d):
+    total = _arr(d, "lambda_total")
+    linhas = d.get("linhas", d.get("linha", 2.5))
+    return {"over": {str(float(l)): _lista(prob_over(total, float(l))) for l in np.atleast_1d(linhas)}}
+
+
+def _btts(d):
+    return {"btts": _lista(prob_btts(_arr(d, "l_casa"), _arr(d, "l_fora")))}
+
+
+def _ev(d):
+    return {"ev": _lista(calc_ev(_arr(d, "prob"), _arr(d, "odd")))}
+
+
+def _kelly(d):
+    stake = kelly_criterion(_arr(d, "prob"), _arr(d, "odd"), _arr(d, "banca"),
+                            float(d.get("fracao", 1)), float(d.get("max_frac", 0.25)))
+    return {"stake": _lista(stake)}
+
+
+def _precos(d):
+    probs = _probs(d)
+    out = {"probs": probs, "odds_justas": {r: _lista(odds_from_prob(probs[r])) for r in RESULTADOS_1X2}}
+    odds = d.get("odds")
+    if odds:
+        banca, fracao = _arr(d, "banca", 100.0), float(d.get("fracao", 0.5))
+        out["ev"], out["stake"] = {}, {}
+        for r in RESULTADOS_1X2:
+            if r in odds:
+                o = np.atleast_1d(np.asarray(odds[r], dtype=float))
+                out["ev"][r] = _lista(calc_ev(probs[r], o))
+                out["stake"][r] = _lista(kelly_criterion(probs[r], o, banca, fracao))
+    return out
+
+
+ROTAS = {"/v1/probs": _probs, "/v1/over": _over, "/v1/btts": _btts, "/v1/ev": _ev,
+         "/v1/kelly": _kelly, "/v1/precos": _precos}
+_CAMPO_LOTE = {"/v1/over": "lambda_total", "/v1/ev": "prob", "/v1/kelly": "prob"}
+
+
+def calcular(rota: str, dados: dict) -> dict:
+    """Resposta de uma rota para um corpo já interpretado (também usado diretamente, sem HTTP)."""
+    return ROTAS[rota](dados)
+
+
+def tamanho_lote(rota: str, dados: dict) -> int:
+    return int(np.size(dados.get(_CAMPO_LOTE.get(rota, "l_casa"), 0)))
+
+
+# ======== servidor ========
+class ServicoPrecos:
+    def __init__(self, host: str = "127.0.0.1", porta: int = 8787, processos: int = None,
+                 limiar_pool: int = 2000, cache_itens: int = 4096, timeout_inativo: float = 30.0,
+                 cache_bytes: int = 64 << 20, cache_max_resposta: int = 1 << 20):
+        self.host, self.porta = host, int(porta)
+        self.processos = (os.cpu_count() or 1) if processos is None else int(processos)
+        self.limiar_pool = int(limiar_pool)
+        self.cache = CacheBytes(max_itens=cache_itens, max_bytes=cache_bytes, max_valor=cache_max_resposta)
+        self.timeout_inativo = float(timeout_inativo)
+        self.pedidos = 0
+        self._pool = None
+        self._servidor = None
+
+    async def iniciar(self):
+        """Abre o socket (porta=0 escolhe uma porta livre, útil em testes) e o pool de processos."""
+        if self.processos > 1:
+            self._pool = self._novo_pool()
+        self._servidor = await asyncio.start_server(self._ligacao, self.host, self.porta)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        return self
+
+    def _novo_pool(self) -> ProcessPoolExecutor:
+        metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None
+        return ProcessPoolExecutor(self.processos, mp_context=multiprocessing.get_context(metodo))
+
+    async def servir(self):
+        if self._servidor is None:
+            await self.iniciar()
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    async def fechar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def _ligacao(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    linha = await asyncio.wait_for(leitor.readline(), self.timeout_inativo)
+                except asyncio.TimeoutError:
+                    break
+                if not linha:
+                    break
+                partes = linha.decode("latin-1").split()
+                if len(partes) != 3:
+                    break
+                metodo, alvo, versao = partes
+                cab = {}
+                for _ in range(MAX_CABECALHOS):
+                    l = await leitor.readline()
+                    if l in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = l.decode("latin-1").partition(":")
+                    cab[k.strip().lower()] = v.strip()
+                try:
+                    n = int(cab.get("content-length") or 0)
+                    if n < 0: raise ValueError
+                except ValueError:                # sem tamanho válido não se sabe onde acaba o corpo
+                    self._responder(escritor, 400, {"erro": "Content-Length inválido"}, False)
+                    break
+                if n > MAX_CORPO:
+                    self._responder(escritor, 413, {"erro": "corpo demasiado grande"}, False)
+                    break
+                corpo = await leitor.readexactly(n) if n else b""
+                conexao = cab.get("connection", "").lower()
+                manter = conexao != "close" and (versao != "HTTP/1.0" or conexao == "keep-alive")
+                estado, resposta, tipo = await self._tratar(metodo, alvo.split("?", 1)[0], corpo)
+                self._responder(escritor, estado, resposta, manter, tipo)
+                await escritor.drain()
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+    def _responder(self, escritor, estado: int, corpo, manter: bool, tipo: str = "application/json") -> None:
+        if not isinstance(corpo, bytes):
+            corpo = json.dumps(corpo, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        escritor.write(
+            (f"HTTP/1.1 {estado} {ESTADOS.get(estado, '')}\r\nContent-Type: {tipo}\r\n"
+             f"Content-Length: {len(corpo)}\r\nConnection: {'keep-alive' if manter else 'close'}\r\n\r\n"
+             ).encode("latin-1") + corpo)
+
+    async def _tratar(self, metodo: str, caminho: str, corpo: bytes) -> tuple:
+        self.pedidos += 1
+        if caminho == "/saude":
+            return 200, {"ok": True, "pedidos": self.pedidos, "cache": self.cache.stats(),
+                         "processos": self.processos}, "application/json"
+        if caminho == "/metricas":
+            return 200, METRICAS.para_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+        if caminho not in ROTAS:
+            return 404, {"erro": f"rota desconhecida: {caminho}"}, "application/json"
+        if metodo != "POST":
+            return 405, {"erro": "use POST com um corpo JSON"}, "application/json"
+
+        chave = (caminho, hashlib.sha1(corpo).digest())
+        pronto = self.cache.get(chave)
+        if pronto is not None:
+            return 200, pronto, "application/json"
+        try:
+            dados = json.loads(corpo or b"{}")
+            if not isinstance(dados, dict):
+                raise ValueError("o corpo tem de ser um objeto JSON")
+            with secao(f"servico{caminho}"):
+                if self._pool is not None and tamanho_lote(caminho, dados) >= self.limiar_pool:
+                    res = await asyncio.get_running_loop().run_in_executor(self._pool, calcular, caminho, dados)
+                else:
+                    res = calcular(caminho, dados)
+            pronto = json.dumps(res, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        except (ValueError, TypeError, KeyError) as e:
+            return 400, {"erro": str(e)}, "application/json"
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool) and self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._novo_pool()
+            return 500, {"erro": f"erro interno: {type(e).__name__}: {e}"}, "application/json"
+        self.cache.put(chave, pronto)
+        return 200, pronto, "application/json"
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m cr7bot.servico", description="Serviço HTTP/JSON de preços.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--porta", type=int, default=8787)
+    ap.add_argument("--processos", type=int, default=None, help="processos do pool (1 = sem pool)")
+    ap.add_argument("--limiar-pool", type=int, default=2000, help="itens a partir dos quais o lote vai para o pool")
+    args = ap.parse_args(argv)
+    servico = ServicoPrecos(args.host, args.porta, args.processos, args.limiar_pool)
+
+    async def correr():
+        await servico.iniciar()           # só depois do bind se sabe a porta (--porta 0)
+        print(f"serviço de preços em http://{args.host}:{servico.porta} ({servico.processos} processos)", flush=True)
+        await servico.servir()
+
+    try:
+        asyncio.run(correr())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# =============================== #
+#  Simulação Monte Carlo (2ª parte)
+# =============================== #
+"""
+Simula o resto do jogo a partir do minuto atual, vetorizado sobre todos os
+caminhos de uma vez: o tempo avança em blocos de `passo` minutos e, em cada
+bloco, os golos chegam como um processo de Poisson cuja taxa (por equipa)
+depende de:
+- perfil temporal (os golos são mais frequentes no fim da parte);
+- resultado no momento (quem perde arrisca mais, quem ganha recua);
+- cartões vermelhos (menos um jogador = menos ataque, mais para o adversário).
+
+Com a mesma `seed` e os mesmos parâmetros o resultado é bit a bit igual, por
+isso a seed (gerada quando não é dada) vai no resultado e na exportação.
+"""
+
+import math
+import secrets
+
+import numpy as np
+
+LINHAS_2P = (0.5, 1.5, 2.5, 3.5)
+PERFIL_TEMPO = 0.30              # taxa de ×0.85 no minuto 45 a ×1.15 no minuto 90 (média 1)
+MULT_A_PERDER = 1.15
+MULT_A_GANHAR = 0.90
+MULT_VERMELHO_PROPRIO = 0.70     # por cada vermelho da própria equipa
+MULT_VERMELHO_ADVERSARIO = 1.20  # por cada vermelho do adversário
+MAX_CANDIDATOS = 6               # golos candidatos por caminho e por bloco (P(mais) é desprezável)
+
+
+def parse_resultado(txt: str) -> tuple:
+    """"1-0" / "1:0" / "1 x 0" -> (1, 0); inválido -> (0, 0)."""
+    partes = [p for p in str(txt or "").replace(":", "-").replace("x", "-").split("-") if p.strip()]
+    try:
+        return (int(partes[0]), int(partes[1])) if len(partes) == 2 else (0, 0)
+    except ValueError:
+        return 0, 0
+
+
+def simular_2p(l_casa: float, l_fora: float, minuto: float = 45.0, fim: float = 90.0,
+               golos_casa: int = 0, golos_fora: int = 0, vermelhos_casa: int = 0, vermelhos_fora: int = 0,
+               n: int = 200_000, seed: int = None, linhas=LINHAS_2P, passo: float = 1.0,
+               intervalo_casa: int = None, intervalo_fora: int = None) -> dict:
+    """
+    Preços da 2ª parte por simulação. `l_casa`/`l_fora` são os golos esperados
+    de cada equipa numa 2ª parte completa (45') em situação neutra; só os
+    minutos de `minuto` a `fim` são simulados. Devolve probabilidades de
+    próximo golo, over/under da 2ª parte, resultado final (a partir do
+    resultado atual) e BTTS, mais a seed e os parâmetros usados.
+
+    O over/under é da 2ª parte inteira: os golos já marcados depois do
+    intervalo (resultado atual - `intervalo_*`; sem intervalo, nenhum) somam-se
+    aos simulados.
+    """
+    intervalo_casa = int(golos_casa) if intervalo_casa is None else int(intervalo_casa)
+    intervalo_fora = int(golos_fora) if intervalo_fora is None else int(intervalo_fora)
+    ja_2p = max(0, int(golos_casa) + int(golos_fora) - intervalo_casa - intervalo_fora)
+    seed = secrets.randbits(32) if seed is None else int(seed)
+    parametros = dict(l_casa=float(l_casa), l_fora=float(l_fora), minuto=float(minuto), fim=float(fim),
+                      golos_casa=int(golos_casa), golos_fora=int(golos_fora),
+                      vermelhos_casa=int(vermelhos_casa), vermelhos_fora=int(vermelhos_fora),
+                      n=int(n), seed=seed, linhas=[float(l) for l in linhas], passo=float(passo),
+                      intervalo_casa=intervalo_casa, intervalo_fora=intervalo_fora)
+    rng = np.random.default_rng(seed)
+    n = int(n)
+
+    base = np.array([
+        max(l_casa, 0.0) / 45.0 * MULT_VERMELHO_PROPRIO ** vermelhos_casa * MULT_VERMELHO_ADVERSARIO ** vermelhos_fora,
+        max(l_fora, 0.0) / 45.0 * MULT_VERMELHO_PROPRIO ** vermelhos_fora * MULT_VERMELHO_ADVERSARIO ** vermelhos_casa,
+    ])
+    # Multiplicador por estado do jogo, indexado por sign(golos_casa - golos_fora) + 1 (fora a ganhar / empate / casa a ganhar).
+    estado_casa = np.array([MULT_A_PERDER, 1.0, MULT_A_GANHAR])
+    estado_fora = estado_casa[::-1]
+
+    dif = np.full(n, int(golos_casa) - int(golos_fora), dtype=np.int16)
+    marc_casa = np.zeros(n, dtype=np.int16)
+    marc_fora = np.zeros(n, dtype=np.int16)
+    primeiro = np.zeros(n, dtype=np.int8)            # 0 = ainda ninguém, 1 = casa, 2 = fora
+
+    # Thinning: em cada bloco há K ~ Poisson(taxa máxima) golos candidatos (um só uniforme por
+    # caminho decide K); cada candidato é da casa ou de fora e é aceite com taxa real / taxa máxima,
+    # avaliada no estado do jogo desse momento. Só os poucos caminhos com candidatos fazem mais contas.
+    t = float(minuto)
+    while t < fim - 1e-9:
+        dt = min(float(passo), fim - t)
+        perfil = 1.0 + PERFIL_TEMPO * ((t + dt / 2.0 - 45.0) / 45.0 - 0.5)
+        lam_casa, lam_fora = base * perfil * dt
+        max_casa, max_fora = lam_casa * estado_casa.max(), lam_fora * estado_fora.max()
+        lam = max_casa + max_fora
+        t += dt
+        if lam <= 0:
+            continue
+        cdf = np.cumsum([math.exp(-lam) * lam ** k / math.factorial(k) for k in range(MAX_CANDIDATOS)])
+        u = rng.random(n, dtype=np.float32)
+        idx = np.flatnonzero(u >= cdf[0])
+        if not idx.size:
+            continue
+        k = 1 + np.searchsorted(cdf[1:], u[idx], side="right")
+        for j in range(int(k.max())):
+            sub = idx[k > j]
+            v = rng.random((2, sub.size))
+            e = np.sign(dif[sub]) + 1
+            casa = v[0] * lam < max_casa
+            aceite = v[1] * np.where(casa, max_casa, max_fora) < np.where(casa, lam_casa * estado_casa[e], lam_fora * estado_fora[e])
+            gc, gf = sub[casa & aceite], sub[~casa & aceite]
+            marc_casa[gc] += 1
+            marc_fora[gf] += 1
+            dif[gc] += 1
+            dif[gf] -= 1
+            primeiro[gc[primeiro[gc] == 0]] = 1
+            primeiro[gf[primeiro[gf] == 0]] = 2
+
+    resto = marc_casa + marc_fora
+    total_2p = resto + ja_2p
+    dist = np.bincount(total_2p, minlength=int(max(linhas, default=0)) + 2) / n
+    acum = np.cumsum(dist)
+    final_casa = marc_casa + int(golos_casa)
+    final_fora = marc_fora + int(golos_fora)
+    prox = np.bincount(primeiro, minlength=3) / n
+    res = np.bincount(np.sign(dif) + 1, minlength=3) / n
+    under = {float(l): float(acum[int(np.floor(l))]) for l in linhas}
+
+    return {
+        "seed": seed, "n": n, "parametros": parametros,
+        "proximo_golo": {"casa": float(prox[1]), "nenhum": float(prox[0]), "fora": float(prox[2])},
+        "over": {l: 1.0 - p for l, p in under.items()}, "under": under,
+        "resultado": {"1": float(res[2]), "X": float(res[1]), "2": float(res[0])},
+        "btts": float(np.mean((final_casa > 0) & (final_fora > 0))),
+        "golos_2p": float(total_2p.mean()), "golos_resto": float(resto.mean()), "dist_golos_2p": dist.tolist(),
+    }
+
+
+def repetir(simulacao: dict) -> dict:
+    """Volta a correr uma simulação a partir do que ela própria guardou (mesmo resultado)."""
+    return simular_2p(**simulacao["parametros"])
@@ -0,0 +1,217 @@
+# =============================== #
+#  Sonda de saúde dos streams (HLS)
+# =============================== #
+"""
+Verifica em paralelo se os canais de uma playlist estão vivos, sem depender
+de bibliotecas HTTP externas: um cliente HTTP/1.1 mínimo sobre asyncio, com
+um pool de ligações keep-alive por host (canais do mesmo servidor reutilizam
+a ligação), paralelismo limitado por semáforo e timeout por pedido.
+
+Para cada URL: latência até à resposta, escada de qualidades do master
+playlist (BANDWIDTH / RESOLUTION de cada variante) e se há segmentos (a
+primeira variante é também pedida). Os resultados ficam em cache com TTL.
+"""
+
+import asyncio
+import ssl
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urljoin, urlsplit
+
+Saude = namedtuple("Saude", "url vivo estado latencia_ms variantes erro verificado")
+Variante = namedtuple("Variante", "largura_banda resolucao url")
+
+MAX_REDIRECIONAMENTOS = 3
+MAX_CORPO = 1 << 20  # playlists maiores do que 1 MB não são HLS razoável
+
+
+class _Pool:
+    """Ligações livres por (esquema, host, porta); uma ligação só é devolvida se a resposta permitir keep-alive."""
+
+    def __init__(self, por_host: int = 8):
+        self.por_host = por_host
+        self._livres = {}
+        self._ssl = None
+        self.abertas = 0
+
+    async def obter(self, esquema: str, host: str, porta: int):
+        livres = self._livres.get((esquema, host, porta))
+        while livres:
+            leitor, escritor = livres.pop()
+            if not escritor.is_closing() and not leitor.at_eof():
+                return leitor, escritor, True
+        if esquema == "https" and self._ssl is None:
+            self._ssl = ssl.create_default_context()
+        self.abertas += 1
+        leitor, escritor = await asyncio.open_connection(host, porta, ssl=self._ssl if esquema == "https" else None)
+        return leitor, escritor, False
+
+    def devolver(self, chave, leitor, escritor) -> None:
+        livres = self._livres.setdefault(chave, [])
+        if len(livres) < self.por_host:
+            livres.append((leitor, escritor))
+        else:
+            escritor.close()
+
+    def fechar(self) -> None:
+        for livres in self._livres.values():
+            for _, escritor in livres:
+                escritor.close()
+        self._livres.clear()
+
+
+async def _ler_corpo(leitor, cab: dict) -> tuple:
+    """(corpo, ligação reutilizável) conforme Content-Length / chunked / até fechar."""
+    if cab.get("transfer-encoding", "").lower() == "chunked":
+        partes = []
+        while True:
+            tam = int((await leitor.readline()).split(b";")[0].strip() or b"0", 16)
+            if tam == 0:
+                while (await leitor.readline()) not in (b"\r\n", b"\n", b""): pass
+                break
+            partes.append(await leitor.readexactly(tam))
+            await leitor.readline()
+            if sum(map(len, partes)) > MAX_CORPO: raise ValueError("resposta demasiado grande")
+        return b"".join(partes), True
+    if "content-length" in cab:
+        n = int(cab["content-length"])
+        if n > MAX_CORPO: raise ValueError("resposta demasiado grande")
+        return await leitor.readexactly(n), True
+    return await leitor.read(MAX_CORPO), False
+
+
+async def _get(pool: _Pool, url: str) -> tuple:
+    """GET com keep-alive. Devolve (estado, corpo, url final), seguindo redirecionamentos."""
+    for _ in range(MAX_REDIRECIONAMENTOS + 1):
+        u = urlsplit(url)
+        esquema = u.scheme.lower()
+        porta = u.port or (443 if esquema == "https" else 80)
+        chave = (esquema, u.hostname, porta)
+        caminho = (u.path or "/") + (f"?{u.query}" if u.query else "")
+        pedido = (f"GET {caminho} HTTP/1.1\r\nHost: {u.netloc}\r\nUser-Agent: cr7bot-sonda\r\n"
+                  f"Accept: */*\r\nConnection: keep-alive\r\n\r\n").encode("latin-1")
+        for tentativa in (0, 1):
+            leitor, escritor, reutilizada = await pool.obter(*chave)
+            try:
+                escritor.write(pedido)
+                await escritor.drain()
+                linha = await leitor.readline()
+                if not linha and reutilizada and tentativa == 0:
+                    escritor.close()   # o servidor fechou a ligação livre entretanto
+                    continue
+                estado = int(linha.split()[1])
+                cab = {}
+                while (l := await leitor.readline()) not in (b"\r\n", b"\n", b""):
+                    k, _, v = l.decode("latin-1").partition(":")
+                    cab[k.strip().lower()] = v.strip()
+                corpo, reutilizavel = await _ler_corpo(leitor, cab)
+            except BaseException:
+                escritor.close()
+                raise
+            if reutilizavel and cab.get("connection", "").lower() != "close":
+                pool.devolver(chave, leitor, escritor)
+            else:
+                escritor.close()
+            break
+        if estado in (301, 302, 303, 307, 308) and "location" in cab:
+            url = urljoin(url, cab["location"])
+            continue
+        return estado, corpo, url
+    raise ValueError("demasiados redirecionamentos")
+
+
+def analisar_master(texto: str, base: str) -> tuple:
+    """Variantes (#EXT-X-STREAM-INF) de um master playlist, da maior para a menor largura de banda."""
+    variantes, attrs = [], None
+    for linha in texto.splitlines():
+        linha = linha.strip()
+        if linha.startswith("#EXT-X-STREAM-INF:"):
+            attrs = {}
+            for par in linha.split(":", 1)[1].split(","):
+                k, _, v = par.partition("=")
+                attrs[k.strip().upper()] = v.strip().strip('"')
+        elif attrs is not None and linha and not linha.startswith("#"):
+            bw = attrs.get("BANDWIDTH", "")
+            variantes.append(Variante(int(bw) if bw.isdigit() else 0, attrs.get("RESOLUTION", ""), urljoin(base, linha)))
+            attrs = None
+    return tuple(sorted(variantes, key=lambda v: -v.largura_banda))
+
+
+class Sonda:
+    def __init__(self, concorrencia: int = 16, timeout: float = 5.0, ttl: float = 120.0,
+                 verificar_variante: bool = True):
+        self.concorrencia = max(1, int(concorrencia))
+        self.timeout = float(timeout)
+        self.ttl = float(ttl)
+        self.verificar_variante = verificar_variante
+        self._cache = {}                  # url -> Saude
+        self._lock = threading.Lock()
+        self.ligacoes_abertas = 0
+
+    def _em_cache(self, url: str):
+        with self._lock:
+            r = self._cache.get(url)
+        return r if r is not None and time.time() - r.verificado < self.ttl else None
+
+    async def _verificar(self, pool: _Pool, sem: asyncio.Semaphore, url: str) -> Saude:
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                estado, corpo, final = await asyncio.wait_for(_get(pool, url), self.timeout)
+                latencia = (time.perf_counter() - t0) * 1000.0
+                texto = corpo.decode("utf-8", "replace")
+                if estado != 200:
+                    return Saude(url, False, estado, latencia, (), f"HTTP {estado}", time.time())
+                if "#EXTM3U" not in texto[:1024]:
+                    return Saude(url, False, estado, latencia, (), "resposta não é uma playlist HLS", time.time())
+                variantes = analisar_master(texto, final)
+                vivo, erro = "#EXTINF" in texto, ""
+                if variantes:
+                    vivo = True
+                    if self.verificar_variante:
+                        ev, cv, _ = await asyncio.wait_for(_get(pool, variantes[0].url), self.timeout)
+                        vivo = ev == 200 and b"#EXTINF" in cv
+                        erro = "" if vivo else f"variante sem segmentos (HTTP {ev})"
+                elif not vivo:
+                    erro = "playlist sem segmentos"
+                return Saude(url, vivo, estado, latencia, variantes, erro, time.time())
+            except asyncio.TimeoutError:
+                return Saude(url, False, 0, None, (), f"timeout ({self.timeout:g}s)", time.time())
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as e:
+                return Saude(url, False, 0, None, (), f"{type(e).__name__}: {e}", time.time())
+
+    async def sondar_async(self, urls) -> dict:
+        """{url: Saude} para todas as URLs (as que estão em cache válida não são pedidas)."""
+        urls = list(dict.fromkeys(urls))
+        out = {u: r for u in urls if (r := self._em_cache(u)) is not None}
+        falta = [u for u in urls if u not in out]
+        if falta:
+            pool, sem = _Pool(por_host=self.concorrencia), asyncio.Semaphore(self.concorrencia)
+            try:
+                res = await asyncio.gather(*(self._verificar(pool, sem, u) for u in falta))
+            finally:
+                pool.fechar()
+                self.ligacoes_abertas += pool.abertas
+            with self._lock:
+                for r in res:
+                    self._cache[r.url] = out[r.url] = r
+        return out
+
+    def sondar(self, urls) -> dict:
+        """Versão síncrona (script Streamlit / CLI): corre um event loop próprio."""
+        return asyncio.run(self.sondar_async(urls))
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+_INSTANCIAS: dict = {}
+
+
+def obter_sonda(**kw) -> Sonda:
+    """Uma sonda (e a sua cache TTL) por processo, partilhada entre sessões."""
+    if "sonda" not in _INSTANCIAS:
+        _INSTANCIAS["sonda"] = Sonda(**kw)
+    return _INSTANCIAS["sonda"]
@@ -0,0 +1,35 @@
+# --------- HELPERS NUMÉRICOS / SANEAMENTO ---------
+import math
+from typing import Optional
+
+
+def fmt_num(v, nd: int = 2, dash: str = "—"):
+    if v is None: return dash
+    try:
+        x = float(str(v).replace(",", "."))
+        if math.isnan(x) or math.isinf(x): return dash
+        return f"{x:.{nd}f}"
+    except Exception:
+        return dash
+
+def to_float_or_none(v) -> Optional[float]:
+    if v is None: return None
+    try: return float(str(v).replace(",", ".").strip())
+    except Exception: return None
+
+def sanitize_analysis(d: dict, keys=("xg_1p","xg_2p","xg_total")) -> dict:
+    if not isinstance(d, dict): return {}
+    dd = dict(d)
+    for k in keys: dd[k] = to_float_or_none(dd.get(k))
+    return dd
+
+def fmt_any(v, nd: int = 2, dash: str = "—"):
+    if isinstance(v, (list, tuple)):
+        if not v: return dash
+        return ", ".join(fmt_num(x, nd=nd, dash=dash) for x in v)
+    return fmt_num(v, nd=nd, dash=dash)
+
+def first_float(v) -> float:
+    if isinstance(v, (list, tuple)):
+        return (to_float_or_none(v[0]) or 0.0) if v else 0.0
+    return to_float_or_none(v) or 0.0
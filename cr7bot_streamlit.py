@@ -3,159 +3,47 @@
 #  Com leitor HLS/M3U8 integrado
 # =============================== #
 
+# A lógica (preços, parsing, persistência, exportação) vive no pacote cr7bot;
+# este ficheiro só tem UI. pandas/XlsxWriter/bcrypt são importados a pedido.
+import os
+import time
+import uuid
 import streamlit as st
-import hashlib, json, os, math, re, time
-import pandas as pd
-import bcrypt
-import fcntl   # para lock em ficheiros
-from io import BytesIO
 from datetime import datetime
-from urllib.parse import urlparse
-import streamlit.components.v1 as components
 from html import escape
-from typing import Optional
+from cr7bot.util import fmt_num, sanitize_analysis, fmt_any, first_float
+from cr7bot.forma import forma_atual, forma_liga
+from cr7bot.mercados import CACHE_PROBS, precos_matriz, escada_asiatica, matriz_jogo
+from cr7bot.apostas import calc_ev, kelly_criterion, odds_from_prob
+from cr7bot.m3u import parse_m3u_or_url, pagina_m3u
+from cr7bot.armazenamento import CACHE_JSON, obter_armazem
+from cr7bot.presenca import obter_presenca
+from cr7bot.auth import hash_pwd, verify_pwd
+from cr7bot.pesos import FATORES, PESOS_PADRAO
+from cr7bot.exportar import MIME, hash_conteudo, export_detalhado as _export_detalhado
+from cr7bot.live import dividir_xg, obter_estado
+from cr7bot.simulacao import parse_resultado, simular_2p
+from cr7bot.painel import jogos_disponiveis, obter_painel
+from cr7bot.canais import chave_canal, obter_indice
+from cr7bot.sonda import obter_sonda
+from cr7bot.forca import ajustar_liga, modelo_liga, resultados_de_bytes
+from cr7bot.ingestao import obter_ingestor, probs_de_precos
+from cr7bot.margem import METODOS, margem, remover_margem
+from cr7bot.instrumentacao import METRICAS, ativa, ativar, medir, registar, secao
 
 # --------- CONFIG DA PÁGINA ---------
 st.set_page_config(page_title="PauloDamas-GPT", layout="wide")
+t_rerun = time.perf_counter()
+# identifica esta sessão do browser nos objetos partilhados pelo processo (painel, ...)
+SESSAO_ID = st.session_state.setdefault("sessao_id", uuid.uuid4().hex)
 
-# --------- HELPERS NUMÉRICOS / SANEAMENTO ---------
-def fmt_num(v, nd: int = 2, dash: str = "—"):
-    if v is None: return dash
-    try:
-        x = float(str(v).replace(",", "."))
-        if math.isnan(x) or math.isinf(x): return dash
-        return f"{x:.{nd}f}"
-    except Exception:
-        return dash
-
-def to_float_or_none(v) -> Optional[float]:
-    if v is None: return None
-    try: return float(str(v).replace(",", ".").strip())
-    except Exception: return None
-
-def sanitize_analysis(d: dict, keys=("xg_1p","xg_2p","xg_total")) -> dict:
-    if not isinstance(d, dict): return {}
-    dd = dict(d)
-    for k in keys: dd[k] = to_float_or_none(dd.get(k))
-    return dd
-
-def fmt_any(v, nd: int = 2, dash: str = "—"):
-    if isinstance(v, (list, tuple)):
-        if not v: return dash
-        return ", ".join(fmt_num(x, nd=nd, dash=dash) for x in v)
-    return fmt_num(v, nd=nd, dash=dash)
-
-def first_float(v) -> float:
-    if isinstance(v, (list, tuple)):
-        return (to_float_or_none(v[0]) or 0.0) if v else 0.0
-    return to_float_or_none(v) or 0.0
-
-def odds_from_prob(p: float, eps: float = 1e-9) -> float:
-    p = max(float(p), eps)
-    return 1.0 / p
-
-# ========= FORMA / RESULTADOS =========
-def _norm_result_token(t: str) -> str:
-    t = t.strip().upper()
-    return {"V":"V","W":"V","E":"E","D":"D","L":"D"}.get(t, "")
-
-def parse_results_string(s: str, max_n: int = 10) -> list[str]:
-    """
-    Aceita formatos: 'V V E D V', 'V,E,D,V', 'vveDV'…
-    Devolve lista (mais recente primeiro). Limita a max_n.
-    """
-    if not s:
-        return []
-    s = s.replace(",", " ").replace(";", " ").replace("-", " ")
-    toks = [_norm_result_token(t) for t in s.split() if _norm_result_token(t)]
-    if not toks:  # tentar string corrida tipo "VVEDV"
-        toks = [_norm_result_token(ch) for ch in s if _norm_result_token(ch)]
-    return toks[:max_n]
-
-def analisar_forma(seq: list[str], n: int = 5) -> dict:
-    """Conta V/E/D e sequência (mais recente primeiro)."""
-    use = seq[:n]
-    return {
-        "V": use.count("V"),
-        "E": use.count("E"),
-        "D": use.count("D"),
-        "sequencia": "".join(use) if use else "—"
-    }
-
-# ===== Mercados de golos (Poisson total) =====
-def prob_over(total_lambda: float, line: float) -> float:
-    """P(total > line). Ex.: 1.5 => 1 - P(0)-P(1)."""
-    lam = max(float(total_lambda), 1e-9)
-    kmax = int(math.floor(line))
-    s = 0.0
-    for k in range(kmax + 1):
-        s += math.exp(-lam) * (lam**k) / math.factorial(k)
-    return max(0.0, min(1.0, 1.0 - s))
-
-def prob_btts(l_home: float, l_away: float) -> float:
-    """1 - P(casa=0) - P(fora=0) + P(0-0)."""
-    lh = max(float(l_home), 1e-9)
-    la = max(float(l_away), 1e-9)
-    p_home_0 = math.exp(-lh)
-    p_away_0 = math.exp(-la)
-    p_00 = math.exp(-(lh + la))
-    return max(0.0, min(1.0, 1.0 - p_home_0 - p_away_0 + p_00))
-
-# --------- AJUSTE METEO + POISSON ---------
+# --------- AJUSTE METEO ---------
 METEO_MULT = {
     "Sol": 1.00, "Nublado": 0.98, "Chuva": 0.88, "Vento": 0.90,
     "Frio": 0.92, "Calor": 0.90, "Calor extremo": 0.85, "Outro": 1.00,
 }
 
-def pois_pmf(k: int, lam: float) -> float:
-    if k < 0: return 0.0
-    lam = max(float(lam), 1e-9)
-    return math.exp(-lam) * (lam**k) / math.factorial(k)
-
-def poisson_outcome_probs(l_home: float, l_away: float, max_goals: int = 15):
-    l_home = max(float(l_home), 1e-9)
-    l_away = max(float(l_away), 1e-9)
-    pmf_home = [pois_pmf(k, l_home) for k in range(max_goals + 1)]
-    pmf_away = [pois_pmf(k, l_away) for k in range(max_goals + 1)]
-    p_home = p_draw = p_away = 0.0
-    for gh in range(max_goals + 1):
-        ph = pmf_home[gh]
-        for ga in range(max_goals + 1):
-            pa = pmf_away[ga]
-            p = ph * pa
-            if gh > ga: p_home += p
-            elif gh == ga: p_draw += p
-            else: p_away += p
-    s = p_home + p_draw + p_away
-    if s <= 0: return 1/3, 1/3, 1/3
-    return p_home/s, p_draw/s, p_away/s
-
-# --------- PARSER DE STREAMS / LEITOR HLS ---------
-M3U_ENTRY_RE = re.compile(r'#EXTINF:-?\d+.*?,(?P<name>.+)\n(?P<url>https?://[^\s]+)', re.IGNORECASE)
-
-def parse_m3u_or_url(raw: str) -> Optional[str]:
-    if not raw: return None
-    s = raw.strip()
-    if s.lower().startswith(("http://","https://")) and (".m3u8" in s.lower() or ".mpd" in s.lower()):
-        return s
-    if "#EXTM3U" in s:
-        for line in s.splitlines():
-            line = line.strip()
-            if line.lower().startswith(("http://","https://")) and ".m3u8" in line.lower():
-                return line
-    return None
-
-def parse_m3u(text: str):
-    chans, payload = [], text.replace('\r','').strip()
-    for m in M3U_ENTRY_RE.finditer(payload):
-        chans.append({"name": m.group('name').strip(), "url": m.group('url').strip()})
-    if not chans:
-        for line in payload.splitlines():
-            line = line.strip()
-            if line.lower().startswith(("http://","https://")) and ".m3u8" in line.lower():
-                chans.append({"name": line.rsplit("/",1)[-1], "url": line})
-    return chans
-
+# --------- LEITOR HLS ---------
 def hls_player(url: str, height: int = 420):
     if not url:
         st.info("Cole uma URL HLS (.m3u8) válida ou carregue um ficheiro M3U/M3U8.")
@@ -188,76 +76,54 @@ def hls_player(url: str, height: int = 420):
       start();
     </script>
     """
+    import streamlit.components.v1 as components
     components.html(html, height=height, scrolling=False)
 # ---- Favoritos (persistentes) ----
 FAVORITES_FILE = "favoritos_m3u.json"
 
 def load_favs() -> dict:
-    if os.path.exists(FAVORITES_FILE):
-        try:
-            with open(FAVORITES_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+    return ARMAZEM.carregar_favs()
 
 def save_favs(data: dict) -> None:
-    tmp = FAVORITES_FILE + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, FAVORITES_FILE)
+    ARMAZEM.guardar_favs(data)
 
 # ======== FICHEIROS ========
 USERS_FILE = "users.json"
 CUSTOM_FILE = "ligas_e_equipas_custom.json"
 PESOS_FILE = "pesos_personalizados.json"
-CHAT_FILE = "chat.json"
+CHAT_FILE = "chat.json"   # legado: migrado uma vez para CHAT_DIR
+CHAT_DIR = "chat_log"
 ONLINE_FILE = "online_users.json"
+LIVE_DIR = "live_jogos"   # log de eventos + snapshot por jogo (retoma após reinício)
 
-def safe_json_write(filepath, data, retries=5):
-    """Escreve JSON com lock de ficheiro para evitar corrupção."""
-    for _ in range(retries):
-        try:
-            tmp = filepath + ".tmp"
-            with open(tmp, "w", encoding="utf-8") as f:
-                fcntl.flock(f, fcntl.LOCK_EX)
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                fcntl.flock(f, fcntl.LOCK_UN)
-            os.replace(tmp, filepath)
-            return True
-        except Exception:
-            time.sleep(0.1)
-    return False
-
-# ======== LOGIN =========
-def hash_pwd(pwd: str) -> str:
-    return bcrypt.hashpw(pwd.encode(), bcrypt.gensalt()).decode()
+# Utilizadores com acesso ao painel de desempenho (CR7_ADMINS=a,b).
+ADMINS = {u.strip() for u in os.environ.get("CR7_ADMINS", "admin").split(",") if u.strip()}
 
-def verify_pwd(pwd: str, hashed: str) -> bool:
-    try:
-        return bcrypt.checkpw(pwd.encode(), hashed.encode())
-    except Exception:
-        return False
+# Backend de persistência: JSON (por omissão) ou SQLite/WAL com CR7_ARMAZEM=sqlite.
+# Com SQLite, os ficheiros JSON existentes são importados uma única vez.
+ARMAZEM = obter_armazem(
+    users_file=USERS_FILE, custom_file=CUSTOM_FILE, pesos_file=PESOS_FILE,
+    chat_dir=CHAT_DIR, chat_legado=CHAT_FILE, online_file=ONLINE_FILE, favs_file=FAVORITES_FILE,
+)
 
+# ======== LOGIN =========
 def load_users():
-    if not os.path.exists(USERS_FILE):
-        base_users = {
-            "paulo": hash_pwd("damas2024"),
-            "admin": hash_pwd("admin123")
-        }
-        safe_json_write(USERS_FILE, base_users)
-    with open(USERS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    users = ARMAZEM.utilizadores()
+    if not users:
+        for user, pwd in (("paulo", "damas2024"), ("admin", "admin123")):
+            ARMAZEM.definir_utilizador(user, hash_pwd(pwd))
+        users = ARMAZEM.utilizadores()
+    return users
 
 USERS = load_users()
 
+# Presença em memória; o ficheiro ONLINE_FILE só é escrito em segundo plano quando muda.
+PRESENCA = obter_presenca(ONLINE_FILE, escritor=lambda _f, data: ARMAZEM.gravar_presenca(data))
+
+@medir("ui.set_online")
 def set_online(username, online=True):
-    data = {}
-    if os.path.exists(ONLINE_FILE):
-        with open(ONLINE_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    data[username] = {"online": online, "dt": datetime.now().strftime('%H:%M')}
-    safe_json_write(ONLINE_FILE, data)
+    if online: PRESENCA.heartbeat(username)
+    else:      PRESENCA.sair(username)
 
 def login_screen():
     st.title("🔒 Login - PauloDamas-GPT")
@@ -278,118 +144,37 @@ if "login_success" not in st.session_state or not st.session_state["login_succes
 else:
     set_online(st.session_state['logged_user'], True)
 
+st.sidebar.caption("🟢 Online: " + (", ".join(PRESENCA.online()) or "—"))
+if st.sidebar.button("🚪 Terminar sessão"):
+    set_online(st.session_state.get('logged_user'), False)
+    st.session_state.login_success = False
+    st.session_state.pop("logged_user", None)
+    st.rerun()
+
 # ======== TÍTULO ========
 st.title("⚽️ PauloDamas-GPT — Análise Pré-Jogo + Live + IA + Chat")
 # ======== FUNÇÕES UTILITÁRIAS ========
-def kelly_criterion(prob, odd, banca, fracao=1, max_frac=0.25):
-    """Critério de Kelly limitado a 25% da banca por segurança."""
-    b = odd - 1
-    q = 1 - prob
-    f = ((b * prob - q) / b) * fracao
-    f = max(0, f)
-    return banca * min(f, max_frac)
-
-def calc_ev(p, o): return round(o * p - 1, 2)
-
-def to_excel(df, distrib, resumo, pesos_df):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Análise Principal')
-        distrib.to_excel(writer, index=False, sheet_name='Distribuição Ajustes')
-        resumo.to_excel(writer, index=False, sheet_name='Resumo Inputs')
-        pesos_df.to_excel(writer, index=False, sheet_name='Pesos em Uso')
-    return output.getvalue()
-
-def save_custom(data): safe_json_write(CUSTOM_FILE, data)
-def load_custom():
-    if os.path.exists(CUSTOM_FILE):
-        with open(CUSTOM_FILE, "r", encoding="utf-8") as f: return json.load(f)
-    return {}
-
-def save_pesos(pesos): safe_json_write(PESOS_FILE, pesos)
+def save_custom(data): ARMAZEM.guardar_custom(data)
+def load_custom(): return ARMAZEM.carregar_custom()
+
+def save_pesos(pesos): ARMAZEM.guardar_pesos(pesos)
 def load_pesos():
-    if os.path.exists(PESOS_FILE):
-        with open(PESOS_FILE, "r", encoding="utf-8") as f: return json.load(f)
-    return {
-        "Motivação_C": 0.01, "Motivação_F": 0.01,
-        "Árbitro_C": 0.00, "Árbitro_F": 0.00,
-        "Pressão_C": 0.02, "Pressão_F": 0.02,
-        "Importância_C": 0.01, "Importância_F": 0.01,
-        "Desgaste_C": 0.01, "Desgaste_F": 0.01,
-        "Viagem_C": 0.01, "Viagem_F": 0.01,
-        "Formação_C": 0.01, "Formação_F": 0.01,
-        "Titulares_C": 0.01, "Titulares_F": 0.01
-    }
+    pesos = ARMAZEM.carregar_pesos()
+    if pesos: return pesos
+    return dict(PESOS_PADRAO)
 
 def load_chat():
-    if os.path.exists(CHAT_FILE):
-        with open(CHAT_FILE, "r", encoding="utf-8") as f: return json.load(f)
-    return []
+    return ARMAZEM.mensagens_desde()[0]
 
 def save_message(user, msg, dt=None):
-    chat = load_chat()
     if dt is None: dt = datetime.now().strftime('%H:%M')
-    chat.append({"user": user, "msg": msg, "dt": dt})
-    safe_json_write(CHAT_FILE, chat)
-
-def export_detalhado(base_inputs, eventos, xg_2p=None, ajuste=None, xg_ponderado=None):
-    pesos = load_pesos()
-    linhas, acumulado, ordem = [], (xg_ponderado if xg_ponderado is not None else 1.0), 1
-    linhas.append({
-        "Ordem": ordem, "Etapa": "xG ponderado inicial",
-        "Input": f"{xg_ponderado:.2f}" if xg_ponderado is not None else "-",
-        "Peso aplicado": "-", "Ajuste parcial": "-", "Resultado acumulado": acumulado,
-        "Nota": "Base inicial do cálculo"
-    }); ordem += 1
-
-    for key, val in base_inputs.items():
-        peso = pesos.get(key, 0)
-        ajuste_parcial = peso * (val if isinstance(val, (int, float)) else 1)
-        acumulado += ajuste_parcial
-        linhas.append({
-            "Ordem": ordem, "Etapa": key, "Input": val, "Peso aplicado": peso,
-            "Ajuste parcial": ajuste_parcial, "Resultado acumulado": acumulado, "Nota": "Input pré-jogo"
-        }); ordem += 1
-
-    for ev in eventos:
-        tipo = ev.get("tipo", "Evento"); equipa = ev.get("equipa", "-")
-        ajuste_parcial, nota = 0.0, ""
-        if tipo == "Golo": ajuste_parcial = 0.20 if equipa == "Casa" else -0.20; nota = "Impacto de golo"
-        elif tipo == "Expulsão": ajuste_parcial = -0.15 if equipa == "Casa" else 0.15; nota = "Impacto de expulsão"
-        elif tipo == "Penalty": ajuste_parcial = 0.25 if equipa == "Casa" else -0.25; nota = "Impacto de penalty"
-        elif tipo == "Substituição":
-            troca = ev.get("tipo_troca", "")
-            if   troca == "Avançado por Médio":   ajuste_parcial = -0.08 if equipa == "Casa" else 0.08
-            elif troca == "Avançado por Defesa":  ajuste_parcial = -0.12 if equipa == "Casa" else 0.12
-            elif troca == "Médio por Avançado":   ajuste_parcial =  0.07 if equipa == "Casa" else -0.07
-            elif troca == "Defesa por Avançado":  ajuste_parcial =  0.10 if equipa == "Casa" else -0.10
-            nota = f"Substituição ({troca})"
-        elif tipo == "Mudança de formação":
-            form = ev.get("tipo_formacao", "")
-            if   form == "Atacante":  ajuste_parcial =  0.08 if equipa == "Casa" else -0.08
-            elif form == "Defensivo": ajuste_parcial = -0.08 if equipa == "Casa" else  0.08
-            nota = f"Mudança de formação ({form})"
-        elif tipo == "Amarelo":
-            pos = ev.get("posicao", "")
-            if   pos == "Defesa":  ajuste_parcial = -0.05 if equipa == "Casa" else 0.05
-            elif pos == "Médio":   ajuste_parcial = -0.03 if equipa == "Casa" else 0.03
-            elif pos == "Avançado":ajuste_parcial = -0.01 if equipa == "Casa" else 0.01
-            nota = f"Amarelo ({pos})"
-        acumulado += ajuste_parcial
-        linhas.append({
-            "Ordem": ordem, "Etapa": tipo, "Input": equipa, "Peso aplicado": "-",
-            "Ajuste parcial": ajuste_parcial, "Resultado acumulado": acumulado, "Nota": nota
-        }); ordem += 1
-
-    linhas.append({
-        "Ordem": ordem, "Etapa": "Resultado Final", "Input": "-", "Peso aplicado": "-",
-        "Ajuste parcial": "-", "Resultado acumulado": acumulado, "Nota": "xG/odds finais"
-    })
-    df = pd.DataFrame(linhas)
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, sheet_name="Detalhe_Analise", index=False)
-    return output.getvalue()
+    ARMAZEM.acrescentar_mensagem({"user": user, "msg": msg, "dt": dt})
+
+def export_detalhado(base_inputs, eventos, xg_2p=None, ajuste=None, xg_ponderado=None, formato="xlsx",
+                     simulacao=None):
+    return _export_detalhado(base_inputs, eventos, xg_2p, ajuste, xg_ponderado,
+                             pesos=load_pesos(), formato=formato, simulacao=simulacao)
+
 # ======== LISTAS / PESOS / LIGAS ========
 formacoes_lista = [
     "4-4-2","4-3-3","4-2-3-1","3-5-2","3-4-3","5-3-2","4-1-4-1","4-5-1",
@@ -412,7 +197,7 @@ if "pesos" not in st.session_state:
 pesos = st.session_state["pesos"]
 
 st.sidebar.title("📊 Painel de Pesos (ajustável)")
-for i, fator in enumerate(["Motivação","Árbitro","Pressão","Importância","Desgaste","Viagem","Formação","Titulares"]):
+for i, fator in enumerate(FATORES):
     key_c = f"peso_{fator.lower()}_c_{i}"
     key_f = f"peso_{fator.lower()}_f_{i}"
     pesos[f"{fator}_C"] = st.sidebar.number_input(
@@ -424,6 +209,60 @@ for i, fator in enumerate(["Motivação","Árbitro","Pressão","Importância","D
         value=pesos.get(f"{fator}_F", 0.01), step=0.001, key=key_f
     )
 
+MAX_GRELHA_UI = 729   # 3 valores x 6 fatores; grelhas maiores bloqueiam o rerun: usar a CLI
+with st.sidebar.expander("🧪 Calibrar pesos (backtest)"):
+    st.caption("Histórico CSV: golos_casa, golos_fora, odd_casa, odd_empate, odd_fora, "
+               "lambda_casa/lambda_fora (ou casa/fora/data) e colunas <Fator>_C / <Fator>_F. "
+               "Os λ dados têm de ser anteriores a cada jogo; sem eles, o modelo é ajustado só "
+               "com os jogos de datas anteriores (walk-forward) e os primeiros jogos não contam.")
+    hist_bt = st.file_uploader("Histórico", type=["csv"], key="bt_hist")
+    valores_bt = st.text_input("Valores a testar por fator", "0,0.01,0.02", key="bt_valores")
+    fatores_bt = st.multiselect("Fatores a calibrar (os outros ficam com os pesos atuais)", FATORES,
+                                default=FATORES[:4], key="bt_fatores")
+    objetivo_bt = st.selectbox("Objetivo", ["logloss", "roi", "banca"], key="bt_objetivo")
+    try:
+        valores = tuple(float(v) for v in valores_bt.split(",") if v.strip())
+    except ValueError:
+        valores = ()
+    n_bt = len(valores) ** len(fatores_bt) if valores and fatores_bt else 0
+    if n_bt > MAX_GRELHA_UI:
+        st.warning(f"{n_bt} conjuntos de pesos é demais para correr aqui (máx. {MAX_GRELHA_UI}): "
+                   "escolha menos fatores/valores ou use `python -m cr7bot.backtest historico.csv`.")
+    elif st.button("▶️ Correr calibração", key="bt_correr") and hist_bt is not None and n_bt:
+        import pandas as pd
+        from cr7bot.backtest import avaliar, calibrar, grelha_pesos, preparar
+        try:
+            dados_bt = preparar(pd.read_csv(hist_bt))
+            with st.spinner(f"A avaliar {n_bt} conjuntos de pesos..."):
+                st.session_state["bt_top"] = calibrar(
+                    dados_bt, grelha_pesos(valores, fatores_bt, base=pesos), objetivo_bt, top=5)
+                st.session_state["bt_atual"] = avaliar(dados_bt, pesos)
+        except (ValueError, KeyError) as e:
+            st.error(f"Histórico inválido: {e}")
+    if st.session_state.get("bt_top"):
+        atual = st.session_state["bt_atual"]
+        st.caption(f"Pesos atuais: log-loss {atual['logloss']:.4f} · ROI {atual['roi']:.2%} · "
+                   f"drawdown {atual['drawdown_max']:.1%}")
+        st.table([{"#": i, "Log-loss": round(m["logloss"], 4), "ROI": f"{m['roi']:.2%}",
+                   "Drawdown": f"{m['drawdown_max']:.1%}", "Apostas": m["apostas"],
+                   "CLV": "-" if m["clv"] is None else f"{m['clv']:.2%}"}
+                  for i, (_, m) in enumerate(st.session_state["bt_top"], 1)])
+        if st.button("💾 Guardar pesos vencedores", key="bt_guardar"):
+            save_pesos(st.session_state["bt_top"][0][0])
+            st.session_state["pesos"] = load_pesos()
+            for i, fator in enumerate(FATORES):   # os number_input voltam a ler o valor de "pesos"
+                st.session_state.pop(f"peso_{fator.lower()}_c_{i}", None)
+                st.session_state.pop(f"peso_{fator.lower()}_f_{i}", None)
+            st.rerun()
+
+_cp = CACHE_PROBS.stats()
+st.sidebar.caption(
+    f"🧮 Cache de probabilidades: {_cp['hits']} hits / {_cp['misses']} misses "
+    f"({_cp['tamanho']}/{_cp['max_itens']} entradas, {_cp['taxa_hits']:.0%} hits)"
+)
+_cj = CACHE_JSON.stats()
+st.sidebar.caption(f"🗂️ Cache JSON: {_cj['hits']} hits / {_cj['recargas']} recargas do disco ({_cj['ficheiros']} ficheiros)")
+
 custom_data = load_custom()
 ligas_fixas = {
     "Liga Betclic": [
@@ -445,11 +284,28 @@ ligas_fixas = {
 ligas_custom = custom_data.get("ligas", {})
 todas_ligas = list(ligas_fixas.keys()) + list(ligas_custom.keys()) + ["Outra (nova liga personalizada)"]
 
+# ======== CHAT (sidebar) ========
+# Cada sessão guarda as mensagens já lidas e o cursor; em cada rerun só lê o que chegou depois.
+if "chat_cursor" not in st.session_state:
+    st.session_state["chat_msgs"], st.session_state["chat_cursor"] = ARMAZEM.ultimas_mensagens(50)
+else:
+    novas, st.session_state["chat_cursor"] = ARMAZEM.mensagens_desde(st.session_state["chat_cursor"])
+    st.session_state["chat_msgs"] = (st.session_state["chat_msgs"] + novas)[-50:]
+
+with st.sidebar.expander("💬 Chat", expanded=False), secao("ui.chat"):
+    for m in st.session_state["chat_msgs"][-20:]:
+        st.markdown(f"**{escape(str(m.get('user','?')))}** `{m.get('dt','')}`: {escape(str(m.get('msg','')))}")
+    with st.form("form_chat", clear_on_submit=True):
+        txt_chat = st.text_input("Mensagem", key="chat_txt")
+        if st.form_submit_button("Enviar") and txt_chat.strip():
+            save_message(st.session_state.get("logged_user", "?"), txt_chat.strip())
+            st.rerun()
+
 # ======== TABS ========
-tab1, tab2 = st.tabs(["⚽ Pré-Jogo", "🔥 Live / 2ª Parte + IA"])
+tab1, tab2, tab3, tab4 = st.tabs(["⚽ Pré-Jogo", "🔥 Live / 2ª Parte + IA", "📺 Painel Multi-Jogo", "📡 Streams"])
 
 # ========================= BLOCO PRÉ-JOGO =========================
-with tab1:
+with tab1, secao("ui.pre_jogo"):
     st.markdown('<div class="mainblock">', unsafe_allow_html=True)
     st.header("Análise Pré-Jogo (com fatores avançados)")
 
@@ -459,8 +315,7 @@ with tab1:
         if nova_liga:
             if nova_liga not in todas_ligas:
                 ligas_custom[nova_liga] = []
-                custom_data["ligas"] = ligas_custom
-                save_custom(custom_data)
+                ARMAZEM.adicionar_liga(nova_liga)
                 st.success(f"Liga '{nova_liga}' criada! Vai aparecer no menu ao recarregar.")
             else:
                 st.info("Esta liga já existe.")
@@ -480,8 +335,7 @@ with tab1:
             ligas_custom.setdefault(liga_escolhida, [])
             if equipa_nova not in ligas_custom[liga_escolhida]:
                 ligas_custom[liga_escolhida].append(equipa_nova)
-            custom_data["ligas"] = ligas_custom
-            save_custom(custom_data)
+            ARMAZEM.adicionar_equipa(liga_escolhida, equipa_nova)
             st.success(f"Equipa '{equipa_nova}' adicionada à liga '{liga_escolhida}'!")
         else:
             st.info("Esta equipa já existe nesta liga.")
@@ -503,8 +357,7 @@ with tab1:
                 ligas_custom.setdefault(liga_escolhida, [])
                 if nova_casa not in ligas_custom[liga_escolhida]:
                     ligas_custom[liga_escolhida].append(nova_casa)
-                custom_data["ligas"] = ligas_custom
-                save_custom(custom_data)
+                ARMAZEM.adicionar_equipa(liga_escolhida, nova_casa)
                 st.success(f"Equipa '{nova_casa}' adicionada à liga '{liga_escolhida}'!")
             equipa_casa = nova_casa
 
@@ -516,8 +369,7 @@ with tab1:
                 ligas_custom.setdefault(liga_escolhida, [])
                 if nova_fora not in ligas_custom[liga_escolhida]:
                     ligas_custom[liga_escolhida].append(nova_fora)
-                custom_data["ligas"] = ligas_custom
-                save_custom(custom_data)
+                ARMAZEM.adicionar_equipa(liga_escolhida, nova_fora)
                 st.success(f"Equipa '{nova_fora}' adicionada à liga '{liga_escolhida}'!")
             equipa_fora = nova_fora
 
@@ -533,18 +385,137 @@ with tab1:
     with c6: odd_btts   = st.number_input("Odd BTTS (Match)",     min_value=1.01, value=1.85, step=0.01)
 
     soma_odds = odd_casa + odd_empate + odd_fora
-    st.info(f"Soma odds 1X2: **{soma_odds:.2f}**")
+    col_s1, col_s2 = st.columns([2, 1])
+    col_s1.info(f"Soma odds 1X2: **{soma_odds:.2f}** · margem da casa **{float(margem([odd_casa, odd_empate, odd_fora])):.2%}**")
+    metodo_margem = col_s2.selectbox("Remoção da margem", METODOS, key="metodo_margem")
+    p_mercado = dict(zip(("1", "X", "2"), remover_margem([odd_casa, odd_empate, odd_fora], metodo_margem)))
     banca = st.number_input("💳 Valor atual da banca (€)", min_value=1.0, value=100.0, step=0.01)
 
+    # ---- λ (golos esperados): modelo ajustado ao histórico da liga ou valores manuais
+    st.subheader("📐 Golos esperados (λ)")
+    ficheiro_hist = st.file_uploader("Histórico de resultados da liga (CSV: data, casa, fora, golos_casa, golos_fora)",
+                                     type=["csv"], key="hist_liga")
+    col_m1, col_m2 = st.columns(2)
+    meia_vida = col_m1.number_input("Meia-vida dos jogos (dias)", min_value=30, max_value=3650, value=180, step=30, key="meia_vida")
+    usar_dc = col_m2.checkbox("Correção Dixon–Coles (resultados baixos)", key="usar_dc")
+    modelo, dados_hist = modelo_liga(liga_escolhida), None
+    if ficheiro_hist is not None:
+        try:
+            dados_hist = resultados_de_bytes(ficheiro_hist.getvalue())
+            modelo = ajustar_liga(liga_escolhida, dados_hist, meia_vida, usar_dc)
+        except ValueError as e:
+            st.error(f"Histórico inválido: {e}")
+    tem_modelo = modelo is not None and equipa_casa in modelo and equipa_fora in modelo
+    origem_lam = st.radio("Origem dos λ", ["Modelo ajustado", "Manual"] if tem_modelo else ["Manual"],
+                          horizontal=True, key="origem_lam")
+    if origem_lam == "Modelo ajustado":
+        lam_casa, lam_fora = modelo.lambdas(equipa_casa, equipa_fora)
+        matriz_pre = modelo.matriz(equipa_casa, equipa_fora)
+        st.caption(f"λ casa {lam_casa:.2f} · λ fora {lam_fora:.2f} · vantagem casa ×{modelo.vantagem_casa:.2f}"
+                   + (f" · ρ {modelo.rho:+.3f}" if modelo.rho else "")
+                   + f" · {modelo.n_jogos} jogos, {modelo.iteracoes} iterações")
+    else:
+        if modelo is not None and not tem_modelo:
+            st.caption("As equipas escolhidas não estão no histórico ajustado desta liga.")
+        col_l1, col_l2 = st.columns(2)
+        lam_casa = col_l1.number_input("λ CASA", min_value=0.05, max_value=6.0, value=1.45, step=0.05, key="lam_casa")
+        lam_fora = col_l2.number_input("λ FORA", min_value=0.05, max_value=6.0, value=1.10, step=0.05, key="lam_fora")
+        matriz_pre = matriz_jogo(lam_casa, lam_fora)
+    # uma matriz de resultados por jogo: os mercados da tabela e a escada asiática saem todos dela
+    precos_pre = precos_matriz(matriz_pre, linhas=(1.5, 2.5), resultado_exato=False)
+    mercados_pre = [("1", float(precos_pre["1"]), odd_casa), ("X", float(precos_pre["X"]), odd_empate),
+                    ("2", float(precos_pre["2"]), odd_fora), ("Over 1.5", float(precos_pre["over"][1.5]), odd_over15),
+                    ("Over 2.5", float(precos_pre["over"][2.5]), odd_over25), ("BTTS", float(precos_pre["btts"]), odd_btts)]
+    st.dataframe([{"Mercado": m, "Prob.": f"{p:.1%}",
+                   "Prob. mercado": f"{p_mercado[m]:.1%}" if m in p_mercado else "—",
+                   "Odd justa": round(odds_from_prob(p), 2), "Odd casa": o,
+                   "EV": calc_ev(p, o), "Stake Kelly (€)": round(kelly_criterion(p, o, banca, fracao=0.5), 2)}
+                  for m, p, o in mercados_pre], use_container_width=True, hide_index=True)
+
+    with st.expander("🎌 Handicap e totais asiáticos (odds justas)"):
+        escada = escada_asiatica(matriz_pre)
+        ah, tot = escada["handicap"], escada["totais"]
+        col_a1, col_a2 = st.columns(2)
+        col_a1.dataframe([{"Handicap casa": f"{l:+.2f}", "Odd casa": round(float(ah["odd_casa"][i]), 2),
+                           "Odd fora": round(float(ah["odd_fora"][i]), 2),
+                           "Ganha": f"{ah['ganha'][i] + ah['meio_ganha'][i] / 2:.1%}",
+                           "Reembolso": f"{ah['reembolso'][i] + (ah['meio_ganha'][i] + ah['meio_perde'][i]) / 2:.1%}"}
+                          for i, l in enumerate(ah["linhas"])], use_container_width=True, hide_index=True)
+        col_a2.dataframe([{"Linha": f"{l:.2f}", "Odd over": round(float(tot["odd_over"][i]), 2),
+                           "Odd under": round(float(tot["odd_under"][i]), 2),
+                           "Over": f"{tot['ganha'][i] + tot['meio_ganha'][i] / 2:.1%}",
+                           "Reembolso": f"{tot['reembolso'][i] + (tot['meio_ganha'][i] + tot['meio_perde'][i]) / 2:.1%}"}
+                          for i, l in enumerate(tot["linhas"])], use_container_width=True, hide_index=True)
+        st.caption("Linhas de quarto (.25/.75) dividem a stake pelas duas linhas vizinhas: metade pode ganhar "
+                   "ou perder e a outra metade ser reembolsada. Ganha/Reembolso = fração esperada da stake.")
+
+    # ---- odds em tempo real: feed local (ficheiro JSONL seguido em segundo plano), EV a cada tick
+    with st.expander("📡 Odds em tempo real (feed)"):
+        INGESTOR = obter_ingestor()
+        col_f1, col_f2, col_f3 = st.columns([3, 2, 1])
+        feed_path = col_f1.text_input("Feed (JSONL: jogo, mercado, odd)", "odds_feed.jsonl", key="feed_path")
+        feed_jogo = col_f2.text_input("Jogo no feed", f"{equipa_casa}-{equipa_fora}", key="feed_jogo").strip()
+        # limiar só desta sessão (filtra as alertas à vista); o do ingestor é do processo (CR7_FEED_LIMIAR)
+        limiar_feed = col_f3.number_input("Alerta EV >", 0.0, 1.0, 0.05, 0.01, key="feed_limiar")
+        seguir_feed = st.checkbox("Seguir feed", key="feed_ativo") and feed_path
+        seguido = st.session_state.get("feed_seguido")
+        if seguido and seguido != (feed_path if seguir_feed else None):
+            INGESTOR.deixar_ficheiro(seguido, SESSAO_ID)
+            st.session_state.pop("feed_seguido", None)
+        if seguir_feed:
+            INGESTOR.seguir_ficheiro(feed_path, sessao=SESSAO_ID)
+            st.session_state["feed_seguido"] = feed_path
+        INGESTOR.definir_probs(feed_jogo, probs_de_precos(precos_pre))
+        ultimas = INGESTOR.ultimas(feed_jogo)
+        if ultimas:
+            st.dataframe([{"Mercado": m, "Odd feed": u["odd"],
+                           "Odd justa": round(odds_from_prob(u["prob"]), 2) if u["prob"] else None,
+                           "EV": u["ev"], "Ticks": u["ticks"], "Hora": datetime.fromtimestamp(u["ts"]).strftime("%H:%M:%S")}
+                          for m, u in sorted(ultimas.items())], use_container_width=True, hide_index=True)
+            if all(r in ultimas for r in ("1", "X", "2")):
+                st.caption(f"Margem 1X2 do feed: {sum(1 / ultimas[r]['odd'] for r in ('1', 'X', '2')) - 1:.1%}")
+            mercado_graf = st.selectbox("Histórico", sorted(ultimas), key="feed_mercado")
+            _, hist_odd, _ = INGESTOR.historico(feed_jogo, mercado_graf)
+            st.line_chart(hist_odd)
+        else:
+            st.caption(f"Sem ticks para '{feed_jogo}'. Jogos no feed: {', '.join(INGESTOR.jogos()) or '—'}")
+        for a in reversed([a for a in list(INGESTOR.alertas) if a.jogo == feed_jogo and a.ev > limiar_feed][-5:]):
+            st.warning(f"{datetime.fromtimestamp(a.ts):%H:%M:%S} · {a.mercado} @ {a.odd:.2f} · EV {a.ev:+.2f}")
+
+    forma = forma_atual(liga_escolhida)
+    if dados_hist is not None:
+        n_forma = st.slider("Forma: últimos N jogos", 3, 10, 5, key="n_forma")
+        forma = forma_liga(liga_escolhida, dados_hist, n_forma)
+    if forma:
+        st.dataframe([{"Equipa": e, "Forma": f["sequencia"], "V-E-D": f"{f['V']}-{f['E']}-{f['D']}",
+                       "Pts/jogo": f["ppj"], "Série": f["serie"],
+                       "Pts/jogo casa": f.get("ppj_casa"), "Pts/jogo fora": f.get("ppj_fora")}
+                      for e, f in ((equipa_casa, forma.get(equipa_casa)), (equipa_fora, forma.get(equipa_fora))) if f],
+                     use_container_width=True, hide_index=True)
+    if modelo is not None:
+        with st.expander("Tabela de forças da liga"):
+            st.dataframe(modelo.tabela(), use_container_width=True, hide_index=True)
+
     # ⚠️ daqui para baixo segue igual ao teu script original:
     # Formações, titulares, meteo, árbitro, motivação, médias, H2H, forma,
     # e botão "Gerar Análise e Odds Justa"
     # (já compatível com funções atualizadas de Kelly, EV, prob_over, prob_btts, etc.)
 # ========================= BLOCO LIVE / 2ª PARTE =========================
-with tab2:
+with tab2, secao("ui.live"):
     st.markdown('<div class="mainblock">', unsafe_allow_html=True)
     st.header("Live/2ª Parte — Previsão de Golos (Modo Escuta + IA)")
 
+    # Estado do jogo partilhado pelo processo e persistido em LIVE_DIR: quem abrir o
+    # mesmo ID (ou a app depois de reiniciar) retoma a base e os eventos já registados.
+    # O ID por omissão é único por sessão; só se partilha escrevendo um ID já existente.
+    jogo_omissao = f"jogo-{datetime.now():%Y%m%d}-{SESSAO_ID[:8]}"
+    jogo_live = st.text_input("Jogo (ID)", value=jogo_omissao, key="jogo_live").strip() or jogo_omissao
+    estado_live = obter_estado(jogo_live, LIVE_DIR)
+    if st.session_state.get("jogo_live_ativo") != jogo_live:
+        st.session_state["jogo_live_ativo"] = jogo_live
+        if estado_live.base: st.session_state['live_base'] = dict(estado_live.base)
+        else: st.session_state.pop('live_base', None)
+
     col_livef1, col_livef2 = st.columns(2)
     with col_livef1:
         form_casa_live = st.selectbox("Formação CASA (Live)", formacoes_lista, key="form_casa_live")
@@ -586,11 +557,9 @@ with tab2:
             "form_casa": form_casa_live, "form_fora": form_fora_live,
             "tipo_form_casa": tipo_form_casa_live, "tipo_form_fora": tipo_form_fora_live
         }
+        estado_live.definir_base(st.session_state['live_base'])
         st.success("Estatísticas e formações registadas! Agora adiciona eventos live.")
 
-    if "eventos_live" not in st.session_state:
-        st.session_state["eventos_live"] = []
-
     st.subheader("➕ Adicionar Evento LIVE")
     tipo_evento = st.selectbox("Tipo de evento", ["Golo","Expulsão","Penalty","Substituição","Mudança de formação","Amarelo"])
     equipa_evento = st.selectbox("Equipa", ["Casa","Fora"])
@@ -613,52 +582,62 @@ with tab2:
         if nova_form_ev:  evento["nova_formacao"] = nova_form_ev
         if tipo_form_ev:  evento["tipo_formacao"] = tipo_form_ev
         if imp_ev:        evento["importancia"] = imp_ev
-        st.session_state["eventos_live"].append(evento)
+        estado_live.acrescentar(evento)
         st.success("Evento adicionado! Atualiza previsão em baixo.")
+    if st.button("↩️ Desfazer último evento", disabled=not estado_live.eventos):
+        if estado_live.desfazer() is not None:
+            st.success("Último evento removido.")
 
     st.markdown("#### Eventos registados:")
-    if st.session_state["eventos_live"]:
-        for i, ev in enumerate(st.session_state["eventos_live"], 1):
-            info_ev = f"{i}. {ev['tipo']} | {ev['equipa']}"
-            if "posicao" in ev:       info_ev += f" | {ev['posicao']}"
-            if "tipo_troca" in ev:    info_ev += f" | {ev['tipo_troca']}"
-            if "nova_formacao" in ev: info_ev += f" | Nova: {ev['nova_formacao']} ({ev.get('tipo_formacao','')})"
-            if "importancia" in ev:   info_ev += f" | {ev['importancia']}"
-            if ev.get('detalhes'):    info_ev += f" | {ev['detalhes']}"
+    if estado_live.linhas:
+        for info_ev in estado_live.linhas:
             st.write(info_ev)
     else:
         st.write("Nenhum evento registado ainda.")
 
-    # ===== Heurísticas simples =====
-    def interpretar_tatica(eventos, live_base, _resultado):
-        n_evt = len(eventos)
-        base = live_base.get("xg_casa", 0) + live_base.get("xg_fora", 0)
-        if n_evt >= 4 or base >= 1.4: return "Jogo aberto: tendência para ocasiões na 2ª parte."
-        if n_evt == 0 and base <= 0.6: return "Jogo fechado: poucas ocasiões claras até agora."
-        return "Equilíbrio moderado com potencial de crescer."
-
-    def calc_xg_live(live_base, eventos):
-        base_xg = (live_base.get("xg_casa", 0.0) + live_base.get("xg_fora", 0.0)) / 2.0
-        ajuste_eventos = 0.07 * len(eventos)
-        reds = sum(1 for ev in eventos if ev.get("tipo") == "Expulsão")
-        ajuste_reds = 0.20 * reds
-        ajuste_total = ajuste_eventos + ajuste_reds
-        return base_xg + ajuste_total, ajuste_total, base_xg
-
     st.markdown("### 🤖 **PauloDamas-GPT** — Interpretação Tática Live")
-    comentario = interpretar_tatica(st.session_state["eventos_live"], st.session_state.get('live_base', {}), 0)
+    comentario = estado_live.interpretar()
     st.info(comentario)
 
     if st.button("🔁 Atualizar Previsão com Eventos Live"):
         if 'live_base' not in st.session_state:
             st.error("Preenche e confirma primeiro as estatísticas da 1ª parte!")
         else:
-            xg_2p, ajuste, xg_ponderado = calc_xg_live(st.session_state['live_base'], st.session_state["eventos_live"])
+            xg_2p, ajuste, xg_ponderado = estado_live.xg_live()
             st.markdown(f"### 🟢 **Golos Esperados para a 2ª parte:** `{xg_2p:.2f}`")
             if xg_2p >= 1.6:   st.success("⚽ Perspetiva de pelo menos 1 golo. Over 1.5 na 2ª parte pode ter valor.")
             elif xg_2p >= 1.2: st.info("⚠️ Espera-se 1 golo, com hipótese de 2. Over 1.0/1.25 pode ter valor.")
             else:              st.warning("🔒 Jogo mais fechado. Cuidado com apostas em muitos golos na 2ª parte.")
-            st.info(f"**Resumo do Ajuste:**\n\n- xG ponderado (1ª parte): {xg_ponderado:.2f}\n- Ajuste total (eventos): {ajuste:.2f}\n- Eventos registados: {len(st.session_state['eventos_live'])}")
+            st.info(f"**Resumo do Ajuste:**\n\n- xG ponderado (1ª parte): {xg_ponderado:.2f}\n- Ajuste total (eventos): {ajuste:.2f}\n- Eventos registados: {len(estado_live.eventos)}")
+
+    # Simulação do resto do jogo a partir do minuto e resultado atuais. A seed fica guardada
+    # com o resultado (e na exportação), por isso a mesma simulação pode ser refeita exatamente.
+    st.markdown("#### 🎲 Simulação Monte Carlo (resto do jogo)")
+    col_s1, col_s2, col_s3, col_s4 = st.columns(4)
+    minuto_sim = col_s1.number_input("Minuto atual", min_value=45, max_value=89, value=45, step=1, key="sim_minuto")
+    placar_sim = col_s2.text_input("Resultado atual", value=resultado_intervalo)
+    n_sim = col_s3.selectbox("Caminhos", [100_000, 200_000, 500_000, 1_000_000], index=1, key="sim_n")
+    seed_sim = col_s4.number_input("Seed (0 = aleatória)", min_value=0, value=0, step=1, key="sim_seed")
+    if st.button("🎲 Simular 2ª parte", disabled='live_base' not in st.session_state):
+        xg_2p, _, _ = estado_live.xg_live()
+        l_casa, l_fora = dividir_xg(estado_live.base, xg_2p)
+        gc, gf = parse_resultado(placar_sim)
+        ic, if_ = parse_resultado(resultado_intervalo)
+        st.session_state["simulacao_live"] = simular_2p(
+            l_casa, l_fora, minuto=minuto_sim, golos_casa=gc, golos_fora=gf, intervalo_casa=ic, intervalo_fora=if_,
+            vermelhos_casa=int(estado_live.base.get("vermelhos_casa", 0)) + estado_live.vermelhos["Casa"],
+            vermelhos_fora=int(estado_live.base.get("vermelhos_fora", 0)) + estado_live.vermelhos["Fora"],
+            n=n_sim, seed=int(seed_sim) or None)
+    sim = st.session_state.get("simulacao_live")
+    if sim:
+        mercados_sim = ([(f"Próximo golo: {k}", v) for k, v in sim["proximo_golo"].items()]
+                        + [(f"2ª parte over {l}", v) for l, v in sim["over"].items()]
+                        + [(f"Resultado final: {k}", v) for k, v in sim["resultado"].items()]
+                        + [("Ambas marcam (final)", sim["btts"])])
+        st.dataframe([{"Mercado": m, "Prob.": f"{p:.1%}", "Odd justa": round(odds_from_prob(p), 2) if p > 0 else None}
+                      for m, p in mercados_sim], use_container_width=True, hide_index=True)
+        st.caption(f"{sim['n']:,} caminhos · seed {sim['seed']} · golos esperados na 2ª parte: {sim['golos_2p']:.2f} "
+                   f"({sim.get('golos_resto', sim['golos_2p']):.2f} no tempo que falta)")
 
 # ---- ANÁLISE FINAL E EXPORTAÇÃO (ABA LIVE) ----
 st.markdown("---")
@@ -668,13 +647,13 @@ if st.button("Gerar Análise Final", disabled=btn_disable):
     if 'live_base' not in st.session_state:
         st.error("Preenche e confirma primeiro as estatísticas da 1ª parte!")
     else:
-        xg_2p, ajuste, xg_ponderado = calc_xg_live(st.session_state['live_base'], st.session_state.get("eventos_live", []))
+        xg_2p, ajuste, xg_ponderado = estado_live.xg_live()
         st.session_state["analise_final"] = {"xg_2p": xg_2p, "ajuste": ajuste, "xg_ponderado": xg_ponderado}
         st.success("✅ Análise final gerada e guardada!")
 
 if "analise_final" in st.session_state:
     analise_final = st.session_state["analise_final"] or {}
-    eventos = st.session_state.get("eventos_live", []) or []
+    eventos = list(estado_live.eventos)
     base = st.session_state.get("live_base", {}) or {}
     analise_final = sanitize_analysis(analise_final, keys=("xg_1p", "xg_2p", "xg_total"))
 
@@ -685,12 +664,155 @@ if "analise_final" in st.session_state:
     ajuste_val       = first_float(analise_final.get("ajuste"))
     xg_ponderado_val = first_float(analise_final.get("xg_ponderado"))
 
-    excel_data = export_detalhado(base, eventos, xg_2p_val, ajuste_val, xg_ponderado_val)
-    st.download_button(label="📥 Download Excel Detalhado (Live)", data=excel_data,
-                       file_name="live_detalhado.xlsx",
-                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    # O ficheiro só é gerado quando pedido; a chave (hash do conteúdo) garante que
+    # não se oferece um ficheiro desatualizado e que o mesmo conteúdo nunca é refeito.
+    formato_exp = st.radio("Formato", ["xlsx", "csv", "parquet"], horizontal=True, key="formato_exp")
+    sim = st.session_state.get("simulacao_live")
+    chave_exp = hash_conteudo(base, eventos, xg_2p_val, ajuste_val, xg_ponderado_val, load_pesos(), formato_exp, sim)
+    if st.button("📦 Preparar ficheiro detalhado (Live)"):
+        st.session_state["export_live"] = (chave_exp, export_detalhado(
+            base, eventos, xg_2p_val, ajuste_val, xg_ponderado_val, formato=formato_exp, simulacao=sim))
+    pronto = st.session_state.get("export_live")
+    if pronto and pronto[0] == chave_exp:
+        st.download_button(label=f"📥 Download Detalhado (Live) .{formato_exp}", data=pronto[1],
+                           file_name=f"live_detalhado.{formato_exp}", mime=MIME[formato_exp])
 
 # Botão independente de limpar eventos
 if st.button("🗑️ Limpar eventos LIVE"):
-    st.session_state["eventos_live"] = []
+    estado_live.limpar()
     st.success("Lista de eventos live limpa!")
+
+# ========================= PAINEL MULTI-JOGO =========================
+# Os cálculos correm numa thread do processo (cr7bot.painel) e só para os jogos
+# que mudaram; aqui apenas se leem os resultados já prontos.
+with tab3, secao("ui.painel"):
+    st.header("📺 Painel Multi-Jogo (Live)")
+    PAINEL = obter_painel(LIVE_DIR)
+    disponiveis = jogos_disponiveis(LIVE_DIR)
+    # os jogos seguidos são desta sessão (session_state); o painel só conta quantas sessões seguem cada um
+    seguidos = st.multiselect("Jogos a seguir", sorted(set(disponiveis) | set(st.session_state.get("painel_jogos", []))),
+                              key="painel_jogos",
+                              help="Os jogos aparecem aqui depois de abertos (pelo ID) no separador Live.")
+    PAINEL.sincronizar(SESSAO_ID, seguidos)
+
+    col_ar1, col_ar2 = st.columns(2)
+    auto = col_ar1.checkbox("🔄 Atualização automática", value=False, key="painel_auto")
+    segs = col_ar2.number_input("Intervalo (s)", min_value=2, max_value=120, value=10, step=1, key="painel_segs")
+    if auto:
+        from streamlit_autorefresh import st_autorefresh
+        st_autorefresh(interval=int(segs) * 1000, key="painel_refresh")
+
+    resultados = PAINEL.resultados()
+    _odd = lambda p: round(odds_from_prob(p), 2)
+    linhas_painel = []
+    for j in seguidos:
+        r = resultados.get(j)
+        if r is None:
+            linhas_painel.append({"Jogo": j, "Tática": "a calcular…"})
+            continue
+        linhas_painel.append({
+            "Jogo": j, "Eventos": r["eventos"], "xG 2ªP": round(r["xg_2p"], 2), "Ajuste": round(r["ajuste"], 2),
+            "1": _odd(r["precos"]["1"]), "X": _odd(r["precos"]["X"]),
+            "2": _odd(r["precos"]["2"]),
+            **{f"Over {l}": _odd(p) for l, p in r["over"].items()},
+            "BTTS": _odd(r["precos"]["btts"]),
+            "Tática": r["tatica"] if r["base"] else "sem dados da 1ª parte",
+            "Atualizado": datetime.fromtimestamp(r["atualizado"]).strftime('%H:%M:%S'),
+        })
+    if linhas_painel:
+        st.caption("Odds justas para a 2ª parte (Poisson sobre o xG ajustado pelos eventos).")
+        st.dataframe(linhas_painel, use_container_width=True, hide_index=True)
+    else:
+        st.info("Nenhum jogo seguido. Abre jogos no separador Live (campo \"Jogo (ID)\") e escolhe-os aqui.")
+
+# ========================= STREAMS (M3U / M3U8) =========================
+# A playlist carregada é lida por blocos e só até à página pedida: listas com
+# 100k+ canais nunca ficam inteiras em memória nem são processadas por rerun.
+with tab4, secao("ui.streams"):
+    st.header("📡 Streams (HLS / M3U)")
+    url_stream = st.text_input("URL HLS (.m3u8) ou conteúdo #EXTM3U", key="stream_url")
+    ficheiro_m3u = st.file_uploader("…ou carrega uma playlist M3U/M3U8", type=["m3u", "m3u8", "txt"], key="stream_file")
+    escolhido, canal_atual, indice = None, None, None
+    if ficheiro_m3u is not None:
+        por_pagina = st.selectbox("Canais por página", [25, 50, 100, 200], index=1, key="stream_por_pag")
+        # O índice (pesquisa/grupos/favoritos) lê a playlist inteira uma vez por conteúdo;
+        # sem ele, a navegação por páginas continua a ler só até à página pedida.
+        if st.checkbox("🔎 Pesquisa, grupos e favoritos", key="stream_indice"):
+            indice = obter_indice(ficheiro_m3u)
+            col_q, col_g = st.columns([2, 1])
+            consulta = col_q.text_input("Procurar canal (sem acentos, tolera erros)", key="stream_q")
+            grupos_m3u = ["(todos)"] + [g for g, _ in indice.grupos()]
+            grupo_sel = col_g.selectbox("Grupo", grupos_m3u, key="stream_grupo",
+                                        format_func=lambda g: g or "(sem grupo)")
+            canais = indice.procurar(consulta, None if grupo_sel == "(todos)" else grupo_sel, limite=por_pagina)
+            st.caption(f"{len(canais)} resultado(s) em {len(indice)} canais.")
+        else:
+            pagina = int(st.number_input("Página", min_value=1, value=1, step=1, key="stream_pag")) - 1
+            canais, ha_mais = pagina_m3u(ficheiro_m3u, pagina, por_pagina)
+            if canais:
+                ini = pagina * por_pagina
+                st.caption(f"Canais {ini + 1}–{ini + len(canais)}" + ("" if ha_mais else " (última página)"))
+        if canais:
+            i_canal = st.selectbox("Canal", range(len(canais)), key="stream_canal",
+                                   format_func=lambda i: f"{canais[i].nome}" + (f"  ·  {canais[i].grupo}" if canais[i].grupo else ""))
+            canal_atual = canais[i_canal]
+            escolhido = canal_atual.url
+            if st.button("⭐ Guardar nos favoritos", key="stream_fav_add"):
+                ARMAZEM.definir_favorito(chave_canal(canal_atual),
+                                         {"nome": canal_atual.nome, "url": canal_atual.url, "grupo": canal_atual.grupo})
+                st.success(f"{canal_atual.nome} guardado nos favoritos.")
+            # Verificação em paralelo (asyncio, ligações keep-alive); resultados em cache TTL no processo.
+            if st.button("🩺 Verificar canais desta lista", key="stream_sonda"):
+                with st.spinner("A verificar streams…"):
+                    st.session_state["stream_saude"] = obter_sonda().sondar([c.url for c in canais])
+            saude = st.session_state.get("stream_saude") or {}
+            linhas_saude = [{
+                "Canal": c.nome, "Vivo": "🟢" if saude[c.url].vivo else "🔴",
+                "Latência (ms)": round(saude[c.url].latencia_ms) if saude[c.url].latencia_ms is not None else None,
+                "Qualidades": " / ".join(v.resolucao or f"{v.largura_banda // 1000} kbps" for v in saude[c.url].variantes),
+                "Erro": saude[c.url].erro,
+            } for c in canais if c.url in saude]
+            if linhas_saude:
+                st.dataframe(linhas_saude, use_container_width=True, hide_index=True)
+        else:
+            st.warning("Sem canais para mostrar.")
+
+    favs = load_favs()
+    if favs:
+        # Com a playlist indexada, o favorito aponta para o URL atual do canal (resolvido pela chave).
+        atuais = indice.resolver_favoritos(favs) if indice is not None else {}
+        chaves_fav = list(favs)
+        fav_sel = st.selectbox("⭐ Favoritos", ["—"] + chaves_fav, key="stream_fav",
+                               format_func=lambda k: k if k == "—" else (favs[k] or {}).get("nome", k) + (" ✓" if k in atuais else ""))
+        if fav_sel != "—":
+            escolhido = atuais[fav_sel].url if fav_sel in atuais else (favs[fav_sel] or {}).get("url")
+            if st.button("Remover dos favoritos", key="stream_fav_rm"):
+                ARMAZEM.remover_favorito(fav_sel)
+                st.rerun()
+    hls_player(escolhido or parse_m3u_or_url(url_stream))
+
+# ========================= DESEMPENHO (admin) =========================
+registar("rerun", time.perf_counter() - t_rerun)
+if st.session_state.get("logged_user") in ADMINS:
+    with st.sidebar.expander("⏱️ Desempenho"):
+        # O interruptor vale para o processo inteiro (todas as sessões), não só para esta.
+        ligada = st.checkbox("Instrumentação ativa", value=ativa(), key="instr_ativa")
+        if ligada != ativa():
+            ativar(ligada)
+            METRICAS.limpar()
+        rel = METRICAS.relatorio()
+        if "rerun" in rel["tempos"]:
+            r = rel["tempos"]["rerun"]
+            st.caption(f"Último rerun: {r['ultimo_ms']:.0f} ms · p50 {r['p50_ms']:.0f} ms · p95 {r['p95_ms']:.0f} ms "
+                       f"({r['chamadas']} reruns)")
+        if rel["tempos"]:
+            st.dataframe([{"Nome": n, "Chamadas": t["chamadas"], "p50 (ms)": round(t["p50_ms"], 2),
+                           "p95 (ms)": round(t["p95_ms"], 2), "Máx (ms)": round(t["max_ms"], 2),
+                           "Total (ms)": round(t["total_ms"], 1)}
+                          for n, t in sorted(rel["tempos"].items(), key=lambda nt: -nt[1]["total_ms"])],
+                         use_container_width=True, hide_index=True)
+        if rel["bytes"]:
+            st.caption("Bytes escritos: " + " · ".join(f"{d} {b['bytes']:,} ({b['escritas']}×)" for d, b in rel["bytes"].items()))
+        c_j, c_p = st.columns(2)
+        c_j.download_button("JSON", METRICAS.para_json(), file_name="metricas.json", mime="application/json", key="instr_json")
+        c_p.download_button("Prometheus", METRICAS.para_prometheus(), file_name="metricas.prom", mime="text/plain", key="instr_prom")
@@ -0,0 +1,9 @@
+from cr7bot.forca import ajustar
+
+
+def test_ajustar_sem_golos_em_casa():
+    casa, fora = ["A", "B", "A"], ["B", "A", "C"]
+    m = ajustar(casa, fora, [0, 0, 0], [0, 1, 0])
+    assert m.vantagem_casa == 0.0
+    # arranque a partir de um modelo com vantagem_casa == 0
+    assert ajustar(casa, fora, [1, 0, 2], [0, 1, 0], inicio=m).vantagem_casa > 0
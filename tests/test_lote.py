@@ -0,0 +1,12 @@
+import pandas as pd
+
+from cr7bot.lote import avaliar_ficheiro
+
+
+def test_parquet_aceita_tipos_diferentes_entre_blocos(tmp_path):
+    entrada, saida = tmp_path / "jogos.csv", tmp_path / "res.parquet"
+    entrada.write_text("lambda_casa,lambda_fora,odd_casa,banca\n"
+                       "1.2,1.0,2.1,100\n1.5,0.9,1.8,100\n1.1,1.3,3.0,50.5\n")
+
+    assert avaliar_ficheiro(str(entrada), str(saida), bloco=2) == 3
+    assert pd.read_parquet(saida)["banca"].tolist() == [100.0, 100.0, 50.5]
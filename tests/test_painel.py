@@ -0,0 +1,33 @@
+from cr7bot.live import EstadoLive, obter_estado
+from cr7bot.painel import Painel, jogos_disponiveis
+
+
+def test_painel_acompanha_jogo_com_id_nao_sanitizado(tmp_path):
+    pasta = str(tmp_path)
+    jogo = "Benfica - Porto"
+    est = obter_estado(jogo, pasta)
+    est.definir_base({"xg_casa": 0.8, "xg_fora": 0.6})
+
+    assert jogos_disponiveis(pasta) == [jogo]
+
+    painel = Painel(pasta)
+    painel.sincronizar("s1", jogos_disponiveis(pasta))   # (a thread do painel também pode recalcular)
+    painel.recalcular_pendentes()
+    antes = painel.resultados()[jogo]
+    assert antes["eventos"] == 0
+
+    est.acrescentar({"tipo": "Remate perigoso", "equipa": "Casa"})
+    est.acrescentar({"tipo": "Remate perigoso", "equipa": "Casa"})
+    painel.recalcular_pendentes()
+    depois = painel.resultados()[jogo]
+    assert depois["eventos"] == 2
+    assert depois["xg_2p"] != antes["xg_2p"]
+
+
+def test_ids_com_o_mesmo_ficheiro_partilham_o_estado(tmp_path):
+    pasta = str(tmp_path)
+    a, b = obter_estado("Benfica/Porto", pasta), obter_estado("Benfica Porto", pasta)
+    assert a is b
+    a.acrescentar({"tipo": "Remate perigoso", "equipa": "Casa"})
+    b.acrescentar({"tipo": "Canto", "equipa": "Fora"})
+    assert len(EstadoLive.abrir("Benfica Porto", pasta).eventos) == 2